@@ -0,0 +1,62 @@
+import numpy as np
+
+# Bogacki-Shampine 3(2) tableau (the RK23 pair of MATLAB ode23 / scipy)
+_A = [[], [1/2], [0, 3/4], [2/9, 1/3, 4/9]]
+_C = [0, 1/2, 3/4, 1]
+_E = np.array([5/72, -1/12, -1/9, 1/8])  # 3rd order minus embedded 2nd order weights
+
+class AdaptiveStepper:
+    def __init__(self, fun, rtol=1e-6, atol=1e-6, h_min=0.01, h_max=1.0, safety=0.9):
+        """
+        Embedded Runge-Kutta (Bogacki-Shampine 3(2)) integrator with step-size control.
+
+        Args:
+            fun (callable): dy/dt = fun(t, y), y a 1-D array
+            rtol, atol (float): Local error tolerances per component
+            h_min (float): Smallest step (also the step after reset())
+            h_max (float): Largest step
+            safety (float): Safety factor of the step-size controller
+        """
+        self.fun = fun
+        self.rtol = rtol
+        self.atol = atol
+        self.h_min = h_min
+        self.h_max = h_max
+        self.safety = safety
+        self.h = h_min
+        self.accepted = 0
+        self.rejected = 0
+
+    def reset(self, h=None):
+        """Restarts with a small step, e.g. right after a discontinuity (event)."""
+        self.h = self.h_min if h is None else h
+
+    def step(self, t, y, t_limit):
+        """
+        Takes one accepted step from t without passing t_limit.
+
+        Returns:
+            t_new (float), y_new (np.ndarray)
+        """
+        y = np.asarray(y, dtype=float)
+        while True:
+            h = min(self.h, t_limit - t)
+            k = [self.fun(t, y)]
+            for c, a in zip(_C[1:], _A[1:]):
+                k.append(self.fun(t + c * h, y + h * sum(a_j * k_j for a_j, k_j in zip(a, k))))
+            # The last stage is evaluated at y_new (FSAL), so k[3] = fun(t + h, y_new)
+            y_new = y + h * (2/9 * k[0] + 1/3 * k[1] + 4/9 * k[2])
+
+            err = h * (_E[0] * k[0] + _E[1] * k[1] + _E[2] * k[2] + _E[3] * k[3])
+            scale = self.atol + self.rtol * np.maximum(np.abs(y), np.abs(y_new))
+            err_norm = np.sqrt(np.mean((err / scale) ** 2))
+
+            # Standard controller for an order-2 error estimate: h ~ err^(-1/3)
+            factor = 5.0 if err_norm == 0 else min(5.0, max(0.2, self.safety * err_norm ** (-1/3)))
+            if err_norm <= 1.0 or h <= self.h_min:
+                self.accepted += 1
+                if h == self.h or factor < 1.0:
+                    self.h = min(self.h_max, max(self.h_min, h * factor))
+                return t + h, y_new
+            self.rejected += 1
+            self.h = max(self.h_min, h * factor)
@@ -1,3 +1,5 @@
+import numpy as np
+
 class AGC:
     def __init__(self, K_p=0.5, K_i=0.2, target_freq=50.0):
         """
@@ -34,4 +36,129 @@ class AGC:
 
     def reset(self):
         """Clears the integral memory (useful for restarts)."""
-        self.integral_error = 0.0
\ No newline at end of file
+        self.integral_error = 0.0
+
+class AGCBank:
+    def __init__(self, unit_area, participation, areas=None, K_p=0.5, K_i=0.2, bias=1.0,
+                 target_freq=50.0, p_min=-0.5, p_max=0.5, ramp_rate=np.inf, scheduled_export=None,
+                 unit_bus_ids=None, anti_windup=False):
+        """
+        Multi-area AGC: one PI controller per area, all held as NumPy arrays.
+
+        Each area acts on its area control error with tie-line bias,
+            ACE = (export - scheduled_export) + bias * (freq - target_freq),
+        and shares its output among its units by participation factor.
+
+        With the defaults, a one-area bank in which only the slack unit
+        participates computes the same output as AGC clamped to the
+        Simulator's +/-AGC_LIMIT. Enabling anti_windup departs from it
+        once the limits bind.
+
+        Args:
+            unit_area (array): Area number of every generating unit
+            participation (array): Participation factor of every unit
+                (normalized within each area)
+            areas (array): Area numbers, fixes the order of the per-area
+                arrays (default: sorted unique unit_area)
+            K_p, K_i (float or array): PI gains per area
+            bias (float or array): Frequency bias per area (pu/Hz)
+            target_freq (float): The grid setpoint (usually 50.0 Hz)
+            p_min, p_max (float or array): Area output limits (pu)
+            ramp_rate (float or array): Max change of area output (pu/s)
+            scheduled_export (array): Scheduled net export per area (pu);
+                taken from the first measurement when None
+            unit_bus_ids (array): Bus ID of every unit (used by simulator.Simulator)
+            anti_windup (bool): Stop the integral of an area while its
+                output is saturated in the direction of its error
+        """
+        self.unit_area = np.asarray(unit_area, dtype=int)
+        self.areas = np.unique(self.unit_area) if areas is None else np.asarray(areas, dtype=int)
+        n = len(self.areas)
+        self.Kp = np.broadcast_to(np.asarray(K_p, dtype=float), n).copy()
+        self.Ki = np.broadcast_to(np.asarray(K_i, dtype=float), n).copy()
+        self.bias = np.broadcast_to(np.asarray(bias, dtype=float), n).copy()
+        self.p_min = np.broadcast_to(np.asarray(p_min, dtype=float), n).copy()
+        self.p_max = np.broadcast_to(np.asarray(p_max, dtype=float), n).copy()
+        self.ramp_rate = np.broadcast_to(np.asarray(ramp_rate, dtype=float), n).copy()
+        self.target = target_freq
+        self.anti_windup = anti_windup
+        self.scheduled_export = None if scheduled_export is None else np.asarray(scheduled_export, dtype=float)
+
+        self.unit_bus_ids = None if unit_bus_ids is None else np.asarray(unit_bus_ids, dtype=int)
+
+        # Unit -> position in the per-area arrays
+        area_pos = {a: k for k, a in enumerate(self.areas.tolist())}
+        self.unit_pos = np.array([area_pos[a] for a in self.unit_area.tolist()], dtype=int)
+        self._participation = np.asarray(participation, dtype=float)
+        self.online = np.ones(len(self.unit_area), dtype=bool)
+        self._normalize()
+
+        self.integral_error = np.zeros(n)
+        self.ace = np.zeros(n)
+        self.output = np.zeros(n)
+        self.unit_output = np.zeros(len(self.unit_area))
+
+    def _normalize(self):
+        part = np.where(self.online, self._participation, 0.0)
+        total = np.bincount(self.unit_pos, weights=part, minlength=len(self.areas))
+        self.participation = np.divide(part, total[self.unit_pos], out=np.zeros_like(part),
+                                       where=total[self.unit_pos] > 0)
+
+    def set_online(self, online):
+        """Takes units out of (or back into) regulation and renormalizes the participation."""
+        self.online = np.asarray(online, dtype=bool)
+        self._normalize()
+
+    def calculate_regulation(self, current_freq, export, time_step):
+        """
+        Updates every area controller by one step.
+
+        Args:
+            current_freq (float or array): System (or per-area) frequency in Hz
+            export (array): Measured net export per area (pu)
+            time_step (float): Seconds since the last call
+
+        Returns:
+            unit_output (np.ndarray): Power adjustment of every unit (pu)
+        """
+        export = np.asarray(export, dtype=float)
+        if self.scheduled_export is None:
+            self.scheduled_export = export.copy()
+        self.ace = (export - self.scheduled_export) + self.bias * (current_freq - self.target)
+        error = -self.ace  # Positive when the area must raise generation
+
+        integral = self.integral_error + error * time_step
+        if self.anti_windup:
+            # Freeze the integral of areas saturated in the direction of their error
+            raw = self.Kp * error + self.Ki * integral
+            windup = ((raw > self.p_max) & (error > 0)) | ((raw < self.p_min) & (error < 0))
+            integral = np.where(windup, self.integral_error, integral)
+        self.integral_error = integral
+
+        output = np.clip(self.Kp * error + self.Ki * self.integral_error, self.p_min, self.p_max)
+        max_step = self.ramp_rate * time_step
+        self.output = np.clip(output, self.output - max_step, self.output + max_step)
+
+        self.unit_output = self.participation * self.output[self.unit_pos]
+        return self.unit_output
+
+    def reset(self):
+        """Clears the integral memory and the outputs."""
+        self.integral_error[:] = 0.0
+        self.output[:] = 0.0
+        self.unit_output[:] = 0.0
+
+    @classmethod
+    def from_network(cls, net, participation=None, **kwargs):
+        """
+        Bank over the slack and PV units of a Network, one area per net.area.
+
+        Args:
+            participation (array): Per unit (slack/PV buses in bus order);
+                default proportional to P_max
+            **kwargs: Passed to AGCBank (gains, bias, limits, ...)
+        """
+        gen = np.where((net.types == 1) | (net.types == 2))[0]
+        if participation is None:
+            participation = net.P_max[gen]
+        return cls(net.area[gen], participation, unit_bus_ids=net.ids[gen], **kwargs)
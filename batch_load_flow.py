@@ -0,0 +1,193 @@
+import numpy as np
+
+import network
+import nr_solver
+import instrumentation
+
+BATCH_CHUNK = 64  # Cases per stacked Jacobian solve (K x m x m)
+
+def _dense(Y_bus):
+    if nr_solver.sp is not None and nr_solver.sp.issparse(Y_bus):
+        return Y_bus.toarray()
+    return np.asarray(Y_bus, dtype=complex)
+
+def calc_power_injections_batch(Y_bus, V, Theta):
+    """
+    calc_power_injections for K cases at once.
+
+    Args:
+        Y_bus (np.ndarray): Shared (n x n) or per-case (K x n x n) admittance matrix
+        V, Theta (np.ndarray): (K x n) voltage magnitudes and angles
+
+    Returns:
+        P_calc, Q_calc (np.ndarray): (K x n) injections in pu
+    """
+    V_c = V * np.exp(1j * Theta)
+    if Y_bus.ndim == 2:
+        I = V_c @ Y_bus.T
+    else:
+        I = np.matmul(Y_bus, V_c[:, :, None])[:, :, 0]
+    S = V_c * np.conj(I)
+    return S.real, S.imag
+
+def assemble_jacobian_batch(Y_bus, V, Theta, P_calc, Q_calc, non_slack, idx_pq):
+    """
+    Reduced Jacobians [[J1 J2], [J3 J4]] of K cases, same formulas as
+    nr_solver.build_jacobian, built directly at the reduced size.
+
+    Returns:
+        np.ndarray: (K x m x m) stack, m = len(non_slack) + len(idx_pq)
+    """
+    ns, pq = non_slack, idx_pq
+    a = len(ns)
+    rows = np.concatenate((ns, pq))  # Bus of each row / column of the reduced Jacobian
+
+    # Off-diagonal terms M[i, k] = V_i conj(Y_ik) conj(V_k), evaluated only
+    # where the (reduced) Y-bus has entries; positions pairing a bus with
+    # itself (the block diagonals) are filled in below
+    Y_red = np.conj(Y_bus[..., rows[:, None], rows[None, :]])
+    Y_red[..., rows[:, None] == rows[None, :]] = 0.0
+    pattern = Y_red != 0 if Y_red.ndim == 2 else np.any(Y_red != 0, axis=0)
+    r, c = np.nonzero(pattern)
+    V_c = (V * np.exp(1j * Theta))[:, rows]
+    M = V_c[:, r] * Y_red[..., r, c] * np.conj(V_c[:, c])
+
+    # J1 / J4 take the sine (imaginary) term, J2 / J3 the cosine term;
+    # the magnitude columns are divided by V_k and J3 is negated
+    top, left = r < a, c < a
+    vals = np.where(top == left, M.imag, M.real)
+    vals[:, ~top & left] *= -1.0
+    vals[:, ~left] /= V[:, rows[c[~left]]]
+    J = np.zeros((len(V), len(rows), len(rows)))
+    J[:, r, c] = vals
+
+    # Diagonal terms; a PQ bus sits at row / column pq_pos of the angle block
+    Y_diag = np.diagonal(Y_bus, axis1=-2, axis2=-1)
+    G_ii, B_ii = Y_diag.real, Y_diag.imag
+    pq_pos = np.searchsorted(ns, pq)
+    pa, qa = np.arange(a), a + np.arange(len(pq))
+    J[:, pa, pa] = (-Q_calc - V**2 * B_ii)[:, ns]
+    J[:, pq_pos, qa] = (P_calc / V + V * G_ii)[:, pq]
+    J[:, qa, pq_pos] = (P_calc - V**2 * G_ii)[:, pq]
+    J[:, qa, qa] = (Q_calc / V - V * B_ii)[:, pq]
+    return J
+
+def _solve_stack(J, M):
+    """
+    np.linalg.solve over a (K x m x m) stack. A singular case makes the
+    stacked call fail, so the cases are then solved one by one.
+
+    Returns:
+        correction (K x m), ok (K,) bool: False where J was singular
+    """
+    try:
+        return np.linalg.solve(J, M[:, :, None])[:, :, 0], np.ones(len(J), dtype=bool)
+    except np.linalg.LinAlgError:
+        pass
+    correction = np.zeros_like(M)
+    ok = np.ones(len(J), dtype=bool)
+    for k in range(len(J)):
+        try:
+            correction[k] = np.linalg.solve(J[k], M[k])
+        except np.linalg.LinAlgError:
+            ok[k] = False
+    return correction, ok
+
+def _run_chunk(Y_bus, V, Theta, P_spec, Q_spec, non_slack, idx_pq, max_iter, tol):
+    """Solves the cases of one chunk in place; returns (P_calc, Q_calc, converged, iterations)."""
+    K = len(V)
+    n_ang = len(non_slack)
+    P_calc, Q_calc = np.zeros_like(V), np.zeros_like(V)
+    converged = np.zeros(K, dtype=bool)
+    failed = np.zeros(K, dtype=bool)
+    iterations = np.zeros(K, dtype=int)
+    active = np.arange(K)
+
+    for it in range(max_iter + 1):
+        Y = Y_bus if Y_bus.ndim == 2 else Y_bus[active]
+        P, Q = calc_power_injections_batch(Y, V[active], Theta[active])
+        P_calc[active], Q_calc[active] = P, Q
+        M = np.concatenate(((P_spec[active] - P)[:, non_slack], (Q_spec[active] - Q)[:, idx_pq]), axis=1)
+        mismatch = np.max(np.abs(M), axis=1) if M.shape[1] else np.zeros(len(active))
+
+        # Converged cases leave the batch; NaN / inf is a diverged case
+        done = mismatch < tol
+        converged[active[done]] = True
+        bad = ~np.isfinite(mismatch)
+        failed[active[bad]] = True
+        keep = ~(done | bad)
+        active, M = active[keep], M[keep]
+        P, Q = P[keep], Q[keep]
+        if len(active) == 0 or it == max_iter:
+            break
+
+        Y = Y_bus if Y_bus.ndim == 2 else Y_bus[active]
+        J = assemble_jacobian_batch(Y, V[active], Theta[active], P, Q, non_slack, idx_pq)
+        correction, ok = _solve_stack(J, M)
+        failed[active[~ok]] = True  # Singular Jacobian (voltage collapse)
+        active, correction = active[ok], correction[ok]
+
+        Theta[np.ix_(active, non_slack)] += correction[:, :n_ang]
+        V[np.ix_(active, idx_pq)] += correction[:, n_ang:]
+        iterations[active] += 1
+
+    return P_calc, Q_calc, converged & ~failed, iterations
+
+@instrumentation.traced("batch_load_flow")
+def run_batch_load_flow(Y_bus, bus_data, P_spec, Q_spec, max_iter=50, tol=1e-5, V0=None, Theta0=None,
+                        chunk=BATCH_CHUNK):
+    """
+    Newton-Raphson load flow of K cases of one network at once.
+
+    Injections and Jacobians of all unconverged cases are computed with
+    broadcasting and the K Newton steps with one np.linalg.solve over the
+    (K x m x m) Jacobian stack; converged cases are masked out of the
+    following iterations. Meant for many small (dense) networks, e.g. ML
+    data generation; every case follows the same iterates as
+    nr_solver.run_load_flow up to rounding.
+
+    Args:
+        Y_bus (array or sparse matrix): Shared (n x n) admittance matrix, or
+            a (K x n x n) stack of per-case matrices of the same size
+            (ValueError if the stack depth is not K)
+        bus_data (list or Network): Bus types and the default starting point
+        P_spec, Q_spec (np.ndarray): (K x n) specified injections (pu)
+        max_iter (int), tol (float): As in nr_solver.run_load_flow
+        V0, Theta0 (np.ndarray): (n,) or (K x n) starting point (None: bus_data's)
+        chunk (int): Cases per stacked solve, bounds the temporaries
+
+    Returns:
+        dict: V, Theta, P_calc, Q_calc ((K x n), NaN rows for failed
+        cases), converged ((K,) bool) and iterations ((K,) int)
+    """
+    _, types, V_start, Th_start, _, _ = network.bus_arrays(bus_data)
+    P_spec = np.atleast_2d(np.asarray(P_spec, dtype=float))
+    Q_spec = np.atleast_2d(np.asarray(Q_spec, dtype=float))
+    K, n = P_spec.shape
+
+    if isinstance(Y_bus, (list, tuple)):
+        Y_bus = np.stack([_dense(Y) for Y in Y_bus])
+    elif np.ndim(Y_bus) != 3:
+        Y_bus = _dense(Y_bus)
+    if Y_bus.ndim == 3 and len(Y_bus) != K:
+        raise ValueError(f"Y_bus stack holds {len(Y_bus)} matrices for {K} cases")
+    V = np.broadcast_to(V_start if V0 is None else V0, (K, n)).astype(float)
+    Theta = np.broadcast_to(Th_start if Theta0 is None else Theta0, (K, n)).astype(float)
+
+    idx_pq = np.where(types == 3)[0]
+    non_slack = np.sort(np.concatenate((np.where(types == 2)[0], idx_pq)))
+
+    P_calc, Q_calc = np.empty((K, n)), np.empty((K, n))
+    converged = np.zeros(K, dtype=bool)
+    iterations = np.zeros(K, dtype=int)
+    for start in range(0, K, chunk):
+        s = slice(start, min(K, start + chunk))
+        Y = Y_bus if Y_bus.ndim == 2 else Y_bus[s]
+        V_k, Th_k = V[s], Theta[s]  # Views: solved in place
+        P_calc[s], Q_calc[s], converged[s], iterations[s] = _run_chunk(
+            Y, V_k, Th_k, P_spec[s], Q_spec[s], non_slack, idx_pq, max_iter, tol)
+
+    for arr in (V, Theta, P_calc, Q_calc):
+        arr[~converged] = np.nan
+    return {'V': V, 'Theta': Theta, 'P_calc': P_calc, 'Q_calc': Q_calc,
+            'converged': converged, 'iterations': iterations}
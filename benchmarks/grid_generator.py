@@ -0,0 +1,103 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import network
+
+def generate_grid(n_bus, seed=0, pv_every=5, xfmr_share=0.05, chord_share=0.15):
+    """
+    Synthetic meshed grid in the bus_data / line_data layout of
+    ybus_generator.get_user_input.
+
+    Buses sit on a near-square lattice; a random spanning tree of the
+    lattice edges keeps it connected, part of the remaining lattice edges
+    and a few diagonals add the meshes. The slack is at the center, every
+    pv_every-th bus is a PV unit, the rest are loads. PV output covers the
+    total load, so the slack only carries losses and flows stay moderate
+    at any size. A share of the branches are transformer entries (N, rt,
+    xt without r/x).
+
+    Args:
+        n_bus (int): Number of buses (10 to 10,000 tested)
+        seed (int): Seed of the numpy Generator
+        pv_every (int): Spacing of the PV units
+        xfmr_share (float): Fraction of branches modelled as transformers
+        chord_share (float): Extra meshing edges per bus
+
+    Returns:
+        bus_data, line_data (list): Case dicts
+    """
+    rng = np.random.default_rng(seed)
+    cols = int(np.ceil(np.sqrt(n_bus)))
+    pos = np.arange(n_bus)
+    row, col = pos // cols, pos % cols
+
+    # Lattice edges (right / down neighbours), shuffled
+    right = pos[(col + 1 < cols) & (pos + 1 < n_bus)]
+    down = pos[pos + cols < n_bus]
+    edges = np.concatenate((np.column_stack((right, right + 1)), np.column_stack((down, down + cols))))
+    edges = edges[rng.permutation(len(edges))]
+
+    # Random spanning tree (Kruskal with union-find), then extra meshes
+    parent = list(range(n_bus))
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+    tree, rest = [], []
+    for a, b in edges.tolist():
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[ra] = rb
+            tree.append((a, b))
+        else:
+            rest.append((a, b))
+    n_extra = min(len(rest), int(chord_share * n_bus))
+    extra = [rest[k] for k in rng.choice(len(rest), n_extra, replace=False)] if n_extra else []
+    diag = pos[(col + 1 < cols) & (pos + cols + 1 < n_bus)]
+    if len(diag):
+        picks = rng.choice(diag, min(len(diag), max(1, n_bus // 50)), replace=False)
+        extra += [(int(a), int(a) + cols + 1) for a in picks]
+    branches = tree + extra
+
+    # Bus types: slack in the middle, evenly spread PV units
+    slack = int(row.max() // 2 * cols + cols // 2) if n_bus > cols else 0
+    slack = min(slack, n_bus - 1)
+    types = np.full(n_bus, 3)
+    types[::pv_every] = 2
+    types[slack] = 1
+
+    Pl = np.where(types == 3, rng.uniform(0.02, 0.08, n_bus), 0.0)
+    Ql = np.where(types == 3, Pl * rng.uniform(0.2, 0.4, n_bus), 0.0)
+    n_pv = int(np.sum(types == 2))
+    Pg = np.where(types == 2, Pl.sum() / max(n_pv, 1), 0.0)
+
+    bus_data = []
+    for i in range(n_bus):
+        bus_data.append({
+            'id': i + 1, 'type': int(types[i]),
+            'V': 1.02 if types[i] != 3 else 1.0, 'theta': 0.0,
+            'Pg': float(Pg[i]), 'Pl': float(Pl[i]), 'Qg': 0.0, 'Ql': float(Ql[i]),
+            'P_spec': float(Pg[i] - Pl[i]), 'Q_spec': float(-Ql[i]),
+            'P_max': float(3 * Pg[i]) if types[i] == 2 else 999.99,
+        })
+
+    line_data = []
+    is_xfmr = rng.random(len(branches)) < xfmr_share
+    km = rng.uniform(10.0, 60.0, len(branches))
+    for k, (a, b) in enumerate(branches):
+        line = {'from': a + 1, 'to': b + 1, 'voltage_kV': 230.0, 'length_km': float(km[k])}
+        if is_xfmr[k]:
+            line.update({'N': float(rng.choice([0.95, 0.975, 1.0, 1.025, 1.05])),
+                         'rt': 0.002, 'xt': float(rng.uniform(0.02, 0.05))})
+        else:
+            # 0.0001 + j0.0005 pu/km at 230 kV / 100 MVA, 0.00035 pu/km half-line charging
+            line.update({'r': 0.0001 * km[k], 'x': 0.0005 * km[k], 'b': 0.00035 * km[k], 'N': 0})
+        line_data.append(line)
+    return bus_data, line_data
+
+def generate_network(n_bus, seed=0, **kwargs):
+    """generate_grid as a network.Network."""
+    return network.Network.from_dicts(*generate_grid(n_bus, seed, **kwargs))
@@ -0,0 +1,249 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import grid_generator
+import network
+import ybus_generator
+import nr_solver
+import fdlf_solver
+import load_flow_session
+import batch_load_flow
+import state_estimation
+import line_parameters
+import simulator
+import automatic_generation_control
+import ufls_controller
+import load_fluctuator
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+DENSE_LIMIT = 2000      # Buses above which the dense backend is skipped (n x n complex matrices)
+BATCH_LIMIT = 500       # Buses above which nr_batch is skipped (BATCH_CHUNK stacked m x m Jacobians)
+WLS_DENSE_LIMIT = 500   # Buses above which the dense WLS estimate is skipped (dense H^T W H product)
+REGRESSION_RATIO = 1.2  # Median slowdown reported by --compare
+
+def time_call(fn, repeat=5, warmup=1):
+    """
+    Times fn() with time.perf_counter.
+
+    Returns:
+        stats (dict): min / median / mean / max seconds and the repeat count
+        result: Return value of the last call
+    """
+    for _ in range(warmup):
+        result = fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples), result
+
+def summarize(samples):
+    samples = np.asarray(samples, dtype=float)
+    return {'min': float(samples.min()), 'median': float(np.median(samples)),
+            'mean': float(samples.mean()), 'max': float(samples.max()), 'repeat': len(samples)}
+
+def bench_backend(bus_data, line_data, net, sparse, repeat):
+    """Y-bus build, load flow and line-state timings for one matrix backend."""
+    timings = {}
+    timings['ybus_dicts'], _ = time_call(lambda: ybus_generator.build_y_bus(bus_data, line_data, sparse=sparse), repeat)
+    timings['ybus_network'], Y_bus = time_call(lambda: ybus_generator.build_y_bus(net, sparse=sparse), repeat)
+
+    # Cold solves from the case's starting point (bus_arrays copies, so every call is identical)
+    timings['nr'], (V, Theta, _, _) = time_call(lambda: nr_solver.run_load_flow(Y_bus, net, simulator.SYSTEM_FREQ), repeat)
+    converged = V is not None
+    timings['fdlf'], _ = time_call(lambda: fdlf_solver.run_load_flow(Y_bus, net, None, simulator.SYSTEM_FREQ), repeat)
+
+    if not sparse and len(net) <= BATCH_LIMIT:
+        # One stacked batch of load-scaled cases (divide by BATCH_CHUNK for the per-case cost)
+        scale = np.where(net.pq_mask, np.linspace(0.9, 1.1, batch_load_flow.BATCH_CHUNK)[:, None], 1.0)
+        timings['nr_batch'], _ = time_call(
+            lambda: batch_load_flow.run_batch_load_flow(Y_bus, net, net.P_spec * scale, net.Q_spec * scale), repeat)
+
+    # Warm session solves after a small load step, alternating in sign
+    session = load_flow_session.LoadFlowSession(Y_bus, net)
+    session.solve()
+    pq = net.ids[net.pq_mask].tolist()
+    sign = [1.0]
+    def warm_solve():
+        sign[0] = -sign[0]
+        session.update_injections(pq, dP=sign[0] * 1e-3)
+        return session.solve()
+    timings['session_nr'], _ = time_call(warm_solve, repeat)
+
+    if converged:
+        _, arrays = net.line_arrays()
+        timings['line_states'], _ = time_call(
+            lambda: line_parameters.compute_all_line_states(arrays, V, Theta, Y_bus), repeat)
+
+    if converged and (sparse or len(net) <= WLS_DENSE_LIMIT):
+        # WLS estimate from a full noisy measurement set of the solved case
+        estimator = state_estimation.StateEstimator(net, Y_bus=Y_bus, sparse=sparse)
+        meas = state_estimation.simulate_measurements(net, V, Theta, seed=0, Y_bus=Y_bus)
+        timings['wls'], _ = time_call(lambda: estimator.estimate(meas), repeat)
+    return timings, converged
+
+def bench_simulation(n_bus, seed, steps):
+    """Headless Simulator: initialization and per-step wall time."""
+    net = grid_generator.generate_network(n_bus, seed)
+    sim = simulator.Simulator(net, None, load_fluctuator.LoadFluctuator(interval=5, seed=seed),
+                              ufls_controller.UFLS(filename=None),
+                              automatic_generation_control.AGC(K_p=2.0, K_i=0.02),
+                              duration=steps, record_states=False)
+    start = time.perf_counter()
+    sim.initialize()
+    init = time.perf_counter() - start
+    if sim.collapsed:
+        return {'initialize': init, 'collapsed': True}
+
+    samples = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        state = sim.step()
+        samples.append(time.perf_counter() - start)
+        if state is None:
+            break
+    return {'initialize': init, 'step': summarize(samples), 'load_flows': sim.load_flows,
+            'collapsed': sim.collapsed}
+
+def run_case(n_bus, backends, repeat=5, seed=0, sim_steps=10):
+    """
+    All benchmarks for one synthetic grid size.
+
+    Returns:
+        dict: Case size, per-backend timings and the simulation step timings
+    """
+    bus_data, line_data = grid_generator.generate_grid(n_bus, seed)
+    net = network.Network.from_dicts(bus_data, line_data)
+    entry = {'n_bus': n_bus, 'n_line': len(line_data),
+             'n_transformer': sum(1 for l in line_data if 'rt' in l), 'seed': seed, 'backends': {}}
+
+    for backend in backends:
+        if backend == 'sparse' and nr_solver.sp is None:
+            entry['backends'][backend] = {'skipped': 'scipy not installed'}
+            continue
+        if backend == 'dense' and n_bus > DENSE_LIMIT:
+            entry['backends'][backend] = {'skipped': f'more than {DENSE_LIMIT} buses'}
+            continue
+        timings, converged = bench_backend(bus_data, line_data, net, backend == 'sparse', repeat)
+        entry['backends'][backend] = {'converged': converged, 'timings': timings}
+
+    if sim_steps > 0:
+        entry['simulation'] = bench_simulation(n_bus, seed, sim_steps)
+    return entry
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+def metadata(args):
+    try:
+        import scipy
+        scipy_version = scipy.__version__
+    except ImportError:
+        scipy_version = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy_version,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'sizes': args.sizes, 'backends': args.backends, 'repeat': args.repeat,
+        'seed': args.seed, 'sim_steps': args.sim_steps,
+    }
+
+def flatten(results):
+    """(n_bus, backend, benchmark) -> median seconds, for comparisons."""
+    flat = {}
+    for entry in results['results']:
+        for backend, data in entry['backends'].items():
+            for name, stats in data.get('timings', {}).items():
+                flat[(entry['n_bus'], backend, name)] = stats['median']
+        if 'step' in entry.get('simulation', {}):
+            flat[(entry['n_bus'], 'simulator', 'step')] = entry['simulation']['step']['median']
+    return flat
+
+def compare(old, new, ratio=REGRESSION_RATIO):
+    """
+    Median-time ratios new / old of the benchmarks present in both result sets.
+
+    Returns:
+        list: (n_bus, backend, benchmark, old_s, new_s, ratio, regressed) rows
+    """
+    old_flat, new_flat = flatten(old), flatten(new)
+    rows = []
+    for key in sorted(old_flat.keys() & new_flat.keys()):
+        r = new_flat[key] / old_flat[key] if old_flat[key] > 0 else np.inf
+        rows.append(key + (old_flat[key], new_flat[key], r, r > ratio))
+    return rows
+
+def print_results(results):
+    print(f"{'Buses':>7} {'Backend':<9} {'Benchmark':<14} {'Median (ms)':>12} {'Min (ms)':>10}")
+    for entry in results['results']:
+        for backend, data in entry['backends'].items():
+            if 'skipped' in data:
+                print(f"{entry['n_bus']:>7} {backend:<9} {'(skipped: ' + data['skipped'] + ')'}")
+                continue
+            if not data['converged']:
+                print(f"   [WARNING] {entry['n_bus']} buses / {backend}: load flow did not converge")
+            for name, stats in data['timings'].items():
+                print(f"{entry['n_bus']:>7} {backend:<9} {name:<14} {stats['median']*1e3:>12.3f} {stats['min']*1e3:>10.3f}")
+        sim = entry.get('simulation')
+        if sim is not None and 'step' in sim:
+            print(f"{entry['n_bus']:>7} {'simulator':<9} {'step':<14} {sim['step']['median']*1e3:>12.3f} {sim['step']['min']*1e3:>10.3f}")
+
+def print_comparison(rows, ratio=REGRESSION_RATIO):
+    print(f"\n{'Buses':>7} {'Backend':<9} {'Benchmark':<14} {'Old (ms)':>10} {'New (ms)':>10} {'Ratio':>7}")
+    for n_bus, backend, name, old_s, new_s, r, regressed in rows:
+        flag = "  <-- REGRESSION" if regressed else ""
+        print(f"{n_bus:>7} {backend:<9} {name:<14} {old_s*1e3:>10.3f} {new_s*1e3:>10.3f} {r:>7.2f}{flag}")
+    n_bad = sum(row[-1] for row in rows)
+    if n_bad:
+        print(f"\n[WARNING] {n_bad} benchmark(s) more than {ratio:.2f}x slower than the baseline")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-flow benchmarks on synthetic meshed grids.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Bus counts to benchmark")
+    parser.add_argument("--backends", nargs="+", choices=["dense", "sparse"], default=["dense", "sparse"],
+                        help="Matrix backends for Y-bus, load flow and line states")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Grid generator seed")
+    parser.add_argument("--sim-steps", type=int, default=10, help="Simulator steps to time (0: skip)")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier results file to compare against")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {'metadata': metadata(args), 'results': []}
+    for n_bus in args.sizes:
+        print(f"Benchmarking {n_bus} buses...")
+        results['results'].append(run_case(n_bus, args.backends, args.repeat, args.seed, args.sim_steps))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print()
+    print_results(results)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print_comparison(compare(baseline, results))
+
+if __name__ == "__main__":
+    main()
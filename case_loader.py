@@ -0,0 +1,179 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import numpy as np
+import network
+
+CACHE_DIR = ".case_cache"
+CACHE_VERSION = 2  # Part of the cache key: bump when a parser or the fields stored by Network.save_npz change
+
+def _make_bus(bid, type_code, V, theta_deg, Pg, Pl, Qg, Ql, P_max=999.99, area=1):
+    """Same bus dict layout as ybus_generator.get_user_input."""
+    return {
+        'id': int(bid),
+        'type': int(type_code),
+        'V': float(V),
+        'theta': np.radians(float(theta_deg)),
+        'Pg': float(Pg), 'Pl': float(Pl), 'Qg': float(Qg), 'Ql': float(Ql),
+        'P_spec': float(Pg) - float(Pl),
+        'Q_spec': float(Qg) - float(Ql),
+        'P_max': float(P_max),
+        'area': int(area),
+    }
+
+def _make_line(entry):
+    """Line dict from a loose mapping; transformer entries carry N, rt and xt."""
+    line = {'from': int(entry['from']), 'to': int(entry['to'])}
+    for key in ('r', 'x', 'b', 'rt', 'xt', 'voltage_kV', 'length_km'):
+        if entry.get(key) not in (None, ''):
+            line[key] = float(entry[key])
+    line['N'] = float(entry.get('N') or 0)
+    if line['N'] == int(line['N']): line['N'] = int(line['N'])
+    return line
+
+# --- JSON ---
+def parse_json(path):
+    """
+    JSON case: {"bus_data": [...], "line_data": [...]} with the same keys as
+    the interactive input (theta in degrees, P_max and area optional).
+    """
+    with open(path) as f:
+        case = json.load(f)
+    bus_data = [_make_bus(b['id'], b['type'], b['V'], b.get('theta', 0.0), b['Pg'], b['Pl'],
+                          b['Qg'], b['Ql'], b.get('P_max', 999.99), b.get('area', 1)) for b in case['bus_data']]
+    line_data = [_make_line(l) for l in case['line_data']]
+    return bus_data, line_data
+
+# --- CSV ---
+def _csv_pair(path):
+    """Returns the (<name>_bus.csv, <name>_line.csv) pair for either file."""
+    base = re.sub(r'_(bus|line)\.csv$', '', path)
+    return base + '_bus.csv', base + '_line.csv'
+
+def parse_csv(path):
+    """
+    CSV case split in <name>_bus.csv and <name>_line.csv, with headers named
+    like the JSON keys. Either file of the pair can be passed.
+    """
+    bus_path, line_path = _csv_pair(path)
+    with open(bus_path, newline='') as f:
+        bus_data = [_make_bus(b['id'], b['type'], b['V'], b.get('theta') or 0.0, b['Pg'], b['Pl'],
+                              b['Qg'], b['Ql'], b.get('P_max') or 999.99, b.get('area') or 1)
+                    for b in csv.DictReader(f)]
+    with open(line_path, newline='') as f:
+        line_data = [_make_line(l) for l in csv.DictReader(f)]
+    return bus_data, line_data
+
+# --- MATPOWER ---
+def _matpower_matrix(text, name):
+    match = re.search(r'mpc\.' + name + r'\s*=\s*\[(.*?)\]', text, re.S)
+    if not match:
+        return np.zeros((0, 0))
+    rows = []
+    for row in re.split(r'[;\n]', match.group(1)):
+        row = row.strip()
+        if row:
+            rows.append([float(v) for v in row.replace(',', ' ').split()])
+    return np.array(rows)
+
+def parse_matpower(path):
+    """
+    MATPOWER case file (version 2). Bus types are mapped to 1=Slack, 2=PV,
+    3=PQ; isolated buses and out-of-service branches/generators are dropped.
+    Branches with a tap become transformer entries (N, rt, xt). Bus shunts and
+    phase shifters have no counterpart in build_y_bus and are ignored.
+    """
+    with open(path) as f:
+        text = re.sub(r'%.*', '', f.read())
+
+    base_mva = float(re.search(r'mpc\.baseMVA\s*=\s*([\d.eE+-]+)', text).group(1))
+    bus = _matpower_matrix(text, 'bus')
+    gen = _matpower_matrix(text, 'gen')
+    branch = _matpower_matrix(text, 'branch')
+
+    # Aggregate in-service generators per bus
+    gen_p, gen_q, gen_pmax, gen_v = {}, {}, {}, {}
+    for g in gen:
+        if len(g) > 7 and g[7] <= 0: continue
+        bid = int(g[0])
+        gen_p[bid] = gen_p.get(bid, 0.0) + g[1] / base_mva
+        gen_q[bid] = gen_q.get(bid, 0.0) + g[2] / base_mva
+        gen_pmax[bid] = gen_pmax.get(bid, 0.0) + g[8] / base_mva
+        gen_v[bid] = g[5]
+
+    type_map = {3: 1, 2: 2, 1: 3}
+    bus_data = []
+    base_kv = {}
+    for b in bus:
+        bid, mp_type = int(b[0]), int(b[1])
+        if mp_type == 4: continue
+        type_code = type_map[mp_type]
+        if type_code == 2 and bid not in gen_p:
+            type_code = 3  # PV bus without an in-service unit
+        p_max = gen_pmax.get(bid, 999.99) if type_code in (1, 2) else 999.99
+        bus_data.append(_make_bus(bid, type_code, gen_v.get(bid, b[7]), b[8],
+                                  gen_p.get(bid, 0.0), b[2] / base_mva,
+                                  gen_q.get(bid, 0.0), b[3] / base_mva, p_max, b[6]))
+        base_kv[bid] = b[9]
+
+    line_data = []
+    for br in branch:
+        if len(br) > 10 and br[10] <= 0: continue
+        entry = {'from': br[0], 'to': br[1]}
+        if base_kv.get(int(br[0]), 0) > 0:
+            entry['voltage_kV'] = base_kv[int(br[0])]
+        tap = br[8]
+        if tap not in (0.0, 1.0):
+            entry.update({'N': tap, 'rt': br[2], 'xt': br[3]})
+        else:
+            entry.update({'r': br[2], 'x': br[3], 'b': br[4] / 2})  # Repo stores half-line B
+        line_data.append(_make_line(entry))
+    return bus_data, line_data
+
+# --- Binary cache ---
+def _file_hash(paths):
+    """Cache key: SHA-256 of CACHE_VERSION and the source bytes."""
+    h = hashlib.sha256(f"case_cache v{CACHE_VERSION}\n".encode())
+    for p in paths:
+        with open(p, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+def save_case_cache(cache_path, net):
+    """Stores the Network columns in an uncompressed .npz."""
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    net.save_npz(cache_path)
+
+PARSERS = {'.m': parse_matpower, '.json': parse_json, '.csv': parse_csv}
+
+def load_network(path, use_cache=True, cache_dir=CACHE_DIR):
+    """
+    Loads a case file (.m MATPOWER, .json, or _bus/_line .csv pair) into a
+    network.Network.
+
+    The parsed network is cached as .npz under cache_dir, keyed by the hash of
+    the source file(s) and CACHE_VERSION; a cache hit maps the arrays straight into the Network
+    without building any per-bus dicts.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in PARSERS:
+        raise ValueError(f"Unsupported case file type: {ext}")
+
+    sources = list(_csv_pair(path)) if ext == '.csv' else [path]
+    cache_path = None
+    if use_cache:
+        cache_path = os.path.join(cache_dir, _file_hash(sources) + '.npz')
+        if os.path.isfile(cache_path):
+            return network.Network.load_npz(cache_path)
+
+    net = network.Network.from_dicts(*PARSERS[ext](path))
+    if cache_path is not None:
+        save_case_cache(cache_path, net)
+    return net
+
+def load_case(path, use_cache=True, cache_dir=CACHE_DIR):
+    """Same as load_network, as the bus_data / line_data dict lists."""
+    return load_network(path, use_cache, cache_dir).to_dicts()
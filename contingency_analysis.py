@@ -0,0 +1,345 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+import network
+import ybus_generator
+import nr_solver
+import line_parameters
+import load_flow_session
+
+# --- COLOR CODES ---
+RED = "\033[91m"
+RESET = "\033[0m"
+
+SERIAL_CASES = 64  # Default sweeps with fewer contingencies run in-process (pool start-up would dominate)
+
+class ContingencyAnalyzer:
+    def __init__(self, bus_data, line_data=None, sparse=False, v_min=0.95, v_max=1.05, max_iter=30, tol=1e-5):
+        """
+        N-1 screening around one solved base case.
+
+        The base Jacobian is factorized once. A branch outage only changes the
+        Jacobian in the P/Q rows and angle/voltage columns of its two end buses
+        (at most 4 x 4), so each outage is solved with chord iterations on the
+        base LU corrected through the Woodbury identity. A PV unit outage adds
+        one Q row / V column and is solved by bordering the base LU. Neither
+        rebuilds the Y-Bus or refactorizes the full Jacobian; cases that do not
+        settle fall back to a full NR solve.
+
+        Args:
+            bus_data (list or Network): Base case buses
+            line_data (list): Line dicts (None: the Network's own lines)
+            sparse (bool): Use the sparse Y-Bus / LU backend
+            v_min, v_max (float): Voltage limits (pu)
+            max_iter (int): Chord iterations before falling back to full NR
+            tol (float): Convergence tolerance on the power mismatch (pu)
+        """
+        net = bus_data if isinstance(bus_data, network.Network) else network.Network.from_dicts(bus_data, line_data)
+        self.net = net
+        self.v_min = v_min
+        self.v_max = v_max
+        self.max_iter = max_iter
+        self.tol = tol
+
+        self.Y_bus = ybus_generator.build_y_bus(net, sparse=sparse)
+        self.sparse = nr_solver.sp is not None and nr_solver.sp.issparse(self.Y_bus)
+
+        session = load_flow_session.LoadFlowSession(self.Y_bus, net, tol=tol)
+        V, Theta, P_calc, Q_calc = session.solve()
+        if V is None:
+            raise np.linalg.LinAlgError("Base case load flow did not converge")
+
+        self.id_map = session.id_map
+        self.V0, self.Theta0 = V, Theta
+        self.P_spec, self.Q_spec = session.P_spec, session.Q_spec
+        self.non_slack, self.idx_pq = session.non_slack, session.idx_pq
+
+        J_base = nr_solver.assemble_jacobian(self.Y_bus, V, Theta, P_calc, Q_calc,
+                                             self.non_slack, self.idx_pq)
+        self._solve_base = nr_solver.factorize_jacobian(J_base)
+
+        # Full-size blocks at the base point, for bordering in unit outages
+        if self.sparse:
+            self._J_full = nr_solver.build_jacobian_sparse(self.Y_bus, V, Theta, P_calc, Q_calc)
+        else:
+            self._J_full = nr_solver.build_jacobian(self.Y_bus, V, Theta, P_calc, Q_calc)
+
+        # Position of each bus among the P rows / Q rows of the reduced Jacobian
+        n = len(net)
+        self._p_row = np.full(n, -1)
+        self._p_row[self.non_slack] = np.arange(len(self.non_slack))
+        self._q_row = np.full(n, -1)
+        self._q_row[self.idx_pq] = len(self.non_slack) + np.arange(len(self.idx_pq))
+
+        # Static per-branch conductor data (in-service lines) for the thermal checks
+        self._line_idx, self._line_arrays = net.line_arrays()
+        self._bridges = self._find_bridges()
+
+    def _find_bridges(self):
+        """Line numbers (rows of line_columns) whose outage islands part of the network (Tarjan)."""
+        adj = [[] for _ in range(len(self.net))]
+        ends = zip(self._line_idx.tolist(), self._line_arrays['from_idx'].tolist(), self._line_arrays['to_idx'].tolist())
+        for k, i, j in ends:
+            if i != j:
+                adj[i].append((j, k))
+                adj[j].append((i, k))
+
+        disc, low, bridges = {}, {}, set()
+        timer = 0
+        for root in range(len(adj)):
+            if root in disc: continue
+            disc[root] = low[root] = timer
+            timer += 1
+            stack = [(root, -1, iter(adj[root]))]
+            while stack:
+                node, parent_edge, neighbours = stack[-1]
+                for nb, k in neighbours:
+                    if k == parent_edge: continue  # Parallel branches have their own index
+                    if nb in disc:
+                        low[node] = min(low[node], disc[nb])
+                    else:
+                        disc[nb] = low[nb] = timer
+                        timer += 1
+                        stack.append((nb, k, iter(adj[nb])))
+                        break
+                else:
+                    stack.pop()
+                    if stack:
+                        parent = stack[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                        if low[node] > disc[parent]:
+                            bridges.add(parent_edge)
+        return bridges
+
+    def _chord(self, Y_post, P_spec, Q_spec, idx_pq, solve):
+        """Chord iterations from the base solution with a fixed linear solver."""
+        V = self.V0.copy()
+        Theta = self.Theta0.copy()
+        n_ang = len(self.non_slack)
+        for it in range(self.max_iter):
+            P_calc, Q_calc = nr_solver.calc_power_injections(Y_post, V, Theta)
+            M_final = np.concatenate(((P_spec - P_calc)[self.non_slack], (Q_spec - Q_calc)[idx_pq]))
+            if np.max(np.abs(M_final)) < self.tol:
+                return V, Theta
+            correction = solve(M_final)
+            Theta[self.non_slack] += correction[:n_ang]
+            V[idx_pq] += correction[n_ang:]
+        return None, None
+
+    def line_name(self, k):
+        cols = self.net.line_columns
+        return f"{int(cols['from'][k])}-{int(cols['to'][k])}"
+
+    def _full_nr(self, Y_post, b_post):
+        for i, b in enumerate(b_post):
+            b['V'] = self.V0[i]
+            b['theta'] = self.Theta0[i]
+        session = load_flow_session.LoadFlowSession(Y_post, b_post, tol=self.tol)
+        V, Theta, _, _ = session.solve()
+        return V, Theta
+
+    def solve_branch_outage(self, line):
+        """
+        Solves the post-contingency load flow of one branch outage.
+
+        Args:
+            line (int): Line number (row of the Network's line_columns)
+
+        Returns:
+            V, Theta, Y_post: Solution (None if it failed) and post-outage Y-Bus
+        """
+        rows, cols, vals = self.net.branch_stamps([line])
+        if self.sparse:
+            n = len(self.net)
+            Y_post = (self.Y_bus + nr_solver.sp.coo_matrix((-vals, (rows, cols)), shape=(n, n))).tocsr()
+        else:
+            Y_post = self.Y_bus.copy()
+            np.add.at(Y_post, (rows, cols), -vals)
+
+        # Jacobian change at the base voltages, on the end buses only
+        # (the Jacobian is linear in Y-Bus for fixed voltages)
+        buses = np.unique(rows)
+        local = {bus: k for k, bus in enumerate(buses)}
+        dY = np.zeros((len(buses), len(buses)), dtype=complex)
+        np.add.at(dY, ([local[r] for r in rows], [local[c] for c in cols]), -vals)
+        V_loc, Th_loc = self.V0[buses], self.Theta0[buses]
+        dP, dQ = nr_solver.calc_power_injections(dY, V_loc, Th_loc)
+        ns_loc = np.where(self._p_row[buses] >= 0)[0]
+        pq_loc = np.where(self._q_row[buses] >= 0)[0]
+        dJ = nr_solver.assemble_jacobian(dY, V_loc, Th_loc, dP, dQ, ns_loc, pq_loc)
+        r_idx = np.concatenate((self._p_row[buses[ns_loc]], self._q_row[buses[pq_loc]]))
+
+        # Woodbury: (J + E dJ E^T)^-1 b = y - Z (I + dJ Z_r)^-1 dJ y_r,  y = J^-1 b, Z = J^-1 E
+        E = np.zeros((len(self.non_slack) + len(self.idx_pq), len(r_idx)))
+        E[r_idx, np.arange(len(r_idx))] = 1.0
+        Z = self._solve_base(E).reshape(E.shape)
+        S = np.eye(len(r_idx)) + dJ @ Z[r_idx]
+
+        def solve(rhs):
+            y = self._solve_base(rhs)
+            return y - Z @ np.linalg.solve(S, dJ @ y[r_idx])
+
+        try:
+            V, Theta = self._chord(Y_post, self.P_spec, self.Q_spec, self.idx_pq, solve)
+        except np.linalg.LinAlgError:
+            V = None
+        if V is None:
+            V, Theta = self._full_nr(Y_post, [dict(b) for b in self.net])
+        return V, Theta, Y_post
+
+    def solve_generator_outage(self, bus_id):
+        """
+        Solves the load flow with the unit at a PV bus out of service.
+
+        The bus stays in the network as a PQ bus with its load, and the slack
+        picks up the lost generation. The new V unknown borders the base
+        Jacobian: [[J, b], [c, d]], solved through the Schur complement.
+
+        Returns:
+            V, Theta, Y_bus: Solution (None if it failed) and the unchanged Y-Bus
+        """
+        g = self.id_map[bus_id]
+        P_spec = self.P_spec.copy()
+        Q_spec = self.Q_spec.copy()
+        P_spec[g] = -self.net.Pl[g]
+        Q_spec[g] = -self.net.Ql[g]
+
+        J1, J2, J3, J4 = self._J_full
+        if self.sparse:
+            col_2 = J2[:, [g]].toarray().ravel()
+            col_4 = J4[:, [g]].toarray().ravel()
+            row_3 = J3[[g], :].toarray().ravel()
+            row_4 = J4[[g], :].toarray().ravel()
+        else:
+            col_2, col_4, row_3, row_4 = J2[:, g], J4[:, g], J3[g, :], J4[g, :]
+        b_col = np.concatenate((col_2[self.non_slack], col_4[self.idx_pq]))
+        c_row = np.concatenate((row_3[self.non_slack], row_4[self.idx_pq]))
+        Jb = self._solve_base(b_col)
+        schur = row_4[g] - c_row @ Jb
+
+        def solve(rhs):
+            y = self._solve_base(rhs[:-1])
+            x_g = (rhs[-1] - c_row @ y) / schur
+            return np.append(y - Jb * x_g, x_g)
+
+        V = None
+        if schur != 0.0:
+            V, Theta = self._chord(self.Y_bus, P_spec, Q_spec, np.append(self.idx_pq, g), solve)
+        if V is None:
+            b_post = [dict(b) for b in self.net]
+            b_post[g].update({'type': 3, 'Pg': 0.0, 'Qg': 0.0,
+                              'P_spec': P_spec[g], 'Q_spec': Q_spec[g]})
+            V, Theta = self._full_nr(self.Y_bus, b_post)
+        return V, Theta, self.Y_bus
+
+    def check_limits(self, name, V, Theta, Y_post, outaged_line=None):
+        """
+        Collects voltage and thermal violations of one post-contingency state.
+
+        Args:
+            outaged_line (int): Line number left out of the thermal check
+
+        Returns:
+            dict: 'contingency', 'converged', 'v_violations' [(bus, V)],
+            'thermal_violations' [(line, T_c, T_max)] and 'severity'
+        """
+        result = {'contingency': name, 'converged': V is not None,
+                  'v_violations': [], 'thermal_violations': [], 'severity': np.inf}
+        if V is None:
+            return result
+
+        severity = 0.0
+        for bid, v in zip(self.net.ids.tolist(), V.tolist()):
+            if v < self.v_min or v > self.v_max:
+                result['v_violations'].append((bid, v))
+                severity += max(self.v_min - v, v - self.v_max)
+
+        I_a, T_c, S_g, T_max = line_parameters.compute_all_line_states(self._line_arrays, V, Theta, Y_post)
+        for k in np.where(T_c > T_max)[0]:
+            line = self._line_idx[k]
+            if line == outaged_line: continue
+            result['thermal_violations'].append((self.line_name(line), T_c[k], T_max[k]))
+            severity += T_c[k] / T_max[k] - 1.0
+
+        result['severity'] = severity
+        return result
+
+    def run_case(self, kind, index):
+        """
+        Runs one contingency: kind "line" with a line number (row of the
+        Network's line_columns) or "gen" with a bus index.
+        """
+        if kind == "line":
+            name = f"Line {self.line_name(index)}"
+            if index in self._bridges:
+                result = self.check_limits(name, None, None, None)
+                result['islanded'] = True
+                return result
+            V, Theta, Y_post = self.solve_branch_outage(index)
+            return self.check_limits(name, V, Theta, Y_post, outaged_line=index)
+
+        bus_id = int(self.net.ids[index])
+        V, Theta, Y_post = self.solve_generator_outage(bus_id)
+        return self.check_limits(f"Gen {bus_id}", V, Theta, Y_post)
+
+    def cases(self):
+        """All N-1 contingencies: every in-service branch and every PV unit."""
+        lines = [("line", k) for k in self._line_idx.tolist()]
+        gens = [("gen", i) for i in np.flatnonzero(self.net.types == 2).tolist()]
+        return lines + gens
+
+# Analyzer of the current worker process, built once by _init_worker
+_ANALYZER = None
+
+def _init_worker(bus_data, line_data, options):
+    global _ANALYZER
+    _ANALYZER = ContingencyAnalyzer(bus_data, line_data, **options)
+
+def _run_chunk(chunk):
+    return [_ANALYZER.run_case(kind, index) for kind, index in chunk]
+
+def run_n1_analysis(bus_data, line_data=None, max_workers=None, **options):
+    """
+    Runs the full N-1 sweep and ranks the contingencies by severity.
+
+    Args:
+        bus_data (list or Network): Base case buses
+        line_data (list): Line dicts (None: the Network's own lines)
+        max_workers (int): Worker processes, each factorizing the base case
+            once (None = all cores, or in-process below SERIAL_CASES
+            contingencies). Use 1 to run in-process.
+        **options: Passed to ContingencyAnalyzer (sparse, v_min, v_max, ...)
+
+    Returns:
+        list: Result dicts of ContingencyAnalyzer.check_limits, most severe
+        first (non-converged / islanded cases on top)
+    """
+    analyzer = ContingencyAnalyzer(bus_data, line_data, **options)
+    cases = analyzer.cases()
+    net = analyzer.net  # Shipped to the workers instead of the dicts
+
+    if max_workers == 1 or (max_workers is None and len(cases) < SERIAL_CASES):
+        results = [analyzer.run_case(kind, index) for kind, index in cases]
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        size = max(1, -(-len(cases) // (4 * workers)))
+        chunks = [cases[k:k + size] for k in range(0, len(cases), size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(net, None, options)) as pool:
+            results = [r for chunk in pool.map(_run_chunk, chunks) for r in chunk]
+
+    # Stable sort: ties keep the case order, so the ranking is reproducible
+    results.sort(key=lambda r: r['severity'], reverse=True)
+    return results
+
+def print_ranking(results, top=20):
+    """Prints the ranked violation table."""
+    print(f"\n{'Rank':<5} {'Contingency':<14} {'Severity':<10} {'V viol.':<8} {'Thermal viol.':<14}")
+    for rank, r in enumerate(results[:top], start=1):
+        if not r['converged']:
+            status = "ISLANDED" if r.get('islanded') else "NO CONVERGENCE"
+            print(f"{rank:<5} {r['contingency']:<14} {RED}{status}{RESET}")
+            continue
+        print(f"{rank:<5} {r['contingency']:<14} {r['severity']:<10.4f} "
+              f"{len(r['v_violations']):<8} {len(r['thermal_violations']):<14}")
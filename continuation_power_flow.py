@@ -0,0 +1,219 @@
+import numpy as np
+
+import network
+import nr_solver
+import instrumentation
+
+def load_direction(bus_data):
+    """
+    Injection change per unit of load parameter lambda, along the
+    LoadFluctuator direction: every PQ bus scales Pl and Ql by (1 + lambda).
+
+    Returns:
+        dP, dQ (np.ndarray): dP_spec / dlambda and dQ_spec / dlambda per bus
+    """
+    if isinstance(bus_data, network.Network):
+        Pl, Ql, pq = bus_data.Pl, bus_data.Ql, bus_data.pq_mask
+    else:
+        Pl = np.array([b['Pl'] for b in bus_data], dtype=float)
+        Ql = np.array([b['Ql'] for b in bus_data], dtype=float)
+        pq = np.array([b['type'] == 3 for b in bus_data])
+    return np.where(pq, -Pl, 0.0), np.where(pq, -Ql, 0.0)
+
+class ContinuationPowerFlow:
+    def __init__(self, Y_bus, bus_data, step=0.1, step_min=1e-3, step_max=0.5, tol=1e-5,
+                 chord_tol=1e-2, max_corrector=10, max_steps=200):
+        """
+        Predictor-corrector continuation of the load flow along the
+        LoadFluctuator load direction, up to the nose of the PV curve.
+
+        The unknowns are the NR ones (angles of non-slack buses, magnitudes
+        of PQ buses) plus the load parameter lambda. Each step predicts along
+        the tangent and corrects with Newton on the load flow equations plus
+        one fixed continuation parameter (lambda at first, the fastest moving
+        unknown near the nose), so the augmented Jacobian stays regular at
+        the nose where the plain NR Jacobian is singular. The last factorized
+        augmented Jacobian is reused for the next tangent and as a chord
+        Jacobian in the corrector (as in LoadFlowSession); it is refactorized
+        only while the mismatch is above chord_tol, when the corrector stops
+        contracting or when the continuation parameter changes.
+
+        Args:
+            Y_bus (array or sparse matrix): Bus admittance matrix
+            bus_data (list or Network): Base case (starting point and loads)
+            step (float): Initial step length along the normalized tangent
+            step_min, step_max (float): Step-size bounds; the nose is located
+                to within step_min
+            tol (float): Corrector tolerance on the power mismatch (pu)
+            chord_tol (float): Mismatch below which the old factorization is reused
+            max_corrector (int): Corrector iterations before the step is halved
+            max_steps (int): Accepted steps before giving up
+        """
+        self.Y_bus = Y_bus
+        self.step = step
+        self.step_min = step_min
+        self.step_max = step_max
+        self.tol = tol
+        self.chord_tol = chord_tol
+        self.max_corrector = max_corrector
+        self.max_steps = max_steps
+
+        self.ids, types, self.V, self.Theta, self.P_spec, self.Q_spec = network.bus_arrays(bus_data)
+        self.dP, self.dQ = load_direction(bus_data)
+        self.idx_pq = np.where(types == 3)[0]
+        self.non_slack = np.sort(np.concatenate((np.where(types == 2)[0], self.idx_pq)))
+        self.n_ang = len(self.non_slack)
+        self.m = self.n_ang + len(self.idx_pq)  # Position of lambda in z
+        self.d = np.concatenate((self.dP[self.non_slack], self.dQ[self.idx_pq]))
+        self.sparse = nr_solver.sp is not None and nr_solver.sp.issparse(Y_bus)
+
+        self.factorizations = 0
+        self._solve = None  # (k, solve) of the last factorized augmented Jacobian
+
+    # --- State vector z = [Theta(non-slack), V(PQ), lambda] ---
+    def _apply(self, z):
+        self.Theta[self.non_slack] = z[:self.n_ang]
+        self.V[self.idx_pq] = z[self.n_ang:self.m]
+
+    def _mismatch(self, z):
+        """Load flow residual calc - spec(lambda) of the NR equations at z."""
+        self._apply(z)
+        P_calc, Q_calc = nr_solver.calc_power_injections(self.Y_bus, self.V, self.Theta)
+        lam = z[self.m]
+        G = np.concatenate(((P_calc - self.P_spec - lam * self.dP)[self.non_slack],
+                            (Q_calc - self.Q_spec - lam * self.dQ)[self.idx_pq]))
+        return G, P_calc, Q_calc
+
+    def _factorize(self, z, P_calc, Q_calc, k):
+        """Factorizes [[J, -d], [e_k]] at z."""
+        J = nr_solver.assemble_jacobian(self.Y_bus, self.V, self.Theta, P_calc, Q_calc,
+                                        self.non_slack, self.idx_pq)
+        m = self.m
+        if self.sparse:
+            sp = nr_solver.sp
+            row = sp.csr_matrix(([1.0], ([0], [k])), shape=(1, m + 1))
+            A = sp.vstack((sp.hstack((J, sp.csc_matrix(-self.d[:, None]))), row), format='csc')
+        else:
+            A = np.zeros((m + 1, m + 1))
+            A[:m, :m] = J
+            A[:m, m] = -self.d
+            A[m, k] = 1.0
+        self._solve = (k, nr_solver.factorize_jacobian(A))
+        self.factorizations += 1
+
+    def _correct(self, z_pred, k):
+        """
+        Newton corrector with z[k] held at its predicted value.
+
+        Returns:
+            z (np.ndarray) and the iteration count, or (None, iterations)
+        """
+        z = z_pred.copy()
+        last = np.inf
+        for it in range(self.max_corrector):
+            G, P_calc, Q_calc = self._mismatch(z)
+            mismatch = np.max(np.abs(G)) if G.size else 0.0
+            if not np.isfinite(mismatch):
+                return None, it
+            if mismatch < self.tol:
+                return z, it
+            if (self._solve is None or self._solve[0] != k or mismatch > self.chord_tol
+                    or mismatch > 0.5 * last):
+                try:
+                    self._factorize(z, P_calc, Q_calc, k)
+                except np.linalg.LinAlgError:
+                    return None, it
+            z = z + self._solve[1](np.append(-G, 0.0))
+            last = mismatch
+        return None, self.max_corrector
+
+    def _tangent(self, sign):
+        """Tangent from the last factorization, oriented so that t[k] = sign."""
+        k, solve = self._solve
+        rhs = np.zeros(self.m + 1)
+        rhs[self.m] = sign
+        t = solve(rhs)
+        # Step lengths are measured in voltage magnitudes and lambda (pu), not angles
+        return t / np.linalg.norm(t[self.n_ang:]), k
+
+    @instrumentation.traced("continuation_power_flow")
+    def run(self):
+        """
+        Traces the PV curve from the base case (lambda = 0) to the nose.
+
+        Returns:
+            dict: lambda_max (load multiplier margin: loads can grow by this
+            fraction), margin_pu (extra PQ load at the nose, pu), lam and V
+            (accepted points, V per bus), critical_bus (largest voltage
+            sensitivity at the nose), nose_reached, steps, factorizations
+        """
+        z = np.concatenate((self.Theta[self.non_slack], self.V[self.idx_pq], [0.0]))
+        z, _ = self._correct(z, self.m)  # Base case: plain NR with lambda fixed at 0
+        if z is None:
+            raise np.linalg.LinAlgError("Base case load flow did not converge")
+        if self._solve is None:
+            self._factorize(z, *self._mismatch(z)[1:], self.m)
+
+        lams, Vs = [0.0], [self.V.copy()]
+        t, k = self._tangent(1.0)
+        h = self.step
+        lambda_max = 0.0
+        bracketed = False  # A step has overshot the nose, h only shrinks from here
+        nose_reached = False
+        steps = 0
+
+        while steps < self.max_steps:
+            # Continue on the fastest moving voltage magnitude or lambda
+            k_next = self.n_ang + int(np.argmax(np.abs(t[self.n_ang:])))
+            z_new, iterations = self._correct(z + h * t, k_next)
+            if z_new is not None:
+                lambda_max = max(lambda_max, z_new[self.m])
+            else:
+                if h <= self.step_min:
+                    break
+                h = max(self.step_min, h / 2)
+                continue
+
+            # Tangent at the new point from the corrector's factorization,
+            # oriented to continue the curve in the same direction
+            t_new, _ = self._tangent(1.0)
+            if t_new @ t < 0:
+                t_new = -t_new
+            if t_new[self.m] <= 0 or z_new[self.m] < z[self.m]:
+                # Past the nose: retry shorter until it is bracketed within step_min
+                bracketed = True
+                if h > self.step_min:
+                    h = max(self.step_min, h / 2)
+                    continue
+                nose_reached = True
+
+            steps += 1
+            z, t = z_new, t_new
+            lams.append(z[self.m])
+            Vs.append(self.V.copy())
+            if nose_reached:
+                break
+            if bracketed:
+                continue
+            if iterations <= 3:
+                h = min(self.step_max, h * 1.5)
+            elif iterations > 6:
+                h = max(self.step_min, h * 0.7)
+
+        # Voltage sensitivity dV/dlambda at the last point: the weakest bus is the critical one
+        dV = np.zeros(len(self.ids))
+        dV[self.idx_pq] = t[self.n_ang:self.m]
+        return {
+            'lambda_max': float(lambda_max),
+            'margin_pu': lambda_max * float(-self.dP.sum()),
+            'lam': np.array(lams),
+            'V': np.array(Vs),
+            'critical_bus': int(self.ids[np.argmin(dV)]) if len(self.idx_pq) else None,
+            'nose_reached': nose_reached,
+            'steps': steps,
+            'factorizations': self.factorizations,
+        }
+
+def loadability_margin(Y_bus, bus_data, **options):
+    """ContinuationPowerFlow(Y_bus, bus_data, **options).run()"""
+    return ContinuationPowerFlow(Y_bus, bus_data, **options).run()
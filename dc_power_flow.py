@@ -0,0 +1,249 @@
+import numpy as np
+
+import network
+import nr_solver
+import ybus_generator
+import line_parameters
+import batch_load_flow
+import instrumentation
+
+ISLAND_TOL = 1e-8  # 1 - PTDF_kk below this: the line is a bridge, its outage islands the network
+THERMAL_MARGIN = 0.9  # Fraction of the conductor's temperature headroom that triggers an AC check
+
+def branch_susceptances(net):
+    """
+    DC susceptance 1 / x of every in-service line (r and line charging
+    ignored). A transformer entry contributes 1 / (N * xt), in parallel with
+    the series branch of the same entry if it has one.
+
+    Returns:
+        line_idx (np.ndarray): Rows of line_columns, as in Network.line_arrays
+        b (np.ndarray): Susceptance per line (pu)
+    """
+    cols = net.line_columns
+    line_idx = np.where(net.line_in_service)[0]
+    x = np.nan_to_num(cols['x'][line_idx])
+    a = np.nan_to_num(cols['N'][line_idx])
+    xt = np.nan_to_num(cols['xt'][line_idx])
+    b = np.divide(1.0, x, out=np.zeros_like(x), where=x != 0)
+    xfmr = (a != 0) & (xt != 0)
+    b[xfmr] += 1.0 / (a[xfmr] * xt[xfmr])
+    return line_idx, b
+
+class DCPowerFlow:
+    def __init__(self, bus_data, line_data=None, sparse=True):
+        """
+        Linear (DC) power flow of one topology: flat voltages, lossless
+        branches, P = B' theta with the slack bus as angle reference and
+        balancing bus.
+
+        The reduced B matrix is factorized once. PTDF (flow on every line per
+        unit injection at every bus, withdrawn at the slack) and LODF (flow
+        change on every line per unit of pre-outage flow on an outaged line)
+        are built on first use and kept, so load changes and single-line
+        outages are matrix-vector products afterwards. Line order is that of
+        Network.line_arrays (in-service lines).
+
+        Args:
+            bus_data (list or Network): Buses
+            line_data (list): Line dicts (None: the Network's own lines)
+            sparse (bool): Sparse B matrix and LU (dense if scipy is missing)
+
+        Raises:
+            np.linalg.LinAlgError: If B is singular (islanded network)
+        """
+        net = bus_data if isinstance(bus_data, network.Network) else network.Network.from_dicts(bus_data, line_data)
+        self.net = net
+        self.ids = net.ids.copy()
+        self.slack_idx = int(np.argmax(net.types == 1))
+        self.line_idx, self.b = branch_susceptances(net)
+        self.from_idx = net.line_from_idx[self.line_idx]
+        self.to_idx = net.line_to_idx[self.line_idx]
+
+        n, m = len(net), len(self.line_idx)
+        self.keep = np.delete(np.arange(n), self.slack_idx)
+        sparse = sparse and nr_solver.sp is not None
+        lines = np.arange(m)
+        rows = np.concatenate((lines, lines))
+        cols_ = np.concatenate((self.from_idx, self.to_idx))
+        vals = np.concatenate((np.ones(m), -np.ones(m)))
+        if sparse:
+            sp = nr_solver.sp
+            A = sp.csr_matrix((vals, (rows, cols_)), shape=(m, n))
+            B = (A.T @ sp.diags(self.b) @ A).tocsr()
+            B_red = B[self.keep][:, self.keep].tocsc()
+        else:
+            A = np.zeros((m, n))
+            A[rows, cols_] = vals
+            B_red = (A.T * self.b) @ A
+            B_red = B_red[np.ix_(self.keep, self.keep)]
+        self.A = A  # Line x bus incidence (+1 from, -1 to)
+        self._solve = nr_solver.factorize_jacobian(B_red)
+        self._ptdf = None
+        self._lodf = None
+        self._bridges = None
+
+    # --- Sensitivities ---
+    @property
+    def ptdf(self):
+        """(lines x buses) PTDF, the slack column is zero."""
+        if self._ptdf is None:
+            Bf = self.A.T * self.b if isinstance(self.A, np.ndarray) else (self.A.T @ nr_solver.sp.diags(self.b)).toarray()
+            ptdf = np.zeros((len(self.b), len(self.ids)))
+            if len(self.keep) and len(self.b):
+                # B_red is symmetric: PTDF_red = (B_red^-1 (diag(b) A_red)^T)^T
+                ptdf[:, self.keep] = self._solve(np.ascontiguousarray(Bf[self.keep])).T
+            self._ptdf = ptdf
+        return self._ptdf
+
+    @property
+    def lodf(self):
+        """
+        (lines x lines) LODF; column k is the flow change per unit pre-outage
+        flow of line k (diagonal -1). Columns of bridge lines are NaN.
+        """
+        if self._lodf is None:
+            ptdf = self.ptdf
+            H = ptdf[:, self.from_idx] - ptdf[:, self.to_idx]  # Flow on l per unit transfer across k
+            denom = 1.0 - np.diag(H)
+            bridge = np.abs(denom) < ISLAND_TOL
+            lodf = H / np.where(bridge, 1.0, denom)[None, :]
+            lodf[:, bridge] = np.nan
+            np.fill_diagonal(lodf, -1.0)
+            self._lodf = lodf
+            self._bridges = bridge
+        return self._lodf
+
+    @property
+    def bridges(self):
+        """Lines whose outage islands part of the network."""
+        if self._bridges is None:
+            self.lodf
+        return self._bridges
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self._ptdf, self._lodf) if a is not None)
+
+    # --- Flows ---
+    def injections(self, bus_data):
+        """P_spec of a Network or bus dicts with the same buses, as the DC injection vector."""
+        return network.bus_arrays(bus_data)[4]
+
+    def flows(self, P):
+        """
+        Line flows for bus injections P (pu, slack entry ignored).
+
+        Args:
+            P (np.ndarray): (n,) or (K x n) injections
+
+        Returns:
+            np.ndarray: (lines,) or (K x lines) flows from -> to (pu)
+        """
+        return np.asarray(P) @ self.ptdf.T
+
+    def angles(self, P):
+        """Bus angles (rad, slack at 0) of the DC solution for (n,) injections P."""
+        theta = np.zeros(len(self.ids))
+        theta[self.keep] = self._solve(np.asarray(P, dtype=float)[self.keep])
+        return theta
+
+    def outage_flows(self, flows, k):
+        """Flows after line k (position in line order) trips: flows + LODF[:, k] * flows[k]."""
+        flows = np.asarray(flows)
+        post = flows + self.lodf[:, k] * flows[..., k, None]
+        post[..., k] = 0.0
+        return post
+
+    def n1_flows(self, flows):
+        """
+        Post-outage flows of every single-line outage.
+
+        Returns:
+            np.ndarray: (lines x lines), column k = flows after line k trips
+            (NaN columns for bridges)
+        """
+        post = np.asarray(flows)[:, None] + self.lodf * np.asarray(flows)[None, :]
+        np.fill_diagonal(post, 0.0)
+        return post
+
+def dc_model(net, cache=None):
+    """
+    DCPowerFlow of net's topology; with a TopologyCache, PTDF / LODF are
+    built once per outage set and shared.
+    """
+    if cache is None:
+        return DCPowerFlow(net)
+    return cache.dc(cache.get(net))
+
+def thermal_loading(flows, line_arrays):
+    """
+    Temperature headroom used by every line at the given flows (current
+    taken as |P| at 1 pu voltage), with the conductor model of
+    line_parameters: 0 at ambient, 1 at Tmax.
+
+    Returns:
+        loading, I_amps, temp (np.ndarray): Same shape as flows
+    """
+    I_amps = np.abs(flows) * line_arrays['I_base']
+    temp, _ = line_parameters.thermal_state(I_amps, line_arrays)
+    loading = (temp - line_parameters.Tamb) / (line_arrays['Tmax'] - line_parameters.Tamb)
+    return loading, I_amps, temp
+
+@instrumentation.traced("dc_screening")
+def screen_injections(net, P, Q=None, model=None, margin=THERMAL_MARGIN, ac=True, Y_bus=None):
+    """
+    DC screening of K load / generation patterns of one network, with an
+    AC load flow only for the cases whose DC line loading exceeds margin.
+
+    Args:
+        net (Network): Topology, bus types and starting point
+        P, Q (np.ndarray): (K x n) P_spec / Q_spec per case (Q only needed for AC)
+        model (DCPowerFlow): Model of net's topology (None: built here)
+        margin (float): thermal_loading above which a case is checked with AC
+        ac (bool): Run the AC check (batch_load_flow) on the flagged cases
+        Y_bus: Admittance matrix for the AC check (None: built here)
+
+    Returns:
+        dict: flows (K x lines, DC), loading (DC), flagged ((K,) bool) and,
+        for the flagged cases, ac_cases (their indices), ac_converged,
+        ac_I_amps / ac_temp (AC line states, NaN if not converged)
+    """
+    model = model or DCPowerFlow(net)
+    _, line_arrays = net.line_arrays()
+    P = np.atleast_2d(np.asarray(P, dtype=float))
+    flows = model.flows(P)
+    loading, _, _ = thermal_loading(flows, line_arrays)
+    flagged = np.max(loading, axis=1, initial=0.0) > margin
+    result = {'flows': flows, 'loading': loading, 'flagged': flagged}
+    if not ac or not flagged.any():
+        return result
+
+    cases = np.flatnonzero(flagged)
+    Y_bus = ybus_generator.build_y_bus(net) if Y_bus is None else Y_bus
+    Q = np.atleast_2d(np.asarray(Q, dtype=float))
+    lf = batch_load_flow.run_batch_load_flow(Y_bus, net, P[cases], Q[cases])
+    I_amps = np.full((len(cases), len(model.b)), np.nan)
+    temp = np.full_like(I_amps, np.nan)
+    for row in np.flatnonzero(lf['converged']):
+        I_amps[row], temp[row], _, _ = line_parameters.compute_all_line_states(
+            line_arrays, lf['V'][row], lf['Theta'][row], Y_bus)
+    result.update({'ac_cases': cases, 'ac_converged': lf['converged'], 'ac_I_amps': I_amps, 'ac_temp': temp})
+    return result
+
+def screen_line_outages(model, flows, line_arrays, margin=THERMAL_MARGIN):
+    """
+    DC N-1 screening of every single-line outage from one pre-outage flow
+    vector.
+
+    Returns:
+        dict: overloaded ((lines,) bool: some line exceeds margin after the
+        outage; a flag for the AC contingency check), max_loading per outage,
+        islanding ((lines,) bool: bridges, not evaluated)
+    """
+    post = model.n1_flows(flows)  # Column k: outage of line k
+    loading, _, _ = thermal_loading(post.T, line_arrays)
+    islanding = model.bridges
+    max_loading = np.where(islanding, np.nan, np.max(np.nan_to_num(loading), axis=1, initial=0.0))
+    return {'overloaded': ~islanding & (max_loading > margin), 'max_loading': max_loading,
+            'islanding': islanding}
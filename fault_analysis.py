@@ -0,0 +1,250 @@
+import numpy as np
+
+import network
+import ybus_generator
+import nr_solver
+import instrumentation
+
+FAULT_KINDS = ("3ph", "slg", "ll", "dlg")
+A_OP = np.exp(2j * np.pi / 3)
+# [Ia, Ib, Ic] = SEQ_TO_PHASE @ [I0, I1, I2]
+SEQ_TO_PHASE = np.array([[1, 1, 1], [1, A_OP**2, A_OP], [1, A_OP, A_OP**2]])
+BLOCK_SIZE = 256  # Unit vectors per multi-RHS solve when extracting the Z-bus diagonal
+
+def sequence_currents(kind, Z0, Z1, Z2, Zf, Vf):
+    """
+    Symmetrical-component fault currents at the faulted bus (phase a reference).
+
+    Args:
+        kind (str): "3ph", "slg" (a-g), "ll" (b-c) or "dlg" (b-c-g)
+        Z0, Z1, Z2 (complex or array): Thevenin impedances Z_kk of each sequence
+        Zf (complex): Fault impedance
+        Vf (complex or array): Pre-fault voltage
+
+    Returns:
+        I0, I1, I2 (complex or array): Sequence currents into the fault
+    """
+    zero = np.zeros_like(np.asarray(Vf * Z1))
+    if kind == "3ph":
+        return zero, Vf / (Z1 + Zf), zero
+    if kind == "slg":
+        I0 = Vf / (Z0 + Z1 + Z2 + 3 * Zf)
+        return I0, I0, I0
+    if kind == "ll":
+        I1 = Vf / (Z1 + Z2 + Zf)
+        return zero, I1, -I1
+    if kind == "dlg":
+        Zg = Z0 + 3 * Zf
+        I1 = Vf / (Z1 + Z2 * Zg / (Z2 + Zg))
+        return -I1 * Z2 / (Z2 + Zg), I1, -I1 * Zg / (Z2 + Zg)
+    raise ValueError(f"Unknown fault kind '{kind}', expected one of {FAULT_KINDS}")
+
+def topology_key(net):
+    """Buses, bus types and in-service branch data: everything the sequence Y-buses depend on."""
+    on = net.line_in_service
+    return (net.ids.tobytes(), net.types.tobytes(),
+            tuple(net.line_columns[key][on].tobytes() for key in network.LINE_FIELDS))
+
+class FaultAnalyzer:
+    def __init__(self, bus_data, line_data=None, gen_x=0.2, gen_x0=0.1, zero_seq_ratio=3.0, sparse=True):
+        """
+        Short-circuit analysis with symmetrical components.
+
+        The positive-sequence network is the load-flow Y-bus from
+        build_y_bus plus a subtransient reactance gen_x to ground at every
+        slack / PV bus. The negative sequence uses the same network (x2 = x''),
+        so both share one factorization. The zero-sequence network has the
+        line series impedances scaled by zero_seq_ratio, transformers passed
+        through as grounded wye-wye, and gen_x0 to ground at the generators.
+
+        Z-bus entries are never formed by inverting Y: each sequence Y-bus is
+        LU-factorized once (on first use) and Z-bus columns come from
+        triangular solves with unit vectors. Factorizations, Z-bus columns
+        and diagonals stay cached until update() sees a different topology.
+
+        Args:
+            bus_data (list or Network): Buses
+            line_data (list): Line dicts (None: the Network's own lines)
+            gen_x (float): Generator subtransient reactance, positive / negative sequence (pu)
+            gen_x0 (float): Generator zero-sequence reactance, solidly grounded (pu)
+            zero_seq_ratio (float): Line Z0 / Z1
+            sparse (bool): Sparse Y-bus and LU (dense if scipy is missing)
+        """
+        self.gen_x = gen_x
+        self.gen_x0 = gen_x0
+        self.zero_seq_ratio = zero_seq_ratio
+        self.sparse = sparse and nr_solver.sp is not None
+        self.factorizations = 0
+        self.net = None
+        self._key = None
+        self.update(bus_data, line_data)
+
+    def update(self, bus_data, line_data=None):
+        """
+        Points the analyzer at a (possibly changed) network. The cached
+        factorizations and Z-bus data are only dropped if the topology changed.
+
+        Returns:
+            bool: True if the caches were invalidated
+        """
+        net = bus_data if isinstance(bus_data, network.Network) else network.Network.from_dicts(bus_data, line_data)
+        key = topology_key(net)
+        self.net = net
+        if key == self._key:
+            return False
+        self._key = key
+        self.id_map = net.id_map
+        self._Y = {}      # sequence (0 / 1) -> Y-bus
+        self._solve = {}  # sequence -> factorized Y-bus
+        self._columns = {0: {}, 1: {}}
+        self._diag = {}
+        return True
+
+    def _gen_shunts(self, x):
+        gen = self.net.types != 3
+        return np.where(gen, 1.0 / (1j * x), 0.0)
+
+    def y_bus(self, seq):
+        """Y-bus of sequence 1 (also used for 2) or 0."""
+        if seq == 2:
+            seq = 1
+        if seq not in self._Y:
+            net = self.net
+            if seq == 1:
+                Y = ybus_generator.build_y_bus(net, sparse=self.sparse)
+                shunts = self._gen_shunts(self.gen_x)
+            else:
+                cols = dict(net.line_columns)
+                cols['r'] = cols['r'] * self.zero_seq_ratio
+                cols['x'] = cols['x'] * self.zero_seq_ratio
+                bus_columns = {key: getattr(net, attr) for key, attr in network.BUS_COLUMNS.items()}
+                Y = ybus_generator.build_y_bus(network.Network(bus_columns, cols, net.line_status), sparse=self.sparse)
+                shunts = self._gen_shunts(self.gen_x0)
+            if self.sparse:
+                Y = (Y + nr_solver.sp.diags(shunts)).tocsc()
+            else:
+                Y = Y + np.diag(shunts)
+            self._Y[seq] = Y
+        return self._Y[seq]
+
+    @instrumentation.traced("fault_factorization")
+    def _factorized(self, seq):
+        if seq == 2:
+            seq = 1
+        if seq not in self._solve:
+            # Raises np.linalg.LinAlgError for a network without a path to ground
+            self._solve[seq] = nr_solver.factorize_jacobian(self.y_bus(seq))
+            self.factorizations += 1
+        return self._solve[seq]
+
+    def z_column(self, bus_id, seq=1):
+        """
+        Column of the sequence Z-bus for one bus: one triangular solve pair.
+
+        Returns:
+            np.ndarray: Z[:, k] (complex, pu)
+        """
+        seq = 1 if seq == 2 else seq
+        k = self.id_map[bus_id]
+        cache = self._columns[seq]
+        if k not in cache:
+            e = np.zeros(len(self.net), dtype=complex)
+            e[k] = 1.0
+            cache[k] = self._factorized(seq)(e)
+        return cache[k]
+
+    def z_diagonal(self, seq=1):
+        """
+        Thevenin impedances Z_kk of every bus, from blocks of BLOCK_SIZE
+        unit vectors solved against the one factorization (n solves in total,
+        O(n * BLOCK_SIZE) memory instead of the full n x n Z-bus).
+
+        Returns:
+            np.ndarray: Z_kk per bus, in network order
+        """
+        seq = 1 if seq == 2 else seq
+        if seq not in self._diag:
+            solve = self._factorized(seq)
+            n = len(self.net)
+            diag = np.empty(n, dtype=complex)
+            for start in range(0, n, BLOCK_SIZE):
+                stop = min(n, start + BLOCK_SIZE)
+                E = np.zeros((n, stop - start), dtype=complex)
+                E[np.arange(start, stop), np.arange(stop - start)] = 1.0
+                Z_block = solve(E)
+                diag[start:stop] = Z_block[np.arange(start, stop), np.arange(stop - start)]
+            self._diag[seq] = diag
+        return self._diag[seq]
+
+    def _prefault(self, V_pre):
+        """Complex pre-fault voltages: given array, or 1.0 pu flat profile."""
+        if V_pre is None:
+            return np.ones(len(self.net), dtype=complex)
+        return np.asarray(V_pre, dtype=complex)
+
+    def fault(self, bus_id, kind="3ph", Zf=0.0, V_pre=None):
+        """
+        One fault with the post-fault voltages of every bus.
+
+        Args:
+            bus_id (int): Faulted bus
+            kind (str): One of FAULT_KINDS
+            Zf (complex): Fault impedance (pu)
+            V_pre (np.ndarray): Complex pre-fault voltages, e.g. V * exp(j theta)
+                of a load flow (None: 1.0 pu everywhere)
+
+        Returns:
+            dict: I_seq (I0, I1, I2), I_abc and I_fault (largest phase current)
+            at the fault, V_abc (n x 3) post-fault phase voltages, all in pu
+        """
+        k = self.id_map[bus_id]
+        V_pre = self._prefault(V_pre)
+        z1 = self.z_column(bus_id, 1)
+        z0 = self.z_column(bus_id, 0) if kind in ("slg", "dlg") else np.zeros_like(z1)
+        I0, I1, I2 = sequence_currents(kind, z0[k], z1[k], z1[k], Zf, V_pre[k])
+        I_seq = np.array([I0, I1, I2])
+        I_abc = SEQ_TO_PHASE @ I_seq
+
+        V_seq = np.column_stack((-z0 * I0, V_pre - z1 * I1, -z1 * I2))
+        return {'bus': bus_id, 'kind': kind, 'I_seq': I_seq, 'I_abc': I_abc,
+                'I_fault': float(np.max(np.abs(I_abc))), 'V_abc': V_seq @ SEQ_TO_PHASE.T}
+
+    @instrumentation.traced("fault_sweep")
+    def sweep(self, kind="3ph", Zf=0.0, V_pre=None, base_mva=100.0):
+        """
+        The same fault at every bus, from the cached Z-bus diagonals.
+
+        Returns:
+            dict: bus_ids, I_seq (n x 3), I_abc (n x 3), I_fault (largest
+            phase current, pu), Z1 (positive-sequence Thevenin impedance) and
+            S_sc (|V_pre| * I_fault * base_mva, MVA)
+        """
+        V_pre = self._prefault(V_pre)
+        Z1 = self.z_diagonal(1)
+        Z0 = self.z_diagonal(0) if kind in ("slg", "dlg") else np.zeros_like(Z1)
+        I_seq = np.column_stack(sequence_currents(kind, Z0, Z1, Z1, Zf, V_pre))
+        I_abc = I_seq @ SEQ_TO_PHASE.T
+        I_fault = np.max(np.abs(I_abc), axis=1)
+        return {'kind': kind, 'bus_ids': self.net.ids.copy(), 'I_seq': I_seq, 'I_abc': I_abc,
+                'I_fault': I_fault, 'Z1': Z1, 'S_sc': np.abs(V_pre) * I_fault * base_mva}
+
+def run_fault_sweep(bus_data, line_data=None, kinds=FAULT_KINDS, Zf=0.0, V_pre=None, **options):
+    """
+    All fault kinds at all buses of one network.
+
+    Returns:
+        dict: kind -> FaultAnalyzer.sweep result
+    """
+    analyzer = FaultAnalyzer(bus_data, line_data, **options)
+    return {kind: analyzer.sweep(kind, Zf, V_pre) for kind in kinds}
+
+def print_fault_table(results, top=20):
+    """Buses with the highest fault currents, one column per fault kind."""
+    kinds = list(results)
+    first = results[kinds[0]]
+    order = np.argsort(-first['I_fault'])[:top]
+    print(f"\n{'Bus':<6}" + "".join(f"{kind.upper() + ' (pu)':>12}" for kind in kinds) + f"{'S_sc (MVA)':>14}")
+    print("-" * (6 + 12 * len(kinds) + 14))
+    for i in order:
+        row = "".join(f"{results[kind]['I_fault'][i]:>12.3f}" for kind in kinds)
+        print(f"{first['bus_ids'][i]:<6}{row}{first['S_sc'][i]:>14.1f}")
@@ -0,0 +1,119 @@
+import numpy as np
+import ybus_generator
+import nr_solver
+import network
+import instrumentation
+
+def build_b_matrices(bus_data, line_data, Y_bus, variant="XB", sparse=False):
+    """
+    Derives the constant B' and B'' matrices of the fast-decoupled load flow.
+
+    XB: B' from the series reactances only, B'' = -Im(Y_bus).
+    BX: B' from the series admittances (r kept), B'' from the reactances only.
+    In both variants B' ignores line charging and off-nominal taps.
+
+    Returns:
+        B_p, B_pp (array or sparse matrix): Full-size n x n matrices
+    """
+    b_p_lines = []
+    b_pp_lines = []
+    for line in line_data:
+        no_r = dict(line)
+        if 'r' in no_r: no_r['r'] = 0.0
+        if 'rt' in no_r: no_r['rt'] = 0.0
+
+        # B': no shunts, no taps (N = 1 keeps the transformer reactance in)
+        b_p = dict(no_r if variant == "XB" else line)
+        b_p['b'] = 0.0
+        if b_p.get('N', 0) != 0: b_p['N'] = 1
+        b_p_lines.append(b_p)
+        b_pp_lines.append(no_r)
+
+    B_p = -ybus_generator.build_y_bus(bus_data, b_p_lines, sparse=sparse).imag
+    if variant == "XB":
+        B_pp = -Y_bus.imag
+    else:
+        B_pp = -ybus_generator.build_y_bus(bus_data, b_pp_lines, sparse=sparse).imag
+    return B_p, B_pp
+
+class FastDecoupledSolver:
+    def __init__(self, bus_data, line_data, Y_bus, variant="XB"):
+        """
+        Fast-decoupled load flow with B' and B'' factorized once per topology.
+
+        Args:
+            bus_data (list or Network): Buses (only 'id' and 'type' are used here)
+            line_data (list): Line dicts used to build Y_bus (None: the Network's)
+            Y_bus (array or sparse matrix): Bus admittance matrix of the same topology
+            variant (str): "XB" or "BX" scheme
+
+        Raises:
+            np.linalg.LinAlgError: If B' or B'' is singular (islanded network)
+        """
+        sparse = nr_solver.sp is not None and nr_solver.sp.issparse(Y_bus)
+        types = network.bus_arrays(bus_data)[1]
+        if line_data is None:
+            line_data = bus_data.line_data  # Network: old-style line dicts
+        self.idx_pq = np.where(types == 3)[0]
+        self.non_slack = np.sort(np.concatenate((np.where(types == 2)[0], self.idx_pq)))
+
+        B_p, B_pp = build_b_matrices(bus_data, line_data, Y_bus, variant, sparse)
+        if sparse:
+            B_p = B_p.tocsr()[self.non_slack][:, self.non_slack].tocsc()
+            B_pp = B_pp.tocsr()[self.idx_pq][:, self.idx_pq].tocsc()
+        else:
+            B_p = B_p[np.ix_(self.non_slack, self.non_slack)]
+            B_pp = B_pp[np.ix_(self.idx_pq, self.idx_pq)]
+
+        self._solve_p = nr_solver.factorize_jacobian(B_p)
+        self._solve_q = nr_solver.factorize_jacobian(B_pp)
+        self.iterations = 0
+
+    def solve(self, Y_bus, V, Theta, P_spec, Q_spec, max_iter=100, tol=1e-5):
+        """
+        Runs P-theta / Q-V half iterations from the given starting point.
+
+        Returns:
+            V, Theta, P_calc, Q_calc (np.ndarray): Same contract as
+            nr_solver.run_load_flow, or four Nones if it does not converge
+        """
+        V = np.array(V, dtype=float)
+        Theta = np.array(Theta, dtype=float)
+        ns, pq = self.non_slack, self.idx_pq
+
+        for it in range(max_iter):
+            self.iterations = it
+            P_calc, Q_calc = nr_solver.calc_power_injections(Y_bus, V, Theta)
+            dP = (P_spec - P_calc)[ns]
+            dQ = (Q_spec - Q_calc)[pq]
+            mismatch = max(np.max(np.abs(dP)) if dP.size else 0.0,
+                           np.max(np.abs(dQ)) if dQ.size else 0.0)
+            if mismatch < tol:
+                return V, Theta, P_calc, Q_calc
+
+            # P-theta half iteration
+            Theta[ns] += self._solve_p(dP / V[ns])
+
+            # Q-V half iteration with the updated angles
+            P_calc, Q_calc = nr_solver.calc_power_injections(Y_bus, V, Theta)
+            V[pq] += self._solve_q((Q_spec - Q_calc)[pq] / V[pq])
+
+        self.iterations = max_iter
+        return None, None, None, None
+
+# Same contract as nr_solver.run_load_flow, plus the line data for B' / B''
+@instrumentation.traced("fdlf_load_flow")
+def run_load_flow(Y_bus, bus_data, line_data, system_freq, max_iter=100, tol=1e-5, time_step=0, variant="XB"):
+    try:
+        fdlf = FastDecoupledSolver(bus_data, line_data, Y_bus, variant)
+    except np.linalg.LinAlgError:
+        fdlf = None
+
+    if fdlf is not None:
+        _, _, V, Theta, P_spec, Q_spec = network.bus_arrays(bus_data)
+        result = fdlf.solve(Y_bus, V, Theta, P_spec, Q_spec, max_iter, tol)
+        if result[0] is not None:
+            return result
+
+    print("   [WARNING] Fast-decoupled load flow failed, falling back to Newton-Raphson.")
+    return nr_solver.run_load_flow(Y_bus, bus_data, system_freq, tol=tol, time_step=time_step)
@@ -0,0 +1,179 @@
+import cProfile
+import contextlib
+import functools
+import io
+import json
+import pstats
+import time
+
+_active = None  # SpanRecorder collecting spans, None = instrumentation off
+
+class SolverStats:
+    def __init__(self, method="nr"):
+        """
+        Diagnostics of one load flow solve.
+
+        Attributes:
+            method (str): Solver that produced the stats
+            converged (bool): Mismatch fell below the tolerance
+            failure (str): None, "max_iter" or "singular_jacobian"
+            iterations (int): Newton updates applied
+            mismatch_history (list): Max. power mismatch (pu) at the start of each iteration
+            timings (dict): Seconds per phase ("injections", "jacobian", "solve")
+            jacobian_shape (tuple), jacobian_nnz (int): Last assembled reduced Jacobian
+            condition (float): 1-norm condition estimate of that Jacobian
+            wall_time (float): Seconds for the whole solve
+        """
+        self.method = method
+        self.converged = False
+        self.failure = None
+        self.iterations = 0
+        self.mismatch_history = []
+        self.timings = {'injections': 0.0, 'jacobian': 0.0, 'solve': 0.0}
+        self.jacobian_shape = None
+        self.jacobian_nnz = None
+        self.condition = None
+        self.wall_time = 0.0
+
+    @property
+    def mismatch(self):
+        return self.mismatch_history[-1] if self.mismatch_history else None
+
+    def add_time(self, phase, seconds):
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def to_dict(self):
+        return {
+            'method': self.method, 'converged': self.converged, 'failure': self.failure,
+            'iterations': self.iterations, 'mismatch': self.mismatch,
+            'mismatch_history': [float(m) for m in self.mismatch_history],
+            'timings': dict(self.timings), 'wall_time': self.wall_time,
+            'jacobian_shape': list(self.jacobian_shape) if self.jacobian_shape else None,
+            'jacobian_nnz': self.jacobian_nnz, 'condition': self.condition,
+        }
+
+    def __repr__(self):
+        status = "converged" if self.converged else f"failed ({self.failure})"
+        return (f"SolverStats({self.method}, {status}, {self.iterations} it, "
+                f"mismatch={self.mismatch}, wall={self.wall_time:.4f}s)")
+
+class SpanRecorder:
+    def __init__(self, cprofile=False):
+        """
+        Opt-in recorder for the traced functions (build_y_bus, the load flow
+        solvers, the line-state evaluation, simulation steps).
+
+        While started, every traced call adds its wall time (perf_counter) to
+        a per-name span; with cprofile=True a cProfile.Profile runs as well.
+        Use as a context manager or with start() / stop().
+
+        Args:
+            cprofile (bool): Also collect function-level cProfile statistics
+        """
+        self.spans = {}  # name -> [count, total, min, max]
+        self.profile = cProfile.Profile() if cprofile else None
+        self._previous = None
+
+    def start(self):
+        global _active
+        self._previous = _active
+        _active = self
+        if self.profile is not None:
+            self.profile.enable()
+        return self
+
+    def stop(self):
+        global _active
+        if self.profile is not None:
+            self.profile.disable()
+        _active = self._previous
+        self._previous = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def record(self, name, seconds):
+        s = self.spans.get(name)
+        if s is None:
+            self.spans[name] = [1, seconds, seconds, seconds]
+        else:
+            s[0] += 1
+            s[1] += seconds
+            s[2] = min(s[2], seconds)
+            s[3] = max(s[3], seconds)
+
+    def top_functions(self, limit=25, sort="cumulative"):
+        """
+        Most expensive functions of the cProfile run.
+
+        Returns:
+            list: Dicts with function, calls, tottime and cumtime (empty without cProfile)
+        """
+        if self.profile is None:
+            return []
+        stats = pstats.Stats(self.profile, stream=io.StringIO()).sort_stats(sort)
+        rows = []
+        for func in stats.fcn_list[:limit]:
+            cc, nc, tt, ct, _ = stats.stats[func]
+            rows.append({'function': pstats.func_std_string(func), 'calls': nc,
+                         'tottime': tt, 'cumtime': ct})
+        return rows
+
+    def to_dict(self, limit=25):
+        spans = {name: {'count': c, 'total': tot, 'mean': tot / c, 'min': lo, 'max': hi}
+                 for name, (c, tot, lo, hi) in self.spans.items()}
+        return {'spans': spans, 'cprofile': self.top_functions(limit)}
+
+    def export(self, path, limit=25):
+        """
+        Writes the spans (and the top cProfile functions) as JSON. With
+        cProfile on, the raw statistics also go to <path>.prof for pstats /
+        snakeviz.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(limit), f, indent=2)
+        if self.profile is not None:
+            self.profile.dump_stats(path + ".prof")
+
+    def report(self):
+        """Span table, most expensive first."""
+        lines = [f"{'Span':<28} {'Calls':>7} {'Total (s)':>10} {'Mean (ms)':>10} {'Max (ms)':>10}"]
+        for name, (c, tot, lo, hi) in sorted(self.spans.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"{name:<28} {c:>7} {tot:>10.4f} {tot / c * 1e3:>10.3f} {hi * 1e3:>10.3f}")
+        return "\n".join(lines)
+
+def recorder():
+    """The active SpanRecorder, or None."""
+    return _active
+
+@contextlib.contextmanager
+def span(name):
+    """Times the with-block into the active recorder (no-op if none)."""
+    rec = _active
+    if rec is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        rec.record(name, time.perf_counter() - start)
+
+def traced(name):
+    """Decorator recording each call of the function as span `name` while a recorder is active."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            rec = _active
+            if rec is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                rec.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
@@ -1,4 +1,5 @@
 import numpy as np
+import instrumentation
 
 Tamb = 25  # ambient temperature
 wind_speed = 3   # m/s
@@ -51,6 +52,7 @@ def sag(weight, span, tension, Tc):
     return base_sag
 
 # --- UPDATED: Dynamic Integration Function ---
+@instrumentation.traced("line_state")
 def calculate_dynamic_line_state(line, V_sol, Th_sol, Y_bus, bus_id_map, base_mva=100.0):
     """Takes Load Flow results and returns real-time physical line parameters."""
     # 1. Map IDs to matrix indices
@@ -82,4 +84,72 @@ def calculate_dynamic_line_state(line, V_sol, Th_sol, Y_bus, bus_id_map, base_mv
     # Pass 'temp' into the sag calculation
     current_sag = sag(c["weight"], c["span"], c["tension"], temp)
     
-    return c_name, I_amps, temp, current_sag, c["Tmax"]
\ No newline at end of file
+    return c_name, I_amps, temp, current_sag, c["Tmax"]
+
+# --- Vectorized line states for all branches ---
+def build_line_arrays(from_idx, to_idx, line_kV, line_km, base_mva=100.0):
+    """
+    Precomputes the static per-branch data once per network.
+
+    Args:
+        from_idx, to_idx (array): Matrix indices of the branch end buses
+        line_kV, line_km (array): Line voltage (kV) and length (km)
+
+    Returns:
+        dict: Endpoint indices, conductor names and the conductor constants,
+        R_total and I_base as arrays
+    """
+    line_kV = np.asarray(line_kV, dtype=float)
+    line_km = np.asarray(line_km, dtype=float)
+
+    # Same thresholds as select_conductor
+    names = np.where(line_kV >= 200, "Zebra", np.where(line_kV >= 30, "Panther", "Dog"))
+    props = {key: np.array([conductors[n][key] for n in names], dtype=float)
+             for key in ("R20", "weight", "span", "tension", "Tmax")}
+
+    return {
+        'from_idx': np.asarray(from_idx, dtype=int),
+        'to_idx': np.asarray(to_idx, dtype=int),
+        'c_name': names,
+        'R_total': props["R20"] * line_km,
+        'I_base': (base_mva * 1000) / (np.sqrt(3) * line_kV),
+        'weight': props["weight"],
+        'span': props["span"],
+        'tension': props["tension"],
+        'Tmax': props["Tmax"],
+    }
+
+@instrumentation.traced("line_states")
+def compute_all_line_states(line_arrays, V_sol, Th_sol, Y_bus):
+    """
+    Array version of calculate_dynamic_line_state for every branch at once.
+
+    Returns:
+        I_amps, temp, sag, Tmax (np.ndarray): One entry per branch
+    """
+    i = line_arrays['from_idx']
+    j = line_arrays['to_idx']
+
+    V_c = V_sol * np.exp(1j * Th_sol)
+    y_ij = -np.asarray(Y_bus[i, j]).ravel()
+    I_amps = np.abs((V_c[i] - V_c[j]) * y_ij) * line_arrays['I_base']
+    temp, current_sag = thermal_state(I_amps, line_arrays)
+    return I_amps, temp, current_sag, line_arrays['Tmax']
+
+def thermal_state(I_amps, line_arrays):
+    """
+    Conductor temperature and sag of every branch for given currents, as
+    conductor_temp() and sag() (I_amps may carry a leading case axis).
+
+    Returns:
+        temp, sag (np.ndarray): Same shape as I_amps
+    """
+    h_wind = 1 + 0.6*wind_speed
+    temp = Tamb + (I_amps**2 * line_arrays['R_total'] * 1e-3)/h_wind
+
+    span = line_arrays['span']
+    base_sag = (line_arrays['weight'] * span**2) / (2 * line_arrays['tension'])
+    alpha_thermal = 0.000019  # Same stretch factor as sag()
+    delta_T = np.maximum(temp - Tamb, 0.0)
+    current_sag = np.sqrt(base_sag**2 + (3 * span**2 * alpha_thermal * delta_T) / 8)
+    return temp, current_sag
@@ -0,0 +1,142 @@
+import numpy as np
+import nr_solver
+import network
+import fdlf_solver
+import instrumentation
+
+class LoadFlowSession:
+    def __init__(self, Y_bus, bus_data, max_iter=50, tol=1e-5, chord_tol=1e-2,
+                 method="nr", line_data=None, variant="XB", ordering=None, fdlf=None):
+        """
+        Stateful Newton-Raphson load flow for time-stepped simulation.
+
+        Keeps the bus arrays and the last converged solution between steps,
+        so each solve warm-starts from the previous operating point. While the
+        starting mismatch is below chord_tol the last factorized Jacobian is
+        reused (chord / "dishonest" Newton) instead of rebuilding it.
+
+        Args:
+            Y_bus (array or sparse matrix): Bus admittance matrix
+            bus_data (list or Network): Buses, used once to build the arrays
+            max_iter (int): Maximum NR iterations per solve
+            tol (float): Convergence tolerance on the power mismatch (pu)
+            chord_tol (float): Mismatch below which the old Jacobian is reused
+            method (str): "nr" or "fdlf" (fast-decoupled, falls back to NR)
+            line_data (list): Line dicts for method="fdlf" (None: the Network's own lines)
+            variant (str): Fast-decoupled scheme, "XB" or "BX"
+            ordering (np.ndarray): Symbolic ordering of the sparse Jacobian
+                (nr_solver.symbolic_ordering), reused by every refactorization
+            fdlf (FastDecoupledSolver): Already factorized B' / B'' of this
+                topology, e.g. from a TopologyCache (method="fdlf")
+        """
+        self.Y_bus = Y_bus
+        self.max_iter = max_iter
+        self.tol = tol
+        self.chord_tol = chord_tol
+
+        ids, types, self.V, self.Theta, self.P_spec, self.Q_spec = network.bus_arrays(bus_data)
+        self.id_map = bus_data.id_map if isinstance(bus_data, network.Network) else {bid: i for i, bid in enumerate(ids.tolist())}
+
+        self.idx_pq = np.where(types == 3)[0]
+        self.non_slack = np.sort(np.concatenate((np.where(types == 2)[0], self.idx_pq)))
+
+        self.ordering = ordering
+        self._solve = None  # Factorized Jacobian from the last refactorization
+
+        # B' / B'' are constant for this topology, factorize them once here
+        self._fdlf = fdlf
+        if method == "fdlf" and fdlf is None:
+            try:
+                self._fdlf = fdlf_solver.FastDecoupledSolver(bus_data, line_data, Y_bus, variant)
+            except np.linalg.LinAlgError:
+                print("   [WARNING] Singular B'/B'' matrix, using Newton-Raphson instead.")
+
+        # Diagnostics of the last solve() call
+        self.iterations = 0
+        self.factorizations = 0
+        self.mismatch = 0.0
+
+    def update_injections(self, bus_ids, dP=0.0, dQ=0.0):
+        """
+        Applies delta updates to the specified injections of some buses.
+
+        Args:
+            bus_ids (list): Bus IDs whose injection changes
+            dP, dQ (float or array): Change in P_spec / Q_spec (pu). A load
+                increase is a negative delta.
+        """
+        idx = np.array([self.id_map[bid] for bid in bus_ids], dtype=int)
+        self.P_spec[idx] += dP
+        self.Q_spec[idx] += dQ
+
+    def sync_injections(self, bus_data):
+        """Re-reads P_spec / Q_spec from buses mutated in place (fluctuator, UFLS)."""
+        if isinstance(bus_data, network.Network):
+            self.P_spec[:] = bus_data.P_spec
+            self.Q_spec[:] = bus_data.Q_spec
+            return
+        for b in bus_data:
+            i = self.id_map[b['id']]
+            self.P_spec[i] = b['P_spec']
+            self.Q_spec[i] = b['Q_spec']
+
+    @instrumentation.traced("session_load_flow")
+    def solve(self):
+        """
+        Solves the load flow starting from the previous solution.
+
+        Returns:
+            V, Theta, P_calc, Q_calc (np.ndarray): Same contract as
+            nr_solver.run_load_flow, or four Nones on failure
+        """
+        if self._fdlf is not None:
+            V, Theta, P_calc, Q_calc = self._fdlf.solve(self.Y_bus, self.V, self.Theta,
+                                                        self.P_spec, self.Q_spec, self.max_iter, self.tol)
+            if V is not None:
+                self.iterations = self._fdlf.iterations
+                self.factorizations = 0
+                self.V, self.Theta = V, Theta
+                return V.copy(), Theta.copy(), P_calc, Q_calc
+            print("   [WARNING] Fast-decoupled load flow failed, falling back to Newton-Raphson.")
+
+        V = self.V.copy()
+        Theta = self.Theta.copy()
+        n_ang = len(self.non_slack)
+
+        self.iterations = 0
+        self.factorizations = 0
+        last_mismatch = np.inf
+
+        for it in range(self.max_iter):
+            P_calc, Q_calc = nr_solver.calc_power_injections(self.Y_bus, V, Theta)
+            M_final = np.concatenate(((self.P_spec - P_calc)[self.non_slack],
+                                      (self.Q_spec - Q_calc)[self.idx_pq]))
+            mismatch = np.max(np.abs(M_final)) if M_final.size else 0.0
+            self.mismatch = mismatch
+
+            if mismatch < self.tol:
+                self.V, self.Theta = V, Theta
+                return V.copy(), Theta.copy(), P_calc, Q_calc
+
+            # Refactorize if there is no Jacobian yet, the mismatch is large,
+            # or the stale Jacobian stopped contracting the mismatch
+            if self._solve is None or mismatch > self.chord_tol or mismatch > 0.5 * last_mismatch:
+                J_final = nr_solver.assemble_jacobian(self.Y_bus, V, Theta, P_calc, Q_calc,
+                                                      self.non_slack, self.idx_pq)
+                try:
+                    self._solve = nr_solver.factorize_jacobian(J_final, self.ordering)
+                except np.linalg.LinAlgError:
+                    # Jacobian is singular (Voltage Collapse)
+                    self._solve = None
+                    return None, None, None, None
+                self.factorizations += 1
+
+            correction = self._solve(M_final)
+            Theta[self.non_slack] += correction[:n_ang]
+            V[self.idx_pq] += correction[n_ang:]
+            self.iterations += 1
+            last_mismatch = mismatch
+
+        print(f"   [WARNING] NR Solver failed to converge after {self.max_iter} iterations (Mismatch: {self.mismatch:.5f})")
+        self._solve = None
+        return None, None, None, None
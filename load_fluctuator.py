@@ -1,10 +1,13 @@
 import random
+import network
 
 class LoadFluctuator:
-    def __init__(self, interval=5, min_inc=0.01, max_inc=0.05):
+    def __init__(self, interval=5, min_inc=0.01, max_inc=0.05, seed=None):
         self.interval = interval
         self.min_inc = min_inc
         self.max_inc = max_inc
+        # Own generator per seed so batch scenarios are reproducible
+        self.rng = random.Random(seed) if seed is not None else random
 
     def fluctuate_load(self, t, bus_data):
         """
@@ -13,19 +16,59 @@ class LoadFluctuator:
         # Trigger every 5 seconds, but skip t=0
         if t > 0 and t % self.interval == 0:
             # Generate a random percentage between 0.01 and 0.05
-            increase_pct = random.uniform(self.min_inc, self.max_inc)
+            increase_pct = self.rng.uniform(self.min_inc, self.max_inc)
             
-            for b in bus_data:
-                if b['type'] == 3:  # Apply only to PQ (Load) buses
-                    # Increase Active (Pl) and Reactive (Ql) power
-                    b['Pl'] = b['Pl'] * (1.0 + increase_pct)
-                    b['Ql'] = b['Ql'] * (1.0 + increase_pct)
-                    
-                    # Update the Newton-Raphson targets
-                    b['P_spec'] = b['Pg'] - b['Pl']
-                    b['Q_spec'] = b['Qg'] - b['Ql']
+            if isinstance(bus_data, network.Network):
+                bus_data.scale_loads(1.0 + increase_pct)  # Masked multiply on PQ buses
+            else:
+                for b in bus_data:
+                    if b['type'] == 3:  # Apply only to PQ (Load) buses
+                        # Increase Active (Pl) and Reactive (Ql) power
+                        b['Pl'] = b['Pl'] * (1.0 + increase_pct)
+                        b['Ql'] = b['Ql'] * (1.0 + increase_pct)
+                        
+                        # Update the Newton-Raphson targets
+                        b['P_spec'] = b['Pg'] - b['Pl']
+                        b['Q_spec'] = b['Qg'] - b['Ql']
             
             alert = f"   [LOAD FLUCTUATION] Demand increased by {increase_pct*100:.2f}%!"
             return True, alert
             
-        return False, ""
\ No newline at end of file
+        return False, ""
+
+class ProfileLoadFluctuator:
+    def __init__(self, profile):
+        """
+        Replays a demand profile instead of random increases.
+
+        Args:
+            profile (list): PQ load multiplier for each second t = 1..T,
+                relative to the initial loads (1.0 = unchanged)
+        """
+        self.profile = list(profile)
+
+    def fluctuate_load(self, t, bus_data):
+        """
+        Scales the PQ loads by the change of the profile since the last step.
+        Relative scaling keeps load already shed by UFLS off the system.
+        """
+        if t < 1 or t > len(self.profile):
+            return False, ""
+
+        previous = self.profile[t - 2] if t >= 2 else 1.0
+        ratio = self.profile[t - 1] / previous
+        if ratio == 1.0:
+            return False, ""
+
+        if isinstance(bus_data, network.Network):
+            bus_data.scale_loads(ratio)
+        else:
+            for b in bus_data:
+                if b['type'] == 3:
+                    b['Pl'] = b['Pl'] * ratio
+                    b['Ql'] = b['Ql'] * ratio
+                    b['P_spec'] = b['Pg'] - b['Pl']
+                    b['Q_spec'] = b['Qg'] - b['Ql']
+
+        alert = f"   [LOAD PROFILE] Demand changed by {(ratio - 1.0)*100:.2f}%!"
+        return True, alert
@@ -0,0 +1,252 @@
+import os
+import numpy as np
+import network
+
+# Typical normalized daily demand (hourly, mean 1.0): night trough, morning and evening peaks
+DAILY_SHAPE = np.array([
+    0.78, 0.74, 0.72, 0.71, 0.72, 0.77, 0.88, 1.00, 1.07, 1.09, 1.10, 1.10,
+    1.09, 1.08, 1.07, 1.07, 1.09, 1.14, 1.20, 1.21, 1.16, 1.07, 0.95, 0.85,
+])
+MIN_MULTIPLIER = 1e-3  # Noise never drives a load to zero, which relative scaling could not undo
+
+def _meta_path(path):
+    return os.path.splitext(path)[0] + ".meta.npz"
+
+class LoadProfile:
+    def __init__(self, multipliers, bus_ids, time_step=1.0, path=None):
+        """
+        Per-bus load multipliers for the whole horizon, usable as the
+        simulator's fluctuator.
+
+        Row k holds the Pl / Ql multipliers (relative to the initial loads)
+        of every profiled bus at t = (k + 1) * time_step. fluctuate_load
+        looks up the row of step t and scales each bus by its change since
+        the previous row, so load shed by UFLS stays off, as with
+        ProfileLoadFluctuator.
+
+        Args:
+            multipliers (np.ndarray): (T x n_bus) array, may be a np.memmap
+            bus_ids (array): Bus ID of each column
+            time_step (float): Seconds between rows (the simulator's TIME_STEP)
+            path (str): File the multipliers are mapped from, if any
+        """
+        self.multipliers = multipliers
+        self.bus_ids = np.asarray(bus_ids, dtype=int)
+        self.time_step = time_step
+        self.path = path
+        self._positions = (None, None)
+
+    @property
+    def n_steps(self):
+        return self.multipliers.shape[0]
+
+    # --- Storage ---
+    def save(self, path):
+        """
+        Writes the multipliers as a .npy file (memory-mappable) and the bus
+        IDs / time step next to it (<stem>.meta.npz).
+        """
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=self.multipliers.dtype,
+                                        shape=self.multipliers.shape)
+        out[:] = self.multipliers
+        out.flush()
+        del out
+        np.savez(_meta_path(path), bus_ids=self.bus_ids, time_step=self.time_step)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Opens a saved profile. With mmap the array stays on disk and is
+        paged in on access, so many processes share one copy through the
+        OS page cache.
+        """
+        multipliers = np.load(path, mmap_mode='r' if mmap else None)
+        with np.load(_meta_path(path)) as meta:
+            return cls(multipliers, meta['bus_ids'], float(meta['time_step']), path=path)
+
+    @classmethod
+    def from_recorded(cls, loads, bus_ids, base=None, time_step=1.0):
+        """
+        Replays recorded per-bus loads.
+
+        Args:
+            loads (np.ndarray): (T x n_bus) recorded loads, any unit
+            bus_ids (array): Bus ID of each column
+            base (array): Loads that correspond to the case's initial loads
+                (None: the first recorded row)
+        """
+        loads = np.asarray(loads, dtype=float)
+        base = loads[0] if base is None else np.asarray(base, dtype=float)
+        multipliers = np.divide(loads, base, out=np.ones_like(loads), where=base > 0)
+        return cls(np.maximum(multipliers, MIN_MULTIPLIER), bus_ids, time_step)
+
+    @classmethod
+    def from_csv(cls, path, base=None, time_step=1.0):
+        """Recorded loads from a CSV with one column per bus ID (header) and one row per step."""
+        with open(path) as f:
+            header = f.readline().strip().split(',')
+        loads = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+        return cls.from_recorded(loads, [int(float(h)) for h in header], base, time_step)
+
+    # --- Fluctuator interface ---
+    def _bus_positions(self, bus_data):
+        """Network positions of the profiled buses (-1: not in the network), cached per network."""
+        if self._positions[0] is not bus_data:
+            id_map = bus_data.id_map if isinstance(bus_data, network.Network) else {b['id']: i for i, b in enumerate(bus_data)}
+            pos = np.array([id_map.get(b, -1) for b in self.bus_ids.tolist()], dtype=int)
+            self._positions = (bus_data, pos)
+        return self._positions[1]
+
+    def fluctuate_load(self, t, bus_data):
+        """Scales every profiled bus by its multiplier change from step t - 1 to t."""
+        if t < 1 or t > self.n_steps:
+            return False, ""
+
+        current = np.asarray(self.multipliers[t - 1], dtype=float)
+        previous = np.asarray(self.multipliers[t - 2], dtype=float) if t >= 2 else np.ones_like(current)
+        ratio = np.divide(current, previous, out=np.ones_like(current), where=previous > 0)
+        pos = self._bus_positions(bus_data)
+        changed = (ratio != 1.0) & (pos >= 0)
+        if not changed.any():
+            return False, ""
+
+        idx, ratio = pos[changed], ratio[changed]
+        if isinstance(bus_data, network.Network):
+            load_before = bus_data.total_load()
+            mask = np.zeros(len(bus_data), dtype=bool)
+            mask[idx] = True
+            scale = np.ones(len(bus_data))
+            scale[idx] = ratio
+            bus_data.scale_loads(scale[mask], mask)
+            load_after = bus_data.total_load()
+        else:
+            load_before = sum(b['Pl'] for b in bus_data)
+            for i, r in zip(idx.tolist(), ratio.tolist()):
+                b = bus_data[i]
+                b['Pl'] = b['Pl'] * r
+                b['Ql'] = b['Ql'] * r
+                b['P_spec'] = b['Pg'] - b['Pl']
+                b['Q_spec'] = b['Qg'] - b['Ql']
+            load_after = sum(b['Pl'] for b in bus_data)
+
+        change = (load_after / load_before - 1.0) * 100 if load_before > 0 else 0.0
+        alert = f"   [LOAD PROFILE] Demand changed by {change:.2f}%!"
+        return True, alert
+
+class LoadProfileGenerator:
+    def __init__(self, bus_ids, n_steps, time_step=1.0, seed=None, path=None, dtype=np.float64):
+        """
+        Builds a LoadProfile from composable components, all multiplicative:
+        daily_shape, correlated_noise and step_event return self so they can
+        be chained.
+
+        All randomness comes from one numpy Generator seeded with seed, drawn
+        row by row, so a profile is reproducible and independent of how it
+        is stored. With path, the (n_steps x n_bus) array is created as a
+        memory-mapped .npy file and filled in place.
+
+        Args:
+            bus_ids (array): Profiled buses (e.g. the PQ buses of a case)
+            n_steps (int): Horizon in time steps
+            time_step (float): Seconds per row
+            seed (int): Seed of the numpy Generator
+            path (str): Generate straight into this .npy file
+            dtype: float64, or float32 to halve the storage
+        """
+        self.bus_ids = np.asarray(bus_ids, dtype=int)
+        self.time_step = time_step
+        self.rng = np.random.default_rng(seed)
+        self.path = path
+        shape = (n_steps, len(self.bus_ids))
+        if path is not None:
+            self.multipliers = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+            self.multipliers[:] = 1.0
+        else:
+            self.multipliers = np.ones(shape, dtype=dtype)
+
+    @classmethod
+    def for_network(cls, bus_data, n_steps, **kwargs):
+        """Generator over the PQ buses of a case (the buses LoadFluctuator scales)."""
+        ids, types, *_ = network.bus_arrays(bus_data)
+        return cls(ids[types == 3], n_steps, **kwargs)
+
+    def _times(self):
+        return np.arange(1, self.multipliers.shape[0] + 1) * self.time_step
+
+    def daily_shape(self, shape=DAILY_SHAPE, start_hour=0.0, amplitude=1.0):
+        """
+        Multiplies by a periodic daily curve (len(shape) equally spaced
+        points over 24 h, linearly interpolated), normalized to its value at
+        start_hour so the first step stays close to the case's loads.
+
+        Args:
+            shape (array): Daily curve, e.g. DAILY_SHAPE
+            start_hour (float): Hour of day at t = 0
+            amplitude (float): Scales the deviation from the curve's mean
+        """
+        shape = np.asarray(shape, dtype=float)
+        shape = shape.mean() + amplitude * (shape - shape.mean())
+        grid = np.arange(len(shape) + 1) * 24.0 / len(shape)
+        periodic = np.append(shape, shape[0])
+        hours = (start_hour + self._times() / 3600.0) % 24.0
+        curve = np.interp(hours, grid, periodic) / np.interp(start_hour % 24.0, grid, periodic)
+        self.multipliers *= curve[:, None].astype(self.multipliers.dtype)
+        return self
+
+    def correlated_noise(self, sigma=0.02, correlation=0.5, tau=60.0):
+        """
+        Multiplies by (1 + x), x a zero-mean AR(1) process per bus with
+        standard deviation sigma and time constant tau (s).
+
+        Args:
+            sigma (float): Stationary standard deviation (fraction of load)
+            correlation (float or np.ndarray): Bus-to-bus correlation: a
+                scalar (one shared factor, every pair correlated by it) or
+                an (n_bus x n_bus) correlation matrix (Cholesky factor)
+            tau (float): Correlation time; 0 gives white noise
+        """
+        n_steps, n = self.multipliers.shape
+        phi = np.exp(-self.time_step / tau) if tau > 0 else 0.0
+        innovation = sigma * np.sqrt(1.0 - phi**2)
+        if np.ndim(correlation) == 0:
+            L = None
+            w_common, w_own = np.sqrt(correlation), np.sqrt(1.0 - correlation)
+        else:
+            L = np.linalg.cholesky(np.asarray(correlation, dtype=float))
+
+        def draw():
+            if L is not None:
+                return L @ self.rng.standard_normal(n)
+            return w_common * self.rng.standard_normal() + w_own * self.rng.standard_normal(n)
+
+        x = sigma * draw()  # Start from the stationary distribution
+        for k in range(n_steps):
+            if k:
+                x = phi * x + innovation * draw()
+            self.multipliers[k] *= np.maximum(1.0 + x, MIN_MULTIPLIER)
+        return self
+
+    def step_event(self, t, factor, bus_ids=None):
+        """
+        Multiplies the load of some buses by factor from time t (s) onward.
+
+        Args:
+            t (float): Event time
+            factor (float): e.g. 1.1 for a 10% step up
+            bus_ids (list): Affected buses (None: all profiled buses)
+        """
+        rows = self._times() >= t
+        if bus_ids is None:
+            self.multipliers[rows] *= factor
+        else:
+            cols = np.flatnonzero(np.isin(self.bus_ids, bus_ids))
+            self.multipliers[np.ix_(rows, cols)] *= factor
+        return self
+
+    def build(self):
+        """Returns the LoadProfile (flushed to disk and reopened read-only if path was given)."""
+        if self.path is None:
+            return LoadProfile(self.multipliers, self.bus_ids, self.time_step)
+        self.multipliers.flush()
+        np.savez(_meta_path(self.path), bus_ids=self.bus_ids, time_step=self.time_step)
+        return LoadProfile.load(self.path)
@@ -1,12 +1,16 @@
+import argparse
 import sys
 import time
 import numpy as np
 import ybus_generator
-import nr_solver
+import case_loader
+import simulator
 import automatic_generation_control
-import line_parameters
 import ufls_controller
 import load_fluctuator  # <--- NEW IMPORT
+import instrumentation
+import continuation_power_flow
+import streaming
 
 # --- COLOR CODES ---
 RED = "\033[91m"
@@ -14,33 +18,53 @@ YELLOW = "\033[93m"
 CYAN = "\033[96m"  # For Load Fluctuation Alerts
 RESET = "\033[0m"
 
-# --- SIMULATION PARAMETERS ---
-SYSTEM_FREQ = 50.0   
-H_CONST = 5.0        
-TIME_STEP = 1.0      
-TRIP_TIME = 5
-
-# --- PHYSICS CONSTANTS ---
-DAMPING = 0.02       
-TURBINE_LAG = 0.3    
-
-def main():
-    global SYSTEM_FREQ
-    
-    # 1. Get Initial Data
-    b_data, l_data = ybus_generator.get_user_input()
+# Simulator event kind -> alert color (uncolored kinds are printed plain)
+EVENT_COLORS = {'trip': RED, 'collapse': RED, 'fluctuation': CYAN, 'ufls': YELLOW, 'ufls_done': YELLOW}
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Grid frequency and UFLS simulation")
+    parser.add_argument("case", nargs="?", help="Case file (.m, .json or _bus/_line .csv); interactive input if omitted")
+    parser.add_argument("--headless", action="store_true", help="No tables and no delay, print a summary at the end")
+    parser.add_argument("--trip", type=int, default=None, help="PV bus to trip (0 = none); skips the prompt")
+    parser.add_argument("--duration", type=int, default=60, help="Simulated seconds")
+    parser.add_argument("--render-every", type=int, default=1, help="Print the tables every N steps")
+    parser.add_argument("--solver-stats", action="store_true",
+                        help="Print the load flow iterations and Jacobian factorizations of every step")
+    parser.add_argument("--output", help="Save the per-step results to this .npz file")
+    parser.add_argument("--method", choices=("nr", "fdlf"), default=simulator.LOAD_FLOW_METHOD,
+                        help="Load flow of every step: Newton-Raphson or fast-decoupled")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Adaptive RK stepping of the frequency dynamics, load flow only on injection changes")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Record Y-bus / load flow / line-state / step timings and write them to this JSON file")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="With --profile: also run cProfile (top functions in the JSON, raw stats in PATH.prof)")
+    parser.add_argument("--margin", action="store_true",
+                        help="Print the loadability margin of the initial case (continuation power flow)")
+    parser.add_argument("--stream", metavar="SOURCE",
+                        help="Drive the loads from telemetry instead of random fluctuations: "
+                             "tcp:HOST:PORT (listen) or file:PATH (tail); see streaming.py")
+    parser.add_argument("--tick", type=float, default=streaming.TICK,
+                        help="With --stream: wall-clock seconds per simulated step")
+    parser.add_argument("--publish", metavar="PATH",
+                        help="With --stream: write the per-step results as JSON lines to PATH")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    # 1. Get Initial Data (case file given on the command line, else interactive)
+    if args.case:
+        b_data, l_data = case_loader.load_network(args.case), None
+    else:
+        b_data, l_data = ybus_generator.get_user_input()
     if not b_data: sys.exit()
 
-    # --- CONTROL & SAFETY TUNING ---
-    agc_sys = automatic_generation_control.AGC(K_p=2.0, K_i=0.02) 
-    ufls_sys = ufls_controller.UFLS() 
-    fluctuator = load_fluctuator.LoadFluctuator(interval=5) # <--- Initialize Fluctuator
-
     # --- PV BUS SELECTION ---
     pv_buses = [b for b in b_data if b['type'] == 2]
-    target_trip_id = None
+    target_trip_id = args.trip or None
     
-    if pv_buses:
+    if pv_buses and args.trip is None and not args.headless:
         print("\n" + "="*40)
         print("      SELECT GENERATOR TO TRIP")
         print("="*40)
@@ -63,134 +87,152 @@ def main():
                     break
             except ValueError: pass
 
-    # Build Y-Bus
-    Y_bus = ybus_generator.build_y_bus(b_data, l_data)
+    if args.margin:
+        print_margin(b_data, l_data)
 
-    print("\n--- Starting Simulation (t=1 to 60s) ---")
-    print("Initializing Steady State...")
-    V_sol, Th_sol, P_cal, Q_cal = nr_solver.run_load_flow(Y_bus, b_data, SYSTEM_FREQ, time_step=0)
-
-    # Initialize Turbine and Dynamics
-    slack_idx = next(i for i, b in enumerate(b_data) if b['type'] == 1)
-    current_turbine_power = P_cal[slack_idx] 
-    rocof = 0.0  
-
-    # --- SIMULATION LOOP (60 Seconds) ---
-    for t in range(1, 61):
-        print(f"\n{'='*25} t = {t} seconds {'='*25}")
-        
-        # --- EVENT LOGIC ---
-        if t == TRIP_TIME and target_trip_id is not None:
-            print(f"{RED}!!! EVENT: BUS {target_trip_id} TRIPPED !!!{RESET}")
-            b_data = [b for b in b_data if b['id'] != target_trip_id]
-            Y_bus = ybus_generator.build_y_bus(b_data, l_data)
-            print("-> Grid Topology Updated.")
-            target_trip_id = None
-
-        # --- DYNAMIC LOAD FLUCTUATION (NEW) ---
-        # Randomly increase load every 5 seconds
-        fluctuated, fluc_alert = fluctuator.fluctuate_load(t, b_data)
-        if fluctuated:
-            print(f"{CYAN}{fluc_alert}{RESET}")
-
-        # --- UFLS LOGIC ---
-        shed_occurred, ufls_alerts = ufls_sys.check_and_shed(t, SYSTEM_FREQ, rocof, b_data)
-        if shed_occurred:
-            for alert in ufls_alerts:
-                print(f"{YELLOW}{alert}{RESET}")
-            print(f"{YELLOW}   -> Load reduced. NR Solver target updated.{RESET}")
-
-        # --- 1. RUN LOAD FLOW ---
-        V_sol, Th_sol, P_calc, Q_calc = nr_solver.run_load_flow(Y_bus, b_data, SYSTEM_FREQ, time_step=t)
-        
-        if V_sol is None:
-            print(f"{RED}Simulation Crash (Voltage Collapse).{RESET}")
-            break
-
-        # Map IDs to matrix indices
-        bus_id_map = {b['id']: i for i, b in enumerate(b_data)}
+    # --- CONTROL & SAFETY TUNING ---
+    agc_sys = automatic_generation_control.AGC(K_p=2.0, K_i=0.02) 
+    ufls_sys = ufls_controller.UFLS() 
+    fluctuator = load_fluctuator.LoadFluctuator(interval=5) # <--- Initialize Fluctuator
+    if args.stream:
+        fluctuator = streaming.StreamFluctuator()
+
+    observers = [] if args.headless else [ConsoleRenderer(every=args.render_every, solver_stats=args.solver_stats)]
+    sim = simulator.Simulator(b_data, l_data, fluctuator, ufls_sys, agc_sys, target_trip_id,
+                              duration=args.duration, record_states=args.output is not None,
+                              observers=observers, adaptive=args.adaptive, method=args.method)
+    recorder = instrumentation.SpanRecorder(cprofile=args.cprofile) if args.profile else None
+    start = time.perf_counter()
+    run = sim.run
+    if args.stream:
+        streamer = streaming.StreamingSimulator(sim, tick=args.tick, output=args.publish)
+        run = lambda: streaming.run_source(streamer, args.stream)
+    if recorder is not None:
+        with recorder:
+            result = run()
+    else:
+        result = run()
+    wall = time.perf_counter() - start
+    ufls_sys.close()  # Write out the buffered training rows
+
+    if args.headless:
+        print_summary(sim, result, wall)
+        if args.stream:
+            print(f"Stream: {streamer.summary()}")
+    if args.output:
+        np.savez(args.output, **result)
+    if recorder is not None:
+        recorder.export(args.profile)
+        print("\n" + recorder.report())
+        print(f"Profile written to {args.profile}")
+
+class ConsoleRenderer(simulator.SimulationObserver):
+    def __init__(self, every=1, delay=0.05, solver_stats=False):
+        """
+        Prints the per-step tables and the event alerts of a Simulator.
+
+        Args:
+            every (int): Print the tables every N steps (events always print)
+            delay (float): Pause after each printed step in seconds (0 = full speed)
+            solver_stats (bool): Also print the load flow iteration and
+                factorization counts of each step
+        """
+        self.every = max(1, every)
+        self.delay = delay
+        self.solver_stats = solver_stats
+        self._show = False
+        self._header_done = False
+
+    def _header(self, t):
+        if not self._header_done:
+            print(f"\n{'='*25} t = {t} seconds {'='*25}")
+            self._header_done = True
+
+    def on_start(self, sim):
+        print(f"\n--- Starting Simulation (t=1 to {sim.duration}s) ---")
+        print("Initializing Steady State...")
+
+    def on_step_begin(self, sim, t):
+        self._show = t % self.every == 0
+        self._header_done = False
+        if self._show:
+            self._header(t)
+
+    def on_event(self, sim, t, kind, message):
+        self._header(t)
+        if kind in EVENT_COLORS:
+            print(f"{EVENT_COLORS[kind]}{message}{RESET}")
+        else:
+            print(message)
+
+    def on_step(self, sim, step):
+        if not self._show:
+            return
+        print_step_tables(sim.net, sim.line_idx, sim.line_arrays, sim.session, step, self.solver_stats)
 
-        # --- 2. DISPLAY ELECTRICAL TABLE ---
-        print(f"\n[ ELECTRICAL STATE ]")
-        print(f"{'ID':<4} {'V (pu)':<10} {'Ang (deg)':<10} {'P (pu)':<10} {'Q (pu)':<10}")
-        
-        slack_p_demand = 0.0
-        slack_p_limit = 999.0
-        
-        for i, b in enumerate(b_data):
-            deg = np.degrees(Th_sol[i])
-            p_val = P_calc[i]
-            p_str = f"{p_val:.4f}"
-            
-            if b['type'] == 1:
-                slack_p_demand = p_val
-                slack_p_limit = b.get('P_max', 999.0)
-            
-            if b['type'] in [1, 2]:
-                p_max = b.get('P_max', 999.0)
-                if p_val > p_max + 0.0001:
-                    p_str = f"{RED}{p_max:.4f}{RESET}"
-            
-            display_p = p_str if RED not in p_str else p_str
-            print(f"{b['id']:<4} {V_sol[i]:<10.4f} {deg:<10.4f} {display_p:<18} {Q_calc[i]:<10.4f}")
-
-        # --- 3. DISPLAY PHYSICAL TABLE (LINES) ---
-        print(f"\n[ PHYSICAL STATE - LINES ]")
-        print(f"{'Line':<8} {'Cond':<10} {'Current(A)':<12} {'Temp(C)':<10} {'Sag(m)':<8}")
-        
-        for line in l_data:
-            if line['from'] not in bus_id_map or line['to'] not in bus_id_map:
-                continue 
-            
-            if 'voltage_kV' not in line: line['voltage_kV'] = 230.0
-            if 'length_km' not in line: line['length_km'] = line.get('length', 50.0)
-                
-            c_name, I_a, T_c, S_g, T_max = line_parameters.calculate_dynamic_line_state(
-                line, V_sol, Th_sol, Y_bus, bus_id_map
-            )
-            
-            limit_color = RED if T_c > T_max else RESET
-            line_name = f"{line['from']}-{line['to']}"
-            print(f"{line_name:<8} {c_name:<10} {I_a:<12.2f} {limit_color}{T_c:<10.2f}{RESET} {S_g:<8.2f}")
-
-        # --- 4. DYNAMICS & CONTROL ---
         print(f"\n[ GRID CONTROL ]")
+        print(f"   Turbine Output: {step['turbine_power']:.4f} pu (Target: {step['target_mech_power']:.4f})")
+        print(f"   AGC Output:     {step['p_agc']:.4f} pu")
+        print(f"   Frequency:      {step['frequency']:.4f} Hz | RoCoF: {step['rocof']:.4f} Hz/s")
+
+        if self.delay:
+            time.sleep(self.delay)
+
+def print_summary(sim, result, wall):
+    """Short report of a headless run."""
+    freq = result['frequency'][~np.isnan(result['frequency'])]
+    print(f"Simulated {sim.t} of {sim.duration} s in {wall:.3f} s wall time ({sim.load_flows} load flows)")
+    if freq.size:
+        print(f"Frequency: final {freq[-1]:.4f} Hz, min {freq.min():.4f} Hz")
+    print(f"UFLS stages tripped: {int(result['ufls_stages'].max())} | Collapsed: {'yes' if result['collapsed'] else 'no'}")
+
+def print_margin(b_data, l_data):
+    """Distance to voltage collapse along the LoadFluctuator load direction."""
+    Y_bus = ybus_generator.build_y_bus(b_data, l_data, sparse=len(b_data) > simulator.SPARSE_THRESHOLD)
+    try:
+        margin = continuation_power_flow.loadability_margin(Y_bus, b_data)
+    except np.linalg.LinAlgError:
+        print(f"{RED}   [WARNING] Base case load flow did not converge, no loadability margin.{RESET}")
+        return
+    nose = "" if margin['nose_reached'] else " (nose not reached)"
+    print(f"Loadability margin: +{margin['lambda_max']*100:.1f}% PQ load ({margin['margin_pu']:.4f} pu){nose}, "
+          f"critical bus {margin['critical_bus']}")
+
+def print_step_tables(net, line_idx, line_arrays, session, step, solver_stats=False):
+    """Prints the electrical (bus) and physical (line) tables of one Simulator step."""
+    V_sol, Th_sol, P_calc, Q_calc = step['V'], step['theta'], step['P'], step['Q']
+
+    # --- 2. DISPLAY ELECTRICAL TABLE ---
+    print(f"\n[ ELECTRICAL STATE ]")
+    if solver_stats:
+        print(f"Load Flow: {session.iterations} iterations, {session.factorizations} Jacobian factorizations")
+    print(f"{'ID':<4} {'V (pu)':<10} {'Ang (deg)':<10} {'P (pu)':<10} {'Q (pu)':<10}")
+    
+    for i, b in enumerate(net):
+        deg = np.degrees(Th_sol[i])
+        p_val = P_calc[i]
+        p_str = f"{p_val:.4f}"
         
-        raw_agc = agc_sys.calculate_regulation(SYSTEM_FREQ, TIME_STEP)
-        
-        AGC_LIMIT = 0.5
-        if raw_agc > AGC_LIMIT: p_agc = AGC_LIMIT
-        elif raw_agc < -AGC_LIMIT: p_agc = -AGC_LIMIT
-        else: p_agc = raw_agc
-        
-        target_mech_power = slack_p_demand + p_agc
-        
-        if target_mech_power > slack_p_limit: target_mech_power = slack_p_limit
-
-        diff = target_mech_power - current_turbine_power
-        current_turbine_power += diff * TURBINE_LAG
-        
-        damping_loss = DAMPING * (SYSTEM_FREQ - 50.0)
-        net_imbalance = current_turbine_power - slack_p_demand - damping_loss
-        
-        rocof = 0.0
-        if abs(net_imbalance) > 0.000001:
-            total_load_est = sum([b['Pl'] for b in b_data]) 
-            if total_load_est > 0:
-                numerator = net_imbalance * 50.0
-                denominator = total_load_est * 2 * H_CONST
-                rocof = numerator / denominator
-                SYSTEM_FREQ += rocof * TIME_STEP
+        if b['type'] in [1, 2]:
+            p_max = b['P_max']
+            if p_val > p_max + 0.0001:
+                p_str = f"{RED}{p_max:.4f}{RESET}"
         
-        print(f"   Turbine Output: {current_turbine_power:.4f} pu (Target: {target_mech_power:.4f})")
-        print(f"   AGC Output:     {p_agc:.4f} pu")
-        print(f"   Frequency:      {SYSTEM_FREQ:.4f} Hz | RoCoF: {rocof:.4f} Hz/s")
-
-        for i in range(len(b_data)):
-            b_data[i]['V'] = V_sol[i]
-            b_data[i]['theta'] = Th_sol[i]
+        display_p = p_str if RED not in p_str else p_str
+        print(f"{b['id']:<4} {V_sol[i]:<10.4f} {deg:<10.4f} {display_p:<18} {Q_calc[i]:<10.4f}")
 
-        time.sleep(0.05) 
+    # --- 3. DISPLAY PHYSICAL TABLE (LINES) ---
+    print(f"\n[ PHYSICAL STATE - LINES ]")
+    print(f"{'Line':<8} {'Cond':<10} {'Current(A)':<12} {'Temp(C)':<10} {'Sag(m)':<8}")
+    
+    I_a, T_c, S_g, T_max = step['line_current'], step['line_temp'], step['line_sag'], step['line_temp_max']
+
+    from_ids = net.line_columns['from'][line_idx].astype(int)
+    to_ids = net.line_columns['to'][line_idx].astype(int)
+    for k in range(len(line_idx)):
+        limit_color = RED if T_c[k] > T_max[k] else RESET
+        line_name = f"{from_ids[k]}-{to_ids[k]}"
+        print(f"{line_name:<8} {line_arrays['c_name'][k]:<10} {I_a[k]:<12.2f} {limit_color}{T_c[k]:<10.2f}{RESET} {S_g[k]:<8.2f}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
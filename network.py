@@ -0,0 +1,316 @@
+from collections.abc import MutableMapping
+import numpy as np
+import line_parameters
+
+# Bus dict key -> Network attribute
+BUS_COLUMNS = {
+    'id': 'ids', 'type': 'types', 'V': 'V', 'theta': 'theta',
+    'Pg': 'Pg', 'Pl': 'Pl', 'Qg': 'Qg', 'Ql': 'Ql',
+    'P_spec': 'P_spec', 'Q_spec': 'Q_spec', 'P_max': 'P_max', 'area': 'area',
+}
+# Values of bus keys missing from old-style dicts / caches
+BUS_DEFAULTS = {'P_max': 999.99, 'area': 1}
+# Line dict keys kept as columns (NaN = key absent, e.g. r/x of a transformer entry)
+LINE_FIELDS = ['from', 'to', 'r', 'x', 'b', 'N', 'rt', 'xt', 'voltage_kV', 'length_km']
+INT_FIELDS = {'id', 'type', 'from', 'to', 'area'}
+
+class BusRecord(MutableMapping):
+    """Dict-like view of one bus row; reads and writes go to the Network arrays."""
+    __slots__ = ('_net', '_i')
+
+    def __init__(self, net, i):
+        self._net = net
+        self._i = i
+
+    def __getitem__(self, key):
+        value = getattr(self._net, BUS_COLUMNS[key])[self._i]
+        return int(value) if key in INT_FIELDS else float(value)
+
+    def __setitem__(self, key, value):
+        if key not in BUS_COLUMNS:
+            raise KeyError(f"Network buses have no '{key}' column")
+        getattr(self._net, BUS_COLUMNS[key])[self._i] = value
+
+    def __delitem__(self, key):
+        raise TypeError("Bus columns cannot be deleted")
+
+    def __iter__(self):
+        return iter(BUS_COLUMNS)
+
+    def __len__(self):
+        return len(BUS_COLUMNS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+def _reciprocal(re, im):
+    """1 / (re + j im) by Smith's method, rounding exactly like Python's complex division."""
+    re, im = np.asarray(re, dtype=float), np.asarray(im, dtype=float)
+    out = np.empty(re.shape, dtype=complex)
+    big_re = np.abs(re) >= np.abs(im)
+    ratio = im[big_re] / re[big_re]
+    denom = re[big_re] + im[big_re] * ratio
+    out.real[big_re], out.imag[big_re] = 1.0 / denom, -ratio / denom
+    ratio = re[~big_re] / im[~big_re]
+    denom = re[~big_re] * ratio + im[~big_re]
+    out.real[~big_re], out.imag[~big_re] = ratio / denom, -1.0 / denom
+    return out
+
+def _divide(z, d):
+    """Complex / real division part by part, as Python does it."""
+    out = np.empty(z.shape, dtype=complex)
+    out.real, out.imag = z.real / d, z.imag / d
+    return out
+
+class Network:
+    def __init__(self, bus_columns, line_columns, line_status=None):
+        """
+        Structure-of-arrays bus and line model.
+
+        Every bus field is one NumPy array (ids, types, V, theta, Pg, Pl, Qg,
+        Ql, P_spec, Q_spec, P_max, area) and every line field one column. The ID ->
+        index map and the branch end indices are built once here. Iterating
+        or indexing the Network yields BusRecord views, so code written for
+        the old list of bus dicts keeps working on it.
+
+        Args:
+            bus_columns (dict): Bus dict key -> array (P_spec / Q_spec / area optional)
+            line_columns (dict): LINE_FIELDS key -> array
+            line_status (np.ndarray): False for branches switched out
+                (None: all closed); a branch is in service if it is closed
+                and both its end buses exist
+        """
+        self.ids = np.asarray(bus_columns['id'], dtype=int)
+        self.types = np.asarray(bus_columns['type'], dtype=int)
+        for key in ('V', 'theta', 'Pg', 'Pl', 'Qg', 'Ql', 'P_max'):
+            setattr(self, key, np.array(bus_columns[key], dtype=float))
+        self.P_spec = np.array(bus_columns['P_spec'], dtype=float) if 'P_spec' in bus_columns else self.Pg - self.Pl
+        self.Q_spec = np.array(bus_columns['Q_spec'], dtype=float) if 'Q_spec' in bus_columns else self.Qg - self.Ql
+        self.area = np.array(bus_columns.get('area', np.full(len(self.ids), BUS_DEFAULTS['area'])), dtype=int)
+
+        self.line_columns = {key: np.asarray(line_columns[key], dtype=float) for key in LINE_FIELDS}
+        self.id_map = {bid: i for i, bid in enumerate(self.ids.tolist())}
+
+        # Branch end indices, -1 when an end bus is not in the network
+        self.line_from_idx = np.array([self.id_map.get(b, -1) for b in self.line_columns['from'].astype(int).tolist()], dtype=int)
+        self.line_to_idx = np.array([self.id_map.get(b, -1) for b in self.line_columns['to'].astype(int).tolist()], dtype=int)
+        m = len(self.line_from_idx)
+        self.line_status = np.ones(m, dtype=bool) if line_status is None else np.array(line_status, dtype=bool)
+        self.line_in_service = (self.line_from_idx >= 0) & (self.line_to_idx >= 0) & self.line_status
+        self._line_data = None
+
+    @classmethod
+    def from_dicts(cls, bus_data, line_data):
+        """Builds a Network from the old list-of-dicts structures."""
+        bus_columns = {key: [b.get(key, BUS_DEFAULTS.get(key, 0.0)) for b in bus_data]
+                       for key in BUS_COLUMNS}
+        line_columns = {key: [l.get(key, np.nan) for l in line_data] for key in LINE_FIELDS}
+        return cls(bus_columns, line_columns)
+
+    def to_dicts(self):
+        """Returns plain (bus_data, line_data) dict copies."""
+        return [dict(b) for b in self], [dict(l) for l in self.line_data]
+
+    # --- Compatibility view over the old bus dict list ---
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if i < 0: i += len(self.ids)
+        if not 0 <= i < len(self.ids):
+            raise IndexError("bus index out of range")
+        return BusRecord(self, i)
+
+    def __iter__(self):
+        return (BusRecord(self, i) for i in range(len(self.ids)))
+
+    @property
+    def line_data(self):
+        """Line dicts (built on first use, closed lines only) for callers of the old line_data API."""
+        if self._line_data is None:
+            cols = [self.line_columns[key].tolist() for key in LINE_FIELDS]
+            self._line_data = []
+            for row, closed in zip(zip(*cols), self.line_status.tolist()):
+                if not closed:
+                    continue  # Switched out: as if the line were not in the case
+                line = {key: v for key, v in zip(LINE_FIELDS, row) if v == v}  # v != v: NaN, key absent
+                line['from'] = int(line['from'])
+                line['to'] = int(line['to'])
+                if 'N' in line and line['N'] == int(line['N']): line['N'] = int(line['N'])
+                self._line_data.append(line)
+        return self._line_data
+
+    # --- Vectorized operations ---
+    @property
+    def pq_mask(self):
+        return self.types == 3
+
+    def scale_loads(self, factor, mask=None):
+        """
+        Multiplies Pl/Ql of the masked buses (default: PQ buses) by factor and
+        updates their P_spec / Q_spec.
+        """
+        if mask is None:
+            mask = self.pq_mask
+        self.Pl[mask] *= factor
+        self.Ql[mask] *= factor
+        self.P_spec[mask] = self.Pg[mask] - self.Pl[mask]
+        self.Q_spec[mask] = self.Qg[mask] - self.Ql[mask]
+
+    def total_load(self):
+        return float(self.Pl.sum())
+
+    def remove_bus(self, bus_id):
+        """Returns a new Network without the given bus (its branches go out of service)."""
+        keep = self.ids != bus_id
+        bus_columns = {key: getattr(self, attr)[keep] for key, attr in BUS_COLUMNS.items()}
+        return Network(bus_columns, self.line_columns, self.line_status)
+
+    def remove_lines(self, line_idx):
+        """Returns a new Network with the given lines (rows of line_columns) switched out."""
+        status = self.line_status.copy()
+        status[np.asarray(line_idx, dtype=int)] = False
+        bus_columns = {key: getattr(self, attr) for key, attr in BUS_COLUMNS.items()}
+        return Network(bus_columns, self.line_columns, status)
+
+    def branch_stamps(self, line_idx=None):
+        """
+        Vectorized ybus_generator.branch_stamps over the in-service lines,
+        emitted in the same per-line order so the sums round identically.
+
+        Args:
+            line_idx (array): Only stamp these lines (rows of line_columns)
+        """
+        cols = self.line_columns
+        on = self.line_in_service
+        if line_idx is not None:
+            on = on & np.isin(np.arange(len(on)), line_idx)
+        i, j = self.line_from_idx[on], self.line_to_idx[on]
+        r = np.nan_to_num(cols['r'][on])
+        x = np.nan_to_num(cols['x'][on])
+        b = np.nan_to_num(cols['b'][on])
+        a = np.nan_to_num(cols['N'][on])
+
+        series = (r != 0.0) | (x != 0.0)
+        xfmr = a != 0
+        vals = np.zeros((len(i), 8), dtype=complex)
+        y_s = _reciprocal(r[series], x[series])
+        y_sh = 1j * b[series]
+        vals[series, :4] = np.column_stack((-y_s, -y_s, y_s + y_sh, y_s + y_sh))
+        y_t = _reciprocal(np.nan_to_num(cols['rt'][on][xfmr]), np.nan_to_num(cols['xt'][on][xfmr]))
+        a_t = a[xfmr]
+        vals[xfmr, 4:] = np.column_stack((_divide(-y_t, a_t), _divide(-y_t, a_t), _divide(y_t, a_t**2), y_t))
+
+        # Row-major boolean indexing keeps line order: series stamps, then transformer stamps
+        rows = np.column_stack((i, j, i, j, i, j, i, j))
+        cols_ = np.column_stack((j, i, i, j, j, i, i, j))
+        keep = np.column_stack((np.repeat(series[:, None], 4, axis=1), np.repeat(xfmr[:, None], 4, axis=1)))
+        return rows[keep], cols_[keep], vals[keep]
+
+    def branch_flows(self, V, theta):
+        """
+        Active power entering every line at both ends (same pi / transformer
+        model as branch_stamps). Out-of-service lines carry 0.
+
+        Returns:
+            P_from, P_to (np.ndarray): Per line of line_columns (pu)
+        """
+        cols = self.line_columns
+        on = self.line_in_service
+        i, j = self.line_from_idx[on], self.line_to_idx[on]
+        Vc = np.asarray(V) * np.exp(1j * np.asarray(theta))
+        Vi, Vj = Vc[i], Vc[j]
+
+        r, x = np.nan_to_num(cols['r'][on]), np.nan_to_num(cols['x'][on])
+        b, a = np.nan_to_num(cols['b'][on]), np.nan_to_num(cols['N'][on])
+        series = (r != 0.0) | (x != 0.0)
+        y_s = np.zeros(len(i), dtype=complex)
+        y_s[series] = _reciprocal(r[series], x[series])
+        y_sh = 1j * b * series
+        I_ij = y_s * (Vi - Vj) + y_sh * Vi
+        I_ji = y_s * (Vj - Vi) + y_sh * Vj
+
+        xfmr = a != 0
+        y_t = _reciprocal(np.nan_to_num(cols['rt'][on][xfmr]), np.nan_to_num(cols['xt'][on][xfmr]))
+        a_t = a[xfmr]
+        I_ij[xfmr] += y_t / a_t**2 * Vi[xfmr] - y_t / a_t * Vj[xfmr]
+        I_ji[xfmr] += y_t * Vj[xfmr] - y_t / a_t * Vi[xfmr]
+
+        P_from = np.zeros(len(on))
+        P_to = np.zeros(len(on))
+        P_from[on] = (Vi * np.conj(I_ij)).real
+        P_to[on] = (Vj * np.conj(I_ji)).real
+        return P_from, P_to
+
+    def area_export(self, V, theta, areas):
+        """
+        Net active power exported by each area over its tie lines.
+
+        Args:
+            areas (np.ndarray): Area numbers, fixes the output order
+
+        Returns:
+            np.ndarray: Export per area (pu), positive = leaving the area
+        """
+        P_from, P_to = self.branch_flows(V, theta)
+        on = self.line_in_service
+        area_from = np.full(len(on), -1)
+        area_to = np.full(len(on), -1)
+        area_from[on] = self.area[self.line_from_idx[on]]
+        area_to[on] = self.area[self.line_to_idx[on]]
+        tie = on & (area_from != area_to)
+
+        areas = np.asarray(areas)
+        order = np.argsort(areas)
+        export = np.zeros(len(areas))
+        for end_area, P_end in ((area_from[tie], P_from[tie]), (area_to[tie], P_to[tie])):
+            k = np.minimum(np.searchsorted(areas[order], end_area), len(areas) - 1)
+            ok = areas[order][k] == end_area  # Areas not listed are ignored
+            np.add.at(export, order[k[ok]], P_end[ok])
+        return export
+
+    def line_arrays(self, base_mva=100.0):
+        """
+        Static conductor arrays of the in-service lines.
+
+        Returns:
+            line_idx (np.ndarray): Line numbers (rows of line_columns) kept
+            arrays (dict): Output of line_parameters.build_line_arrays
+        """
+        line_idx = np.where(self.line_in_service)[0]
+        kV = np.nan_to_num(self.line_columns['voltage_kV'][line_idx], nan=230.0)
+        km = np.nan_to_num(self.line_columns['length_km'][line_idx], nan=50.0)
+        arrays = line_parameters.build_line_arrays(self.line_from_idx[line_idx], self.line_to_idx[line_idx],
+                                                   kV, km, base_mva)
+        return line_idx, arrays
+
+    # --- Binary storage ---
+    def save_npz(self, path):
+        """Writes the columns to an uncompressed .npz."""
+        arrays = {'bus_' + key: getattr(self, attr) for key, attr in BUS_COLUMNS.items()}
+        arrays.update({'line_' + key: col for key, col in self.line_columns.items()})
+        arrays['line_status'] = self.line_status
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load_npz(cls, path):
+        with np.load(path) as npz:
+            bus_columns = {key: npz['bus_' + key] for key in BUS_COLUMNS if 'bus_' + key in npz}
+            line_columns = {key: npz['line_' + key] for key in LINE_FIELDS}
+            line_status = npz['line_status'] if 'line_status' in npz else None
+        return cls(bus_columns, line_columns, line_status)
+
+def bus_arrays(bus_data):
+    """
+    Gathers (ids, types, V, theta, P_spec, Q_spec) arrays from a Network
+    (no per-bus Python work) or from a list of bus dicts. Always copies.
+    """
+    if isinstance(bus_data, Network):
+        return (bus_data.ids.copy(), bus_data.types.copy(), bus_data.V.copy(), bus_data.theta.copy(),
+                bus_data.P_spec.copy(), bus_data.Q_spec.copy())
+    return (np.array([b['id'] for b in bus_data]),
+            np.array([b['type'] for b in bus_data]),
+            np.array([b['V'] for b in bus_data], dtype=float),
+            np.array([b['theta'] for b in bus_data], dtype=float),
+            np.array([b['P_spec'] for b in bus_data], dtype=float),
+            np.array([b['Q_spec'] for b in bus_data], dtype=float))
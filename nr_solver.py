@@ -1,97 +1,312 @@
+import warnings
+import time
 import numpy as np
+import network
+import instrumentation
+
+try:
+    import scipy.linalg as sla
+    import scipy.sparse as sp
+    import scipy.sparse.linalg as spla
+except ImportError:  # scipy is optional, the dense solver is always available
+    sla = None
+    sp = None
+    spla = None
+
+def calc_power_injections(Y_bus, V, Theta):
+    """
+    Computes the bus power injections from the complex voltages.
+
+    Uses S = V * conj(Y_bus @ V) so the whole network is evaluated in one
+    matrix-vector product instead of a double loop over bus pairs.
+
+    Returns:
+        P_calc, Q_calc (np.ndarray): Active and reactive injections in pu
+    """
+    V_c = V * np.exp(1j * Theta)
+    S = V_c * np.conj(Y_bus @ V_c)
+    return S.real, S.imag
+
+def build_jacobian(Y_bus, V, Theta, P_calc, Q_calc):
+    """
+    Builds the four full-size Jacobian blocks (dP/dTheta, dP/dV, dQ/dTheta, dQ/dV).
+
+    Off-diagonal terms come from M[i, k] = V_i * V_k * |Y_ik| * exp(j(theta_i - theta_k - ang_Y)),
+    whose real part is the cosine term and imaginary part the sine term.
+    """
+    V_c = V * np.exp(1j * Theta)
+    M = V_c[:, None] * np.conj(Y_bus) * np.conj(V_c)[None, :]
+    term_a = M.imag
+    term_b = M.real
+
+    J1 = term_a.copy()
+    J2 = term_b / V[None, :]
+    J3 = -term_b
+    J4 = term_a / V[None, :]
+
+    # Diagonal terms
+    G_ii = Y_bus.diagonal().real
+    B_ii = Y_bus.diagonal().imag
+    diag = np.arange(len(V))
+    J1[diag, diag] = -Q_calc - (V**2 * B_ii)
+    J2[diag, diag] = P_calc / V + (V * G_ii)
+    J3[diag, diag] = P_calc - (V**2 * G_ii)
+    J4[diag, diag] = Q_calc / V - (V * B_ii)
+
+    return J1, J2, J3, J4
+
+def build_jacobian_sparse(Y_bus, V, Theta, P_calc, Q_calc):
+    """
+    Sparse counterpart of build_jacobian() for a scipy Y-Bus.
+
+    Same formulas, but M = diag(V) @ conj(Y_bus) @ diag(conj(V)) keeps the
+    sparsity pattern of the Y-Bus, so no n x n dense block is ever created.
+    """
+    V_c = V * np.exp(1j * Theta)
+    M = sp.diags(V_c) @ Y_bus.conj() @ sp.diags(np.conj(V_c))
+    off = (M - sp.diags(M.diagonal())).tocsr()
+    term_a = off.imag
+    term_b = off.real
+    inv_V = sp.diags(1.0 / V)
+
+    G_ii = Y_bus.diagonal().real
+    B_ii = Y_bus.diagonal().imag
+
+    J1 = term_a + sp.diags(-Q_calc - (V**2 * B_ii))
+    J2 = term_b @ inv_V + sp.diags(P_calc / V + (V * G_ii))
+    J3 = -term_b + sp.diags(P_calc - (V**2 * G_ii))
+    J4 = term_a @ inv_V + sp.diags(Q_calc / V - (V * B_ii))
+
+    return J1.tocsr(), J2.tocsr(), J3.tocsr(), J4.tocsr()
+
+def assemble_jacobian(Y_bus, V, Theta, P_calc, Q_calc, non_slack, idx_pq):
+    """
+    Builds the reduced Jacobian [[J1 J2], [J3 J4]] over the unknowns
+    (angles of non-slack buses, magnitudes of PQ buses).
+
+    Returns a dense array for a dense Y-Bus and a CSC matrix for a sparse one.
+    """
+    if sp is not None and sp.issparse(Y_bus):
+        J1, J2, J3, J4 = build_jacobian_sparse(Y_bus, V, Theta, P_calc, Q_calc)
+        return sp.bmat([
+            [J1[non_slack][:, non_slack], J2[non_slack][:, idx_pq]],
+            [J3[idx_pq][:, non_slack],    J4[idx_pq][:, idx_pq]],
+        ], format='csc')
+
+    J1, J2, J3, J4 = build_jacobian(Y_bus, V, Theta, P_calc, Q_calc)
+
+    J1_red = J1[np.ix_(non_slack, non_slack)]
+    J2_red = J2[np.ix_(non_slack, idx_pq)]
+    J3_red = J3[np.ix_(idx_pq, non_slack)]
+    J4_red = J4[np.ix_(idx_pq, idx_pq)]
+
+    top = np.hstack((J1_red, J2_red))
+    bot = np.hstack((J3_red, J4_red))
+    return np.vstack((top, bot))
+
+def solve_jacobian(J_final, M_final):
+    """
+    Solves J_final @ x = M_final with a sparse LU or a dense solve.
+
+    Raises:
+        np.linalg.LinAlgError: If the Jacobian is singular
+    """
+    if sp is not None and sp.issparse(J_final):
+        try:
+            # The Jacobian is structurally symmetric, so order on A^T + A
+            return spla.splu(J_final, permc_spec='MMD_AT_PLUS_A').solve(M_final)
+        except RuntimeError:
+            # splu signals an exactly singular factor with RuntimeError
+            raise np.linalg.LinAlgError("Singular Jacobian")
+    return np.linalg.solve(J_final, M_final)
+
+def jacobian_pattern(Y_bus, non_slack, idx_pq):
+    """
+    Structural nonzeros of the reduced Jacobian: every block has the
+    pattern of the Y-Bus (plus the diagonal), so it only changes with the
+    topology.
+
+    Returns:
+        sp.csc_matrix: Boolean pattern, shape of assemble_jacobian's output
+    """
+    P = (abs(Y_bus) > 0).astype(bool)
+    P = (P + sp.identity(Y_bus.shape[0], dtype=bool, format='csr')).tocsr()
+    return sp.bmat([
+        [P[non_slack][:, non_slack], P[non_slack][:, idx_pq]],
+        [P[idx_pq][:, non_slack],    P[idx_pq][:, idx_pq]],
+    ], format='csc')
+
+def symbolic_ordering(pattern):
+    """
+    Fill-reducing symmetric ordering of a Jacobian pattern (MMD on A^T + A,
+    as factorize_jacobian uses), computed once per topology.
+
+    SuperLU does not expose its symbolic analysis, so the ordering is taken
+    from one factorization of a diagonally dominant matrix with the same
+    pattern; factorize_jacobian(J, ordering) then skips the ordering step.
+
+    Returns:
+        np.ndarray: Permutation q, factorize J[q][:, q]
+    """
+    n = pattern.shape[0]
+    A = pattern.astype(float).tocsc()
+    A.setdiag(n + 1.0)
+    perm_c = spla.splu(A, permc_spec='MMD_AT_PLUS_A').perm_c
+    return np.argsort(perm_c)
+
+def factorize_jacobian(J_final, ordering=None, spd=False):
+    """
+    Factorizes the reduced Jacobian once so it can be reused for several solves.
+
+    Args:
+        J_final (array or sparse matrix): Reduced Jacobian
+        ordering (np.ndarray): Precomputed symbolic_ordering of a sparse
+            Jacobian's pattern (None: order during the factorization)
+        spd (bool): The matrix is symmetric positive definite (e.g. a WLS
+            gain matrix): diagonal pivots, no fill from row interchanges
+
+    Returns:
+        solve (callable): Maps a mismatch vector to the correction vector
+
+    Raises:
+        np.linalg.LinAlgError: If the Jacobian is singular
+    """
+    if sp is not None and sp.issparse(J_final):
+        try:
+            if ordering is None:
+                return spla.splu(J_final, permc_spec='MMD_AT_PLUS_A').solve
+            lu = spla.splu(J_final.tocsr()[ordering][:, ordering].tocsc(), permc_spec='NATURAL',
+                           diag_pivot_thresh=0.0 if spd else 1.0, options=dict(SymmetricMode=True))
+        except RuntimeError:
+            raise np.linalg.LinAlgError("Singular Jacobian")
+
+        def solve(rhs):
+            x = np.empty(np.shape(rhs), dtype=np.result_type(rhs, float))
+            x[ordering] = lu.solve(np.asarray(rhs)[ordering])
+            return x
+        return solve
+
+    if sla is not None:
+        with warnings.catch_warnings():
+            # A zero pivot is reported below as LinAlgError instead
+            warnings.simplefilter("ignore", sla.LinAlgWarning)
+            lu, piv = sla.lu_factor(J_final, check_finite=False)
+        if np.any(np.diag(lu) == 0):
+            raise np.linalg.LinAlgError("Singular Jacobian")
+        return lambda rhs: sla.lu_solve((lu, piv), rhs, check_finite=False)
+
+    # No scipy: keep the explicit inverse, still one O(n^3) step per factorization
+    J_inv = np.linalg.inv(J_final)
+    return lambda rhs: J_inv @ rhs
+
+def condition_estimate(J_final):
+    """
+    1-norm condition number of the reduced Jacobian. Exact for a dense
+    Jacobian; for a sparse one ||J|| * ||J^-1|| from onenormest, with J^-1
+    applied through one sparse LU.
+
+    Returns:
+        float: Condition number (np.inf if J is singular)
+    """
+    if J_final.shape[0] == 0:
+        return 1.0
+    if sp is None or not sp.issparse(J_final):
+        try:
+            return float(np.linalg.cond(J_final, 1))
+        except np.linalg.LinAlgError:
+            return np.inf
+    try:
+        lu = spla.splu(J_final.tocsc(), permc_spec='MMD_AT_PLUS_A')
+    except RuntimeError:
+        return np.inf
+    n = J_final.shape[0]
+    J_inv = spla.LinearOperator((n, n), matvec=lu.solve, rmatvec=lambda x: lu.solve(x, trans='T'),
+                                dtype=float)
+    return float(spla.onenormest(J_final) * spla.onenormest(J_inv))
 
 # CHANGED: Increased max_iter to 50 for large systems
-def run_load_flow(Y_bus, bus_data, system_freq, max_iter=50, tol=1e-5, time_step=0):
-    
-    num_buses = len(bus_data)
-    V = np.array([b['V'] for b in bus_data])
-    Theta = np.array([b['theta'] for b in bus_data])
-    P_spec = np.array([b['P_spec'] for b in bus_data])
-    Q_spec = np.array([b['Q_spec'] for b in bus_data])
-    types = np.array([b['type'] for b in bus_data]) 
+@instrumentation.traced("load_flow")
+def run_load_flow(Y_bus, bus_data, system_freq, max_iter=50, tol=1e-5, time_step=0,
+                  return_stats=False, callback=None):
+    """
+    Newton-Raphson load flow from the starting point in bus_data.
+
+    Args:
+        return_stats (bool): Also return an instrumentation.SolverStats
+            (iterations, mismatch history, time per phase, Jacobian size /
+            nnz and condition number)
+        callback (callable): Called as callback(stats, V, Theta) once the
+            mismatch of each iteration is known
+
+    Returns:
+        V, Theta, P_calc, Q_calc (np.ndarray), or four Nones if the
+        Jacobian is singular or the solve does not converge; followed by
+        the SolverStats when return_stats is set
+    """
+    stats = instrumentation.SolverStats("nr")
+    start = time.perf_counter()
+
+    _, types, V, Theta, P_spec, Q_spec = network.bus_arrays(bus_data)
 
     idx_slack = np.where(types == 1)[0]
     idx_pv    = np.where(types == 2)[0]
     idx_pq    = np.where(types == 3)[0]
     non_slack = np.concatenate((idx_pv, idx_pq))
     non_slack.sort()
-    
-    P_calc = np.zeros(num_buses)
-    Q_calc = np.zeros(num_buses)
+    n_ang = len(non_slack)
 
     converged = False # NEW: Track if we actually solved it
+    J_final = None
 
     for it in range(max_iter):
-        P_calc.fill(0.0)
-        Q_calc.fill(0.0)
-        
-        for i in range(num_buses):
-            for k in range(num_buses):
-                mag_Y = abs(Y_bus[i, k])
-                ang_Y = np.angle(Y_bus[i, k])
-                P_calc[i] += V[i] * V[k] * mag_Y * np.cos(Theta[i] - Theta[k] - ang_Y)
-                Q_calc[i] += V[i] * V[k] * mag_Y * np.sin(Theta[i] - Theta[k] - ang_Y)
+        t0 = time.perf_counter()
+        P_calc, Q_calc = calc_power_injections(Y_bus, V, Theta)
 
         dPa = P_spec - P_calc
         dQa = Q_spec - Q_calc
-        
-        mismatch = 0
-        for i in non_slack: mismatch = max(mismatch, abs(dPa[i]))
-        for i in idx_pq: mismatch = max(mismatch, abs(dQa[i]))
+        M_final = np.concatenate((dPa[non_slack], dQa[idx_pq]))
+
+        mismatch = np.max(np.abs(M_final)) if M_final.size else 0.0
+        stats.add_time('injections', time.perf_counter() - t0)
+        stats.mismatch_history.append(float(mismatch))
+        if callback is not None:
+            callback(stats, V, Theta)
             
         if mismatch < tol:
             converged = True # We found the answer!
             break 
 
         # Jacobian Construction
-        J1 = np.zeros((num_buses, num_buses))
-        J2 = np.zeros((num_buses, num_buses))
-        J3 = np.zeros((num_buses, num_buses))
-        J4 = np.zeros((num_buses, num_buses))
-        
-        for i in range(num_buses):
-            for k in range(num_buses):
-                mag_Y = abs(Y_bus[i, k])
-                ang_Y = np.angle(Y_bus[i, k])
-                if i != k:
-                    term_a = V[i] * V[k] * mag_Y * np.sin(Theta[i] - Theta[k] - ang_Y)
-                    term_b = V[i] * V[k] * mag_Y * np.cos(Theta[i] - Theta[k] - ang_Y)
-                    J1[i, k] = term_a      
-                    J2[i, k] = term_b / V[k]
-                    J3[i, k] = -term_b
-                    J4[i, k] = term_a / V[k] 
-                else:
-                    J1[i, i] = -Q_calc[i] - (V[i]**2 * Y_bus[i,i].imag)
-                    J2[i, i] = P_calc[i] / V[i] + (V[i] * Y_bus[i,i].real)
-                    J3[i, i] = P_calc[i] - (V[i]**2 * Y_bus[i,i].real)
-                    J4[i, i] = Q_calc[i] / V[i] - (V[i] * Y_bus[i,i].imag)
-
-        J1_red = J1[np.ix_(non_slack, non_slack)]
-        J2_red = J2[np.ix_(non_slack, idx_pq)]
-        J3_red = J3[np.ix_(idx_pq, non_slack)]
-        J4_red = J4[np.ix_(idx_pq, idx_pq)]
-        
-        top = np.hstack((J1_red, J2_red))
-        bot = np.hstack((J3_red, J4_red))
-        J_final = np.vstack((top, bot))
+        t0 = time.perf_counter()
+        J_final = assemble_jacobian(Y_bus, V, Theta, P_calc, Q_calc, non_slack, idx_pq)
+        t1 = time.perf_counter()
+        stats.add_time('jacobian', t1 - t0)
 
-        M_final = np.concatenate((dPa[non_slack], dQa[idx_pq]))
-        
         try:
-            correction = np.linalg.solve(J_final, M_final)
+            correction = solve_jacobian(J_final, M_final)
         except np.linalg.LinAlgError:
             # Jacobian is singular (Voltage Collapse)
-            return None, None, None, None
+            stats.failure = "singular_jacobian"
+            break
+        stats.add_time('solve', time.perf_counter() - t1)
 
-        n_ang = len(non_slack)
-        dTheta = correction[:n_ang]
-        dV = correction[n_ang:]
-        for idx, val in enumerate(non_slack): Theta[val] += dTheta[idx]
-        for idx, val in enumerate(idx_pq): V[val] += dV[idx]
+        Theta[non_slack] += correction[:n_ang]
+        V[idx_pq] += correction[n_ang:]
+        stats.iterations += 1
 
     # NEW: Safety check after the loop finishes
-    if not converged:
+    if not converged and stats.failure is None:
+        stats.failure = "max_iter"
         print(f"   [WARNING] NR Solver failed to converge after {max_iter} iterations (Mismatch: {mismatch:.5f})")
-        return None, None, None, None
 
-    return V, Theta, P_calc, Q_calc
\ No newline at end of file
+    stats.converged = converged
+    stats.wall_time = time.perf_counter() - start
+    result = (V, Theta, P_calc, Q_calc) if converged else (None, None, None, None)
+    if not return_stats:
+        return result
+
+    if J_final is not None:
+        stats.jacobian_shape = J_final.shape
+        stats.jacobian_nnz = int(J_final.nnz) if sp is not None and sp.issparse(J_final) else int(np.count_nonzero(J_final))
+        stats.condition = condition_estimate(J_final)
+    return result + (stats,)
\ No newline at end of file
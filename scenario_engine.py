@@ -0,0 +1,119 @@
+import copy
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import util
+
+import simulator
+import automatic_generation_control
+import ufls_controller
+import ufls_logger
+import load_fluctuator
+import load_profiles
+import network
+import topology_cache
+
+# Base case, training-data logger and topology cache of the current worker process, set once by _init_worker
+_BASE_CASE = None
+_LOGGER = None
+_TOPOLOGIES = None
+
+def run_single_scenario(bus_data, line_data, seed=None, load_profile=None, trip_id=None, duration=60,
+                        logger=None, topologies=None):
+    """
+    Runs one headless simulation on a private copy of the base case.
+
+    Args:
+        seed (int): Seed of the random load fluctuations
+        load_profile: Replaces the random fluctuator when given: a list of
+            per-second PQ load multipliers, a load_profiles.LoadProfile, or
+            the path of a saved LoadProfile (opened memory-mapped)
+        trip_id (int): PV bus to trip at simulator.TRIP_TIME, or None
+        logger (TrainingLogger): Receives the UFLS training rows, or None
+        topologies (TopologyCache): Shared by the scenarios of one base case,
+            so a trip topology is only built once
+
+    Returns:
+        dict: Result of simulator.Simulator.run (without bus / line states)
+    """
+    b_data = copy.deepcopy(bus_data)
+    l_data = copy.deepcopy(line_data)
+
+    if isinstance(load_profile, str):
+        fluctuator = load_profiles.LoadProfile.load(load_profile)
+    elif isinstance(load_profile, load_profiles.LoadProfile):
+        fluctuator = load_profile
+    elif load_profile is not None:
+        fluctuator = load_fluctuator.ProfileLoadFluctuator(load_profile)
+    else:
+        fluctuator = load_fluctuator.LoadFluctuator(interval=5, seed=seed)
+    ufls_sys = ufls_controller.UFLS(filename=None, logger=logger)
+    agc_sys = automatic_generation_control.AGC(K_p=2.0, K_i=0.02)
+
+    sim = simulator.Simulator(b_data, l_data, fluctuator, ufls_sys, agc_sys, trip_id,
+                              duration=duration, record_states=False, topology_cache=topologies)
+    return sim.run()
+
+def _init_worker(bus_data, line_data, trip_id, duration, log_path=None):
+    # Ship the base case once per worker instead of once per scenario
+    global _BASE_CASE, _LOGGER, _TOPOLOGIES
+    _BASE_CASE = (bus_data, line_data, trip_id, duration)
+    base = bus_data if isinstance(bus_data, network.Network) else network.Network.from_dicts(bus_data, line_data)
+    _TOPOLOGIES = topology_cache.TopologyCache(base)
+    if log_path is not None:
+        # One shard file per worker; atexit does not run in pool workers,
+        # so flush through a multiprocessing finalizer instead
+        _LOGGER = ufls_logger.TrainingLogger(log_path, shard=True)
+        util.Finalize(_LOGGER, _LOGGER.close, exitpriority=10)
+
+def _run_task(task):
+    seed, load_profile = task
+    bus_data, line_data, trip_id, duration = _BASE_CASE
+    return run_single_scenario(bus_data, line_data, seed, load_profile, trip_id, duration, _LOGGER, _TOPOLOGIES)
+
+def _profile_task(profile):
+    if isinstance(profile, load_profiles.LoadProfile):
+        return profile.path if profile.path is not None else profile
+    return profile if isinstance(profile, str) else list(profile)
+
+def run_scenarios(bus_data, line_data, seeds=None, load_profiles=None, trip_id=None,
+                  duration=60, max_workers=None, log_path=None):
+    """
+    Runs many simulations of the same base case across worker processes.
+
+    Pass either N seeds (random fluctuations) or N load profiles. Each
+    scenario only depends on its own seed/profile, so results are
+    reproducible regardless of the number of workers. File-backed
+    LoadProfiles (and profile paths) are sent to the workers by path and
+    memory-mapped there, so the arrays are shared instead of copied.
+
+    With log_path, every worker writes the UFLS training rows to its own
+    shard file, and the shards are merged into log_path at the end.
+
+    Call it from under `if __name__ == "__main__":` (spawn start method).
+
+    Returns:
+        dict: 'frequency', 'rocof', 'total_load' (float) and 'ufls_stages'
+        (int) arrays of shape (N, duration), NaN after a collapse, plus a
+        'collapsed' bool array of shape (N,)
+    """
+    if load_profiles is not None:
+        tasks = [(None, _profile_task(p)) for p in load_profiles]
+    else:
+        tasks = [(s, None) for s in seeds]
+
+    workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(tasks) // (4 * workers))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(bus_data, line_data, trip_id, duration, log_path)) as pool:
+        trajectories = list(pool.map(_run_task, tasks, chunksize=chunksize))
+
+    if log_path is not None:
+        ufls_logger.merge_shards(log_path)
+
+    results = {}
+    for key in ('frequency', 'rocof', 'total_load', 'ufls_stages'):
+        results[key] = np.stack([tr[key] for tr in trajectories])
+    results['collapsed'] = np.array([tr['collapsed'] for tr in trajectories])
+    return results
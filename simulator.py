@@ -0,0 +1,456 @@
+import numpy as np
+import ybus_generator
+import network
+import load_flow_session
+import line_parameters
+import adaptive_stepper
+import automatic_generation_control
+import instrumentation
+
+# --- SIMULATION PARAMETERS ---
+SYSTEM_FREQ = 50.0
+H_CONST = 5.0
+TIME_STEP = 1.0
+TRIP_TIME = 5
+SPARSE_THRESHOLD = 200   # Buses above which the sparse Y-Bus / NR path is used
+LOAD_FLOW_METHOD = "nr"  # Default load flow: "nr" = full Newton-Raphson, "fdlf" = fast-decoupled (XB)
+
+# --- PHYSICS CONSTANTS ---
+DAMPING = 0.02
+TURBINE_LAG = 0.3
+AGC_LIMIT = 0.5
+TURBINE_TIME_CONST = TIME_STEP / TURBINE_LAG  # Continuous-time equivalent of the per-step lag
+
+# --- ADAPTIVE STEPPING ---
+MIN_STEP = 0.01      # Step (s) right after an event
+LF_THRESHOLD = 1e-4  # Injection change (pu) below which the load flow is not re-run
+
+class SimulationObserver:
+    """
+    Base class of Simulator observers (console rendering, logging, ...).
+    Every hook is a no-op; override the ones you need.
+    """
+    def on_start(self, sim):
+        pass
+
+    def on_step_begin(self, sim, t):
+        pass
+
+    def on_event(self, sim, t, kind, message):
+        """kind: 'trip', 'topology', 'fluctuation', 'ufls', 'ufls_done' or 'collapse'"""
+        pass
+
+    def on_step(self, sim, step):
+        pass
+
+    def on_finish(self, sim, result):
+        pass
+
+class Simulator:
+    def __init__(self, b_data, l_data, fluctuator, ufls_sys, agc_sys, target_trip_id=None,
+                 duration=60, record_states=True, observers=None, adaptive=False,
+                 lf_threshold=LF_THRESHOLD, topology_cache=None, method=LOAD_FLOW_METHOD):
+        """
+        Time-stepped frequency / load flow simulation without any console I/O.
+
+        Args:
+            b_data (list or Network): Buses; bus dicts are converted to a
+                Network (the caller's dicts are left untouched)
+            l_data (list): Line dicts (ignored when b_data is a Network)
+            fluctuator: Object with fluctuate_load(t, bus_data), e.g. LoadFluctuator
+            ufls_sys (UFLS or UFLSRelayBank): Under-frequency load shedding relays
+            agc_sys (AGC or AGCBank): Secondary frequency controller. An AGC
+                acts on the slack turbine; an AGCBank (with unit_bus_ids) also
+                redispatches its PV units, using the tie-line exports of
+                each Network area.
+            target_trip_id (int): PV bus to trip at TRIP_TIME, or None
+            duration (int): Number of TIME_STEP steps
+            record_states (bool): Keep per-step V, theta, P, Q and line states
+                in the result (False: frequency-level trajectories only)
+            observers (list): SimulationObserver instances
+            adaptive (bool): Integrate frequency, turbine and AGC states with an
+                embedded RK pair (small steps after events, up to TIME_STEP
+                otherwise) and check UFLS between output steps. The load flow
+                is then only re-run when an injection moved more than
+                lf_threshold (pu) since the last solve or the topology changed.
+                False: the original fixed-step update with one load flow per step.
+            lf_threshold (float): See adaptive
+            topology_cache (TopologyCache): Reuses the Y-bus, index maps,
+                Jacobian ordering and B' / B'' factors of topologies seen
+                before (e.g. the same trip in many scenarios), keyed by the
+                outage set relative to the cache's base case
+            method (str): Load flow of every step, "nr" or "fdlf" (see
+                load_flow_session.LoadFlowSession)
+        """
+        # Columnar network model: array ops instead of per-bus dict loops
+        self.net = b_data if isinstance(b_data, network.Network) else network.Network.from_dicts(b_data, l_data)
+        self.fluctuator = fluctuator
+        self.ufls_sys = ufls_sys
+        self.agc_sys = agc_sys
+        self.target_trip_id = target_trip_id
+        self.duration = duration
+        self.record_states = record_states
+        self.observers = list(observers or [])
+        self.topology_cache = topology_cache
+        self.method = method
+        self._trip_requests = []  # Buses to trip at the next step, see request_trip
+
+        self.use_sparse = len(self.net) > SPARSE_THRESHOLD
+        self.bus_ids = self.net.ids.copy()  # Result columns: buses of the initial network
+        self._bus_col = {bid: i for i, bid in enumerate(self.bus_ids.tolist())}
+        self.t = 0
+        self.system_freq = SYSTEM_FREQ
+        self.rocof = 0.0
+        self.turbine_power = None
+        self.collapsed = False
+        self.load_flows = 0
+
+        self.adaptive = adaptive
+        self.lf_threshold = lf_threshold
+        self.stepper = adaptive_stepper.AdaptiveStepper(self._rhs, h_min=MIN_STEP, h_max=TIME_STEP)
+        self._lf = None  # Last converged (V, Theta, P_calc, Q_calc)
+        self._fine_trace = []  # (time, frequency) of every accepted RK step
+
+        self._bank = agc_sys if isinstance(agc_sys, automatic_generation_control.AGCBank) else None
+        self._agc_dirty = False   # AGCBank moved PV setpoints since the last sync
+        self._slack_share = 0.0   # AGCBank output assigned to the slack turbine
+        if self._bank is not None:
+            self._unit_offset = np.zeros(len(self._bank.unit_bus_ids))  # Applied PV redispatch
+
+    def request_trip(self, bus_id):
+        """Trips a bus at the start of the next step (external events, e.g. telemetry)."""
+        self._trip_requests.append(bus_id)
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def _emit(self, kind, message):
+        for obs in self.observers:
+            obs.on_event(self, self.t, kind, message)
+
+    def _set_topology(self):
+        """Y-bus, load flow session and line arrays of the current network."""
+        if self.topology_cache is not None:
+            self._cached_topology()
+        else:
+            self.Y_bus = ybus_generator.build_y_bus(self.net, sparse=self.use_sparse)
+            self.session = load_flow_session.LoadFlowSession(self.Y_bus, self.net, method=self.method)
+            self.line_idx, self.line_arrays = self.net.line_arrays()
+            self.slack_idx = int(np.argmax(self.net.types == 1))
+        self.bus_pos = np.array([self._bus_col[bid] for bid in self.net.ids.tolist()], dtype=int)
+        if self._bank is not None:
+            # Units whose bus was tripped leave regulation
+            self._unit_idx = np.array([self.net.id_map.get(bid, -1) for bid in self._bank.unit_bus_ids.tolist()], dtype=int)
+            self._bank.set_online(self._unit_idx >= 0)
+
+    def _cached_topology(self):
+        cache = self.topology_cache
+        entry = cache.get(self.net)
+        fdlf = None
+        if self.method == "fdlf":
+            try:
+                fdlf = cache.fdlf(entry)
+            except np.linalg.LinAlgError:
+                pass  # The session reports the singular B' / B'' and uses NR
+        self.Y_bus = entry.Y_bus
+        self.session = load_flow_session.LoadFlowSession(self.Y_bus, self.net, method=self.method,
+                                                         ordering=entry.ordering, fdlf=fdlf)
+        self.line_idx, self.line_arrays = entry.line_idx, entry.line_arrays
+        self.slack_idx = entry.slack_idx
+
+    def _allocate_result(self):
+        T = self.duration
+        result = {
+            'time': np.arange(1, T + 1) * TIME_STEP,
+            'frequency': np.full(T, np.nan),
+            'rocof': np.full(T, np.nan),
+            'total_load': np.full(T, np.nan),
+            'ufls_stages': np.zeros(T, dtype=int),
+            'load_flows': np.zeros(T, dtype=int),  # Cumulative load flow solves
+            'collapsed': False,
+        }
+        if self.record_states:
+            n, m = len(self.bus_ids), len(self.net.line_columns['from'])
+            result['bus_ids'] = self.bus_ids
+            result['line_from'] = self.net.line_columns['from'].astype(int)
+            result['line_to'] = self.net.line_columns['to'].astype(int)
+            for key in ('V', 'theta', 'P', 'Q'):
+                result[key] = np.full((T, n), np.nan)
+            for key in ('line_current', 'line_temp', 'line_sag', 'line_temp_max'):
+                result[key] = np.full((T, m), np.nan)
+        return result
+
+    def initialize(self):
+        """Builds the topology and solves the initial steady state."""
+        for obs in self.observers:
+            obs.on_start(self)
+        self._set_topology()
+        self.result = self._allocate_result()
+        if not self._solve_network(force=True):
+            self._emit('collapse', "Simulation Crash (Voltage Collapse).")
+            self.collapsed = True
+            return
+        self.turbine_power = self._pe
+
+    def _solve_network(self, force):
+        """
+        Runs the load flow and updates the slack demand seen by the dynamics.
+
+        Unless forced, a solve is skipped while no P/Q injection moved more
+        than lf_threshold since the last one; the slack then picks up the
+        change with the losses of the last solution.
+
+        Returns:
+            bool: False if the load flow failed (voltage collapse)
+        """
+        session = self.session
+        self._load = self.net.total_load()
+        self._p_limit = self.net.P_max[self.slack_idx]
+        if not force and self._lf is not None:
+            dP = session.P_spec - self._spec_solved[0]
+            dQ = session.Q_spec - self._spec_solved[1]
+            if max(np.max(np.abs(dP)), np.max(np.abs(dQ))) <= self.lf_threshold:
+                self._pe = self._lf[2][self.slack_idx] - (dP.sum() - dP[self.slack_idx])
+                return True
+
+        V_sol, Th_sol, P_calc, Q_calc = session.solve()
+        self.load_flows += 1
+        if V_sol is None:
+            return False
+        self._lf = (V_sol, Th_sol, P_calc, Q_calc)
+        self._spec_solved = (session.P_spec.copy(), session.Q_spec.copy())
+        self._pe = P_calc[self.slack_idx]
+        return True
+
+    def _bank_regulation(self):
+        """
+        Runs the AGCBank on the last load flow. PV units get their share as a
+        setpoint change (within 0..P_max) for the next load flow.
+
+        Returns:
+            float: Share of the slack turbine (pu)
+        """
+        bank, net, idx = self._bank, self.net, self._unit_idx
+        V_sol, Th_sol = self._lf[:2]
+        units = bank.calculate_regulation(self.system_freq, net.area_export(V_sol, Th_sol, bank.areas), TIME_STEP)
+
+        pv = (idx >= 0) & (idx != self.slack_idx)
+        bus = idx[pv]
+        pg = np.clip(net.Pg[bus] + units[pv] - self._unit_offset[pv], 0.0, net.P_max[bus])
+        self._unit_offset[pv] += pg - net.Pg[bus]
+        if np.any(pg != net.Pg[bus]):
+            net.Pg[bus] = pg
+            net.P_spec[bus] = net.Pg[bus] - net.Pl[bus]
+            self._agc_dirty = True
+        return float(units[idx == self.slack_idx].sum())
+
+    def _controls(self, freq, integral):
+        """AGC output and turbine setpoint for a frequency / AGC integral state."""
+        if self._bank is not None:
+            p_agc = self._slack_share  # Held between AGCBank updates
+        else:
+            error = self.agc_sys.target - freq
+            p_agc = min(max(self.agc_sys.Kp * error + self.agc_sys.Ki * integral, -AGC_LIMIT), AGC_LIMIT)
+        return p_agc, min(self._pe + p_agc, self._p_limit)
+
+    def _rhs(self, t, y):
+        """d/dt of [frequency, turbine power, AGC integral] with the network held fixed."""
+        freq, p_mech, integral = y
+        _, target = self._controls(freq, integral)
+        net_imbalance = p_mech - self._pe - DAMPING * (freq - 50.0)
+        dfdt = 0.0
+        if abs(net_imbalance) > 0.000001 and self._load > 0:
+            dfdt = net_imbalance * 50.0 / (self._load * 2 * H_CONST)
+        dzdt = 0.0 if self._bank is not None else self.agc_sys.target - freq
+        return np.array([dfdt, (target - p_mech) / TURBINE_TIME_CONST, dzdt])
+
+    def _shed(self, t):
+        """Runs the UFLS relay at time t and reports its alerts; True if load was shed."""
+        shed_occurred, ufls_alerts = self.ufls_sys.check_and_shed(t, self.system_freq, self.rocof, self.net)
+        if shed_occurred:
+            for alert in ufls_alerts:
+                self._emit('ufls', alert)
+            self._emit('ufls_done', "   -> Load reduced. NR Solver target updated.")
+        return shed_occurred
+
+    def _integrate_adaptive(self, t):
+        """
+        Integrates the dynamics over [t, t + TIME_STEP] with error-controlled
+        steps, running the UFLS relay after every accepted step.
+
+        Returns:
+            bool: False if a load flow failed on the way
+        """
+        tau, t_end = float(t), float(t) + TIME_STEP
+        y = self._state()
+        while t_end - tau > 1e-9:
+            tau, y = self.stepper.step(tau, y, t_end)
+            self.system_freq, self.turbine_power = y[0], y[1]
+            if self._bank is None:
+                self.agc_sys.integral_error = y[2]
+            self.rocof = self._rhs(tau, y)[0]
+            self._fine_trace.append((tau, self.system_freq))
+
+            if t_end - tau > 1e-9 and self._shed(tau):
+                self.session.sync_injections(self.net)
+                if not self._solve_network(force=False):
+                    return False
+                self.stepper.reset()
+                y = self._state()
+        return True
+
+    def _state(self):
+        """[frequency, turbine power, AGC integral] (the AGCBank integrates its own state)."""
+        integral = 0.0 if self._bank is not None else self.agc_sys.integral_error
+        return np.array([self.system_freq, self.turbine_power, integral])
+
+    @instrumentation.traced("simulation_step")
+    def step(self):
+        """
+        Advances the simulation by one TIME_STEP.
+
+        Returns:
+            dict: Per-step state (t, V, theta, P, Q, line states, frequency,
+            rocof, control signals), or None after a voltage collapse
+        """
+        self.t += 1
+        t = self.t
+        net = self.net
+        for obs in self.observers:
+            obs.on_step_begin(self, t)
+
+        # --- EVENT LOGIC ---
+        trips, self._trip_requests = self._trip_requests, []
+        if t == TRIP_TIME and self.target_trip_id is not None:
+            trips.insert(0, self.target_trip_id)
+            self.target_trip_id = None
+        topology_changed = bool(trips)
+        if topology_changed:
+            for bid in trips:
+                self._emit('trip', f"!!! EVENT: BUS {bid} TRIPPED !!!")
+                net = net.remove_bus(bid)
+            self.net = net
+            # New topology: fresh session, warm-started from the last solution in net
+            self._set_topology()
+            self._emit('topology', "-> Grid Topology Updated.")
+
+        # --- DYNAMIC LOAD FLUCTUATION ---
+        fluctuated, fluc_alert = self.fluctuator.fluctuate_load(t, net)
+        if fluctuated:
+            self._emit('fluctuation', fluc_alert)
+
+        # --- UFLS LOGIC ---
+        shed_occurred = self._shed(t)
+
+        # --- 1. RUN LOAD FLOW ---
+        if fluctuated or shed_occurred or self._agc_dirty:
+            self.session.sync_injections(net)
+            self._agc_dirty = False
+        if topology_changed or fluctuated or shed_occurred:
+            self.stepper.reset()  # Resolve the transient after the event with small steps
+        if not self._solve_network(force=topology_changed or not self.adaptive):
+            self._emit('collapse', "Simulation Crash (Voltage Collapse).")
+            self.collapsed = True
+            return None
+
+        # --- 2. DYNAMICS & CONTROL ---
+        if self._bank is not None:
+            # One vectorized update of all area controllers per step
+            self._slack_share = self._bank_regulation()
+
+        if self.adaptive:
+            if not self._integrate_adaptive(t):
+                self._emit('collapse', "Simulation Crash (Voltage Collapse).")
+                self.collapsed = True
+                return None
+            p_agc, target_mech_power = self._controls(*self._state()[[0, 2]])
+            total_load_est = self._load
+        else:
+            slack_p_demand = self._pe
+            slack_p_limit = net.P_max[self.slack_idx]
+
+            if self._bank is not None:
+                p_agc = self._slack_share  # Limits are applied inside the bank
+            else:
+                raw_agc = self.agc_sys.calculate_regulation(self.system_freq, TIME_STEP)
+                p_agc = min(max(raw_agc, -AGC_LIMIT), AGC_LIMIT)
+
+            target_mech_power = slack_p_demand + p_agc
+            if target_mech_power > slack_p_limit: target_mech_power = slack_p_limit
+
+            diff = target_mech_power - self.turbine_power
+            self.turbine_power += diff * TURBINE_LAG
+
+            damping_loss = DAMPING * (self.system_freq - 50.0)
+            net_imbalance = self.turbine_power - slack_p_demand - damping_loss
+
+            self.rocof = 0.0
+            total_load_est = net.total_load()
+            if abs(net_imbalance) > 0.000001:
+                if total_load_est > 0:
+                    numerator = net_imbalance * 50.0
+                    denominator = total_load_est * 2 * H_CONST
+                    self.rocof = numerator / denominator
+                    self.system_freq += self.rocof * TIME_STEP
+
+        # Bus states of the last load flow (unchanged while solves are skipped)
+        V_sol, Th_sol, P_calc, Q_calc = self._lf
+        step = {
+            't': t, 'V': V_sol, 'theta': Th_sol, 'P': P_calc, 'Q': Q_calc,
+            'frequency': self.system_freq, 'rocof': self.rocof, 'total_load': total_load_est,
+            'turbine_power': self.turbine_power, 'target_mech_power': target_mech_power, 'p_agc': p_agc,
+        }
+        if self._bank is not None:
+            step['ace'] = self._bank.ace.copy()
+            step['unit_agc'] = self._bank.unit_output.copy()
+        if self.record_states or self.observers:
+            I_a, T_c, S_g, T_max = line_parameters.compute_all_line_states(self.line_arrays, V_sol, Th_sol, self.Y_bus)
+            step.update({'line_current': I_a, 'line_temp': T_c, 'line_sag': S_g, 'line_temp_max': T_max})
+
+        self._record(step)
+        for obs in self.observers:
+            obs.on_step(self, step)
+
+        net.V[:] = V_sol
+        net.theta[:] = Th_sol
+        return step
+
+    def _record(self, step):
+        k = step['t'] - 1
+        result = self.result
+        result['frequency'][k] = step['frequency']
+        result['rocof'][k] = step['rocof']
+        result['total_load'][k] = step['total_load']
+        result['ufls_stages'][k] = self.ufls_sys.tripped_stages
+        result['load_flows'][k] = self.load_flows
+        if self.record_states:
+            for key in ('V', 'theta', 'P', 'Q'):
+                result[key][k, self.bus_pos] = step[key]
+            for key in ('line_current', 'line_temp', 'line_sag', 'line_temp_max'):
+                result[key][k, self.line_idx] = step[key]
+
+    def run(self):
+        """
+        Runs the whole simulation.
+
+        Returns:
+            dict: 'time', 'frequency', 'rocof', 'total_load' and 'ufls_stages'
+            arrays of length duration (NaN after a collapse) and a 'collapsed'
+            flag. With record_states also 'V', 'theta', 'P', 'Q' (duration x
+            buses of the initial network, NaN for tripped buses), 'line_current',
+            'line_temp', 'line_sag', 'line_temp_max' (duration x lines) and the
+            'bus_ids', 'line_from', 'line_to' column labels. 'load_flows' counts
+            the solves so far; adaptive runs add the 'fine_time' /
+            'fine_frequency' trace of every RK step.
+        """
+        self.initialize()
+        while self.t < self.duration and not self.collapsed:
+            if self.step() is None:
+                break
+        self.result['collapsed'] = self.collapsed
+        if self.adaptive:
+            trace = np.array(self._fine_trace).reshape(-1, 2)
+            self.result['fine_time'], self.result['fine_frequency'] = trace[:, 0], trace[:, 1]
+        for obs in self.observers:
+            obs.on_finish(self, self.result)
+        return self.result
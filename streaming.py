@@ -0,0 +1,431 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+import network
+
+TICK = 1.0           # Wall-clock seconds per simulation step
+MAX_PENDING = 10000  # Queued messages before ingestion stops reading (back-pressure)
+POLL = 0.05          # Seconds between reads of a tailed file at its end
+
+# --- Messages ---
+# One JSON object per line:
+#   {"type": "load", "bus": 5, "Pl": 0.9, "Ql": 0.3}   absolute load (either or both keys)
+#   {"type": "load", "bus": 5, "scale": 1.02}           relative change (no "bus": all PQ buses)
+#   {"type": "trip", "bus": 3}                          bus outage
+#   {"type": "end"}                                     end of stream
+# An optional "t" (seconds) is only used by the replayer.
+
+def parse_message(line):
+    """Decodes one line; None for blank or malformed lines and unknown types."""
+    if isinstance(line, bytes):
+        line = line.decode('utf-8', 'replace')
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        msg = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(msg, dict) or msg.get('type') not in ("load", "trip", "end"):
+        return None
+    return msg
+
+class UpdateCoalescer:
+    def __init__(self):
+        """
+        Folds a burst of load / trip messages into one update per bus: an
+        absolute value replaces what came before, scales multiply on top.
+        """
+        self.clear()
+
+    def clear(self):
+        self.loads = {}        # bus -> [Pl or None, Ql or None, factor]
+        self.factor = 1.0      # Scale of all PQ buses, applied after the per-bus updates
+        self.trips = []
+        self.messages = 0
+
+    def add(self, msg):
+        self.messages += 1
+        if msg['type'] == "trip":
+            self.trips.append(int(msg['bus']))
+            return
+        if 'bus' not in msg:
+            self.factor *= float(msg.get('scale', 1.0))
+            return
+        entry = self.loads.setdefault(int(msg['bus']), [None, None, 1.0])
+        if 'Pl' in msg or 'Ql' in msg:
+            entry[2] = 1.0
+            if 'Pl' in msg: entry[0] = float(msg['Pl'])
+            if 'Ql' in msg: entry[1] = float(msg['Ql'])
+        entry[2] *= float(msg.get('scale', 1.0))
+
+    def __bool__(self):
+        return bool(self.loads or self.trips or self.factor != 1.0)
+
+class StreamFluctuator:
+    def __init__(self):
+        """
+        Simulator fluctuator fed by the stream: each step applies the load
+        updates coalesced for that tick (set by StreamingSimulator).
+        """
+        self.pending = None  # UpdateCoalescer of the current tick
+
+    def fluctuate_load(self, t, bus_data):
+        updates, self.pending = self.pending, None
+        if updates is None or not (updates.loads or updates.factor != 1.0):
+            return False, ""
+
+        net = bus_data if isinstance(bus_data, network.Network) else None
+        load_before = net.total_load() if net is not None else sum(b['Pl'] for b in bus_data)
+        id_map = net.id_map if net is not None else {b['id']: i for i, b in enumerate(bus_data)}
+        for bid, (Pl, Ql, factor) in updates.loads.items():
+            i = id_map.get(bid)
+            if i is None:
+                continue  # Tripped or unknown bus
+            b = bus_data[i]
+            b['Pl'] = (b['Pl'] if Pl is None else Pl) * factor
+            b['Ql'] = (b['Ql'] if Ql is None else Ql) * factor
+            b['P_spec'] = b['Pg'] - b['Pl']
+            b['Q_spec'] = b['Qg'] - b['Ql']
+        if updates.factor != 1.0:
+            if net is not None:
+                net.scale_loads(updates.factor)
+            else:
+                for b in bus_data:
+                    if b['type'] == 3:
+                        b['Pl'] *= updates.factor
+                        b['Ql'] *= updates.factor
+                        b['P_spec'] = b['Pg'] - b['Pl']
+                        b['Q_spec'] = b['Qg'] - b['Ql']
+
+        load_after = net.total_load() if net is not None else sum(b['Pl'] for b in bus_data)
+        change = (load_after / load_before - 1.0) * 100 if load_before > 0 else 0.0
+        alert = f"   [LOAD TELEMETRY] {updates.messages} updates, demand changed by {change:.2f}%!"
+        return True, alert
+
+class StreamingSimulator:
+    def __init__(self, sim, tick=TICK, max_pending=MAX_PENDING, output=None, executor=None):
+        """
+        Drives a Simulator from a stream of load / event messages.
+
+        Ingestion and stepping run as separate asyncio tasks. Ingestion
+        puts decoded messages on a bounded queue; every tick the stepping
+        task drains the queue, coalesces the burst into one update per bus
+        (UpdateCoalescer), and runs Simulator.step in an executor thread,
+        so reading never stalls on a load flow. When the solver falls
+        behind, ticks run back to back and the queue fills; once it holds
+        max_pending messages ingestion stops reading, which pushes back on
+        the producer (TCP flow control or an unread file).
+
+        Every step is published as one JSON line (frequency, RoCoF, load,
+        UFLS stages and the tick metrics) on output.
+
+        Args:
+            sim (Simulator): Built with a StreamFluctuator as fluctuator;
+                its duration bounds the number of ticks
+            tick (float): Wall-clock seconds per step (0: as fast as possible)
+            max_pending (int): Queue bound for back-pressure
+            output: StreamWriter, file object or path for the JSON lines (None: no output)
+            executor (Executor): Runs the steps (None: one worker thread)
+        """
+        if not isinstance(sim.fluctuator, StreamFluctuator):
+            raise ValueError("StreamingSimulator needs a Simulator with a StreamFluctuator")
+        self.sim = sim
+        self.tick = tick
+        self.max_pending = max_pending
+        self.output = output
+        self.executor = executor
+        self.metrics = []  # Per-tick dicts, see _metrics
+        self.received = 0
+        self.malformed = 0
+        self.ingest_stalls = 0  # put() calls that had to wait for the queue
+        self._queue = None
+        self._done = False
+
+    # --- Ingestion ---
+    async def ingest(self, source):
+        """
+        Reads lines from source (async iterable of str / bytes, e.g. a
+        StreamReader or tail_file) until it ends or sends an "end" message.
+        """
+        try:
+            async for line in source:
+                msg = parse_message(line)
+                if msg is None:
+                    self.malformed += bool(line.strip())
+                    continue
+                if msg['type'] == "end":
+                    break
+                self.received += 1
+                if self._queue.full():
+                    self.ingest_stalls += 1
+                await self._queue.put((time.perf_counter(), msg))
+        finally:
+            self._done = True
+
+    def _drain(self):
+        """All queued messages as one UpdateCoalescer, plus the oldest receive time."""
+        updates = UpdateCoalescer()
+        oldest = None
+        while True:
+            try:
+                received, msg = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return updates, oldest
+            oldest = received if oldest is None else oldest
+            updates.add(msg)
+
+    # --- Output ---
+    async def _publish(self, record):
+        if self.output is None:
+            return
+        line = json.dumps(record) + "\n"
+        if hasattr(self.output, 'drain'):
+            self.output.write(line.encode())
+            await self.output.drain()  # Slow consumers push back on the stepping task too
+        else:
+            self.output.write(line)
+            self.output.flush()
+
+    def _metrics(self, t, updates, oldest, tick_start, solve_start, solve_end, deadline):
+        return {
+            't': t,
+            'messages': updates.messages,
+            'buses_updated': len(updates.loads),
+            'queue_depth': self._queue.qsize(),
+            'solve_ms': (solve_end - solve_start) * 1e3,
+            # Receive of the oldest coalesced message -> result published
+            'latency_ms': (time.perf_counter() - oldest) * 1e3 if oldest is not None else None,
+            'tick_ms': (solve_end - tick_start) * 1e3,
+            'behind': solve_end > deadline,
+        }
+
+    # --- Stepping ---
+    async def run(self, source):
+        """
+        Runs until the source ends (and its last updates are applied), the
+        Simulator reaches its duration or collapses.
+
+        Returns:
+            dict: The Simulator's result plus 'stream_metrics' (list of per-tick dicts)
+        """
+        loop = asyncio.get_running_loop()
+        own_executor = self.executor is None
+        executor = ThreadPoolExecutor(max_workers=1) if own_executor else self.executor
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._done = False
+        sim = self.sim
+        own_output = isinstance(self.output, str)
+        if own_output:
+            self.output = open(self.output, 'w')
+
+        ingest_task = asyncio.create_task(self.ingest(source))
+        try:
+            await loop.run_in_executor(executor, sim.initialize)
+            deadline = time.perf_counter() + self.tick
+            while not sim.collapsed and sim.t < sim.duration:
+                if self._done and self._queue.empty():
+                    break
+                tick_start = time.perf_counter()
+                updates, oldest = self._drain()
+                sim.fluctuator.pending = updates
+                for bid in updates.trips:
+                    sim.request_trip(bid)
+
+                solve_start = time.perf_counter()
+                state = await loop.run_in_executor(executor, sim.step)
+                solve_end = time.perf_counter()
+                metrics = self._metrics(sim.t, updates, oldest, tick_start, solve_start, solve_end, deadline)
+                self.metrics.append(metrics)
+                record = {'t': sim.t, 'collapsed': state is None, 'metrics': metrics}
+                if state is not None:
+                    record.update({'frequency': float(state['frequency']), 'rocof': float(state['rocof']),
+                                   'total_load': float(state['total_load']),
+                                   'ufls_stages': int(sim.ufls_sys.tripped_stages)})
+                await self._publish(record)
+                if state is None:
+                    break
+
+                # Sleep to the next tick; when behind, start the next one right
+                # away (no burst of catch-up steps) and let ingestion run first
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    deadline += self.tick
+                else:
+                    await asyncio.sleep(0)
+                    deadline = time.perf_counter() + self.tick
+        finally:
+            ingest_task.cancel()
+            await asyncio.gather(ingest_task, return_exceptions=True)
+            if own_executor:
+                executor.shutdown(wait=True)
+            if own_output:
+                self.output.close()
+
+        result = sim.result
+        result['collapsed'] = sim.collapsed
+        result['stream_metrics'] = self.metrics
+        for obs in sim.observers:
+            obs.on_finish(sim, result)
+        return result
+
+    def summary(self):
+        """Latency / throughput figures over all ticks."""
+        if not self.metrics:
+            return {'ticks': 0, 'received': self.received}
+        latency = np.array([m['latency_ms'] for m in self.metrics if m['latency_ms'] is not None])
+        solve = np.array([m['solve_ms'] for m in self.metrics])
+        return {
+            'ticks': len(self.metrics), 'received': self.received, 'malformed': self.malformed,
+            'ingest_stalls': self.ingest_stalls,
+            'behind': int(sum(m['behind'] for m in self.metrics)),
+            'solve_ms_mean': float(solve.mean()), 'solve_ms_max': float(solve.max()),
+            'latency_ms_p50': float(np.percentile(latency, 50)) if latency.size else None,
+            'latency_ms_p99': float(np.percentile(latency, 99)) if latency.size else None,
+        }
+
+# --- Sources ---
+async def tail_file(path, poll=POLL, from_start=True):
+    """
+    Yields the lines appended to a file, like tail -f; waits for the file
+    to appear. Ends only through an "end" message (or cancellation).
+    """
+    while not os.path.exists(path):
+        await asyncio.sleep(poll)
+    with open(path) as f:
+        if not from_start:
+            f.seek(0, os.SEEK_END)
+        partial = ""
+        while True:
+            chunk = f.readline()
+            if not chunk:
+                await asyncio.sleep(poll)
+                continue
+            partial += chunk
+            if partial.endswith("\n"):
+                yield partial
+                partial = ""
+
+async def serve_tcp(streamer, host="127.0.0.1", port=9000):
+    """
+    Listens on host:port and runs the StreamingSimulator on the first
+    connection; results go back on the same connection unless the
+    streamer has its own output.
+
+    Returns:
+        dict: StreamingSimulator.run result
+    """
+    connected = asyncio.get_running_loop().create_future()
+
+    async def on_connect(reader, writer):
+        if connected.done():
+            writer.close()  # One telemetry source at a time
+            return
+        connected.set_result((reader, writer))
+
+    server = await asyncio.start_server(on_connect, host, port)
+    async with server:
+        reader, writer = await connected
+        if streamer.output is None:
+            streamer.output = writer
+        try:
+            return await streamer.run(reader)
+        finally:
+            writer.close()
+
+def run_source(streamer, spec):
+    """
+    Runs a StreamingSimulator on a source given as "tcp:HOST:PORT" (listen
+    for one connection) or "file:PATH" / a plain path (tail the file).
+
+    Returns:
+        dict: StreamingSimulator.run result
+    """
+    if spec.startswith("tcp:"):
+        host, _, port = spec[4:].rpartition(":")
+        return asyncio.run(serve_tcp(streamer, host or "127.0.0.1", int(port)))
+    path = spec[5:] if spec.startswith("file:") else spec
+    return asyncio.run(streamer.run(tail_file(path)))
+
+# --- Replayer ---
+def load_recording(path):
+    """Messages of a JSON-lines recording, in file order."""
+    with open(path) as f:
+        return [msg for msg in map(parse_message, f) if msg is not None]
+
+async def _collect(reader, received):
+    async for line in reader:
+        if received is not None:
+            received.append(json.loads(line))
+
+async def replay(messages, host=None, port=None, path=None, speed=1.0, end=True, received=None):
+    """
+    Sends recorded messages at their "t" timestamps (divided by speed; no
+    timestamps or speed=0: as fast as the receiver reads) to a TCP listener
+    or appends them to a file for tail_file.
+
+    Args:
+        received (list): Collects the records published back on the TCP
+            connection (they are read, and dropped without it, so the
+            simulator's output never blocks)
+
+    Returns:
+        int: Messages sent
+    """
+    if path is not None:
+        out = open(path, 'a')
+        async def send(line):
+            out.write(line)
+            out.flush()
+        async def close():
+            out.close()
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+        collector = asyncio.create_task(_collect(reader, received))
+        async def send(line):
+            writer.write(line.encode())
+            await writer.drain()  # Blocks while the simulator applies back-pressure
+        async def close():
+            if not writer.is_closing():
+                writer.write_eof()
+            await asyncio.gather(collector, return_exceptions=True)  # Until the last step is published
+            writer.close()
+
+    start = time.perf_counter()
+    sent = 0
+    try:
+        for msg in messages:
+            if speed and 't' in msg:
+                delay = start + float(msg['t']) / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await send(json.dumps(msg) + "\n")
+            sent += 1
+        if end:
+            await send(json.dumps({'type': "end"}) + "\n")
+    except ConnectionError:
+        pass  # The simulation ended first (duration reached or collapse)
+    finally:
+        await close()
+    return sent
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Replay recorded load telemetry into a streaming simulation")
+    parser.add_argument("recording", help="JSON-lines messages, optionally with a 't' timestamp (s)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000, help="TCP port of the simulator")
+    parser.add_argument("--file", help="Append to this file (for --stream file:PATH) instead of TCP")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed-up, 0 = no pacing")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    n = asyncio.run(replay(load_recording(args.recording), args.host, args.port, args.file, args.speed))
+    print(f"Replayed {n} messages")
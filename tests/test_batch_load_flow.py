@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+import batch_load_flow
+import grid_generator
+import network
+import nr_solver
+import ybus_generator
+from test_nr_solver import default_case
+
+SCALES = (0.8, 1.0, 1.1, 1.25)  # Load scaling of the K cases
+TOL = 1e-8
+
+CASES = {
+    'default': default_case,
+    'meshed': lambda: grid_generator.generate_grid(40, seed=2),
+}
+
+@pytest.fixture(params=sorted(CASES))
+def case(request):
+    return CASES[request.param]()
+
+def scaled_specs(net):
+    """(K x n) injections with the PQ loads scaled by SCALES."""
+    pq = net.pq_mask
+    P = np.array([net.P_spec + np.where(pq, -(s - 1.0) * net.Pl, 0.0) for s in SCALES])
+    Q = np.array([net.Q_spec + np.where(pq, -(s - 1.0) * net.Ql, 0.0) for s in SCALES])
+    return P, Q
+
+def scalar_solve(Y_bus, bus_data, line_data, P_spec, Q_spec):
+    case = network.Network.from_dicts(bus_data, line_data)
+    case.P_spec[:], case.Q_spec[:] = P_spec, Q_spec
+    return nr_solver.run_load_flow(Y_bus, case, 50)
+
+def assert_matches_scalar(result, Y_stack, bus_data, line_data, P, Q):
+    for k in range(len(P)):
+        V, Theta, P_calc, Q_calc = scalar_solve(Y_stack[k], bus_data, line_data, P[k], Q[k])
+        assert result['converged'][k]
+        np.testing.assert_allclose(result['V'][k], V, rtol=0, atol=TOL)
+        np.testing.assert_allclose(result['Theta'][k], Theta, rtol=0, atol=TOL)
+        np.testing.assert_allclose(result['P_calc'][k], P_calc, rtol=0, atol=TOL)
+        np.testing.assert_allclose(result['Q_calc'][k], Q_calc, rtol=0, atol=TOL)
+
+# --- Tests ---
+def test_shared_y_bus_matches_scalar_solver(case):
+    bus_data, line_data = case
+    net = network.Network.from_dicts(bus_data, line_data)
+    Y_bus = ybus_generator.build_y_bus(net, line_data, sparse=False)
+    P, Q = scaled_specs(net)
+    result = batch_load_flow.run_batch_load_flow(Y_bus, net, P, Q, chunk=3)
+    assert_matches_scalar(result, [Y_bus] * len(SCALES), bus_data, line_data, P, Q)
+
+def test_per_case_y_bus_matches_scalar_solver(case):
+    bus_data, line_data = case
+    net = network.Network.from_dicts(bus_data, line_data)
+    P, Q = scaled_specs(net)
+    # Case k runs with line k out of service (none of them radial here)
+    Y_stack = [ybus_generator.build_y_bus(net, line_data[:k] + line_data[k + 1:], sparse=False)
+               for k in range(len(SCALES))]
+    result = batch_load_flow.run_batch_load_flow(Y_stack, net, P, Q)
+    assert_matches_scalar(result, Y_stack, bus_data, line_data, P, Q)
+
+def test_stack_depth_must_match_cases(case):
+    bus_data, line_data = case
+    net = network.Network.from_dicts(bus_data, line_data)
+    Y_bus = ybus_generator.build_y_bus(net, line_data, sparse=False)
+    P, Q = scaled_specs(net)
+    with pytest.raises(ValueError):
+        batch_load_flow.run_batch_load_flow(np.stack([Y_bus] * (len(SCALES) - 1)), net, P, Q)
+    with pytest.raises(ValueError):
+        batch_load_flow.run_batch_load_flow([Y_bus] * (len(SCALES) + 1), net, P, Q)
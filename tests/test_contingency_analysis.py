@@ -0,0 +1,60 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+import contingency_analysis
+import grid_generator
+import network
+import nr_solver
+import ybus_generator
+
+TOL = 1e-5
+
+@pytest.fixture(scope="module", params=[False, True], ids=["dense", "sparse"])
+def analyzer(request):
+    net = network.Network.from_dicts(*grid_generator.generate_grid(30, seed=1))
+    return contingency_analysis.ContingencyAnalyzer(net, sparse=request.param, tol=1e-8)
+
+@pytest.fixture(autouse=True)
+def no_fallback(analyzer, monkeypatch):
+    """The low-rank paths must settle on their own, not through the full NR fallback."""
+    def fail(*args):
+        raise AssertionError("fell back to full NR")
+    monkeypatch.setattr(analyzer, '_full_nr', fail)
+
+def reference(net, Y_bus, analyzer):
+    """Full NR from the base solution on an explicitly rebuilt case."""
+    net.V[:], net.theta[:] = analyzer.V0, analyzer.Theta0
+    V, Theta, _, _ = nr_solver.run_load_flow(Y_bus, net, 50, tol=1e-8)
+    return V, Theta
+
+def test_branch_outages_match_full_nr(analyzer):
+    lines = [k for k in analyzer._line_idx.tolist() if k not in analyzer._bridges][:6]
+    assert lines
+    for k in lines:
+        V, Theta, Y_post = analyzer.solve_branch_outage(k)
+        post = analyzer.net.remove_lines([k])
+        Y_ref = ybus_generator.build_y_bus(post, sparse=analyzer.sparse)
+        diff = Y_post - Y_ref
+        assert np.max(np.abs(diff.toarray() if analyzer.sparse else diff)) < 1e-12
+        V_ref, Theta_ref = reference(post, Y_ref, analyzer)
+        np.testing.assert_allclose(V, V_ref, rtol=0, atol=TOL)
+        np.testing.assert_allclose(Theta, Theta_ref, rtol=0, atol=TOL)
+
+def test_unit_outages_match_full_nr(analyzer):
+    net = analyzer.net
+    gens = np.flatnonzero(net.types == 2)[:3]
+    assert len(gens)
+    for g in gens.tolist():
+        V, Theta, _ = analyzer.solve_generator_outage(int(net.ids[g]))
+        bus_data, line_data = net.to_dicts()
+        bus_data[g].update({'type': 3, 'Pg': 0.0, 'Qg': 0.0,
+                            'P_spec': -bus_data[g]['Pl'], 'Q_spec': -bus_data[g]['Ql']})
+        post = network.Network.from_dicts(bus_data, line_data)
+        V_ref, Theta_ref = reference(post, analyzer.Y_bus, analyzer)
+        np.testing.assert_allclose(V, V_ref, rtol=0, atol=TOL)
+        np.testing.assert_allclose(Theta, Theta_ref, rtol=0, atol=TOL)
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+import continuation_power_flow
+import network
+import nr_solver
+import ybus_generator
+from test_nr_solver import default_case
+
+STEP = 0.05  # Load increment of the brute-force sweep
+
+def brute_force_nose(bus_data, line_data, Y_bus, step=STEP, limit=5.0):
+    """Largest lambda on a step grid for which warm-started NR still converges."""
+    dP, dQ = continuation_power_flow.load_direction(bus_data)
+    base = network.Network.from_dicts(bus_data, line_data)
+    V, Theta = base.V.copy(), base.theta.copy()
+    last = None
+    for lam in np.arange(0.0, limit, step):
+        case = network.Network.from_dicts(bus_data, line_data)
+        case.P_spec += lam * dP
+        case.Q_spec += lam * dQ
+        case.V[:], case.theta[:] = V, Theta  # Stay on the upper branch of the PV curve
+        V_new, Theta_new, _, _ = nr_solver.run_load_flow(Y_bus, case, 50)
+        if V_new is None:
+            return last
+        V, Theta, last = V_new, Theta_new, lam
+    raise AssertionError("No voltage collapse within the sweep")
+
+def test_lambda_max_matches_load_scaling_sweep():
+    bus_data, line_data = default_case()
+    Y_bus = ybus_generator.build_y_bus(bus_data, line_data)
+    margin = continuation_power_flow.loadability_margin(Y_bus, bus_data)
+    last = brute_force_nose(bus_data, line_data, Y_bus)
+
+    assert margin['nose_reached']
+    assert last <= margin['lambda_max'] < last + STEP
+    Pl = sum(b['Pl'] for b in bus_data if b['type'] == 3)
+    assert margin['margin_pu'] == pytest.approx(margin['lambda_max'] * Pl)
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+import dc_power_flow
+import grid_generator
+import network
+
+def bus(bid, type_code, Pg=0.0, Pl=0.0):
+    return {'id': bid, 'type': type_code, 'V': 1.0, 'theta': 0.0, 'Pg': Pg, 'Pl': Pl, 'Qg': 0.0, 'Ql': 0.0,
+            'P_spec': Pg - Pl, 'Q_spec': 0.0, 'P_max': 999.99}
+
+def radial_first_case():
+    """4 buses, line 0 (3-4) is the only connection of bus 4."""
+    bus_data = [bus(1, 1), bus(2, 2, Pg=0.5), bus(3, 3, Pl=0.4), bus(4, 3, Pl=0.3)]
+    ends = [(3, 4), (1, 2), (2, 3), (1, 3)]
+    line_data = [{'from': f, 'to': t, 'r': 0.01, 'x': 0.1, 'b': 0.0, 'N': 0} for f, t in ends]
+    return network.Network.from_dicts(bus_data, line_data)
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_outage_flows_match_resolve(sparse):
+    net = network.Network.from_dicts(*grid_generator.generate_grid(30, seed=1))
+    model = dc_power_flow.DCPowerFlow(net, sparse=sparse)
+    flows = model.flows(net.P_spec)
+
+    # Base flows are the branch flows of the DC angles
+    theta = model.angles(net.P_spec)
+    np.testing.assert_allclose(flows, model.b * (theta[model.from_idx] - theta[model.to_idx]), atol=1e-10)
+
+    post = model.n1_flows(flows)
+    checked = 0
+    for k in np.flatnonzero(~model.bridges):
+        outaged = dc_power_flow.DCPowerFlow(net.remove_lines([model.line_idx[k]]), sparse=sparse)
+        expected = np.insert(outaged.flows(net.P_spec), k, 0.0)
+        np.testing.assert_allclose(model.outage_flows(flows, k), expected, atol=1e-10)
+        np.testing.assert_allclose(post[:, k], expected, atol=1e-10)
+        checked += 1
+    assert checked > 0
+
+def test_bridge_at_first_line():
+    net = radial_first_case()
+    model = dc_power_flow.DCPowerFlow(net)
+    assert model.bridges.tolist() == [True, False, False, False]
+
+    flows = model.flows(net.P_spec)
+    _, line_arrays = net.line_arrays()
+    screen = dc_power_flow.screen_line_outages(model, flows, line_arrays)
+    assert screen['islanding'].tolist() == [True, False, False, False]
+    assert np.isnan(screen['max_loading'][0]) and not screen['overloaded'][0]
@@ -0,0 +1,47 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+import fault_analysis
+import grid_generator
+import network
+import nr_solver
+import ybus_generator
+
+@pytest.fixture(scope="module")
+def net():
+    return network.Network.from_dicts(*grid_generator.generate_grid(40, seed=5))
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_z_diagonal_matches_dense_inverse(net, sparse, monkeypatch):
+    monkeypatch.setattr(fault_analysis, 'BLOCK_SIZE', 7)  # Several blocks and a partial last one
+    analyzer = fault_analysis.FaultAnalyzer(net, sparse=sparse)
+    for seq in (0, 1, 2):
+        Y = analyzer.y_bus(seq)
+        Z = np.linalg.inv(Y.toarray() if nr_solver.sp is not None and nr_solver.sp.issparse(Y) else Y)
+        np.testing.assert_allclose(analyzer.z_diagonal(seq), np.diag(Z), rtol=1e-10, atol=1e-12)
+        bus_id = int(net.ids[3])
+        np.testing.assert_allclose(analyzer.z_column(bus_id, seq), Z[:, 3], rtol=1e-10, atol=1e-12)
+    assert analyzer.factorizations == 2  # Negative sequence shares the positive factorization
+
+def test_single_faults_match_sweep(net):
+    Y_bus = ybus_generator.build_y_bus(net, sparse=True)
+    V, Theta, _, _ = nr_solver.run_load_flow(Y_bus, net, 50)
+    V_pre = V * np.exp(1j * Theta)
+    analyzer = fault_analysis.FaultAnalyzer(net)
+    Zf = 0.01 + 0.02j
+    for kind in fault_analysis.FAULT_KINDS:
+        sweep = analyzer.sweep(kind, Zf, V_pre)
+        for k in (0, 7, len(net) - 1):
+            single = analyzer.fault(int(net.ids[k]), kind, Zf, V_pre)
+            np.testing.assert_allclose(single['I_seq'], sweep['I_seq'][k], rtol=1e-10, atol=1e-12)
+            np.testing.assert_allclose(single['I_abc'], sweep['I_abc'][k], rtol=1e-10, atol=1e-12)
+            assert single['I_fault'] == pytest.approx(sweep['I_fault'][k], rel=1e-10)
+
+    # Bolted-through-Zf three-phase fault: V_a at the fault is Zf * I_a
+    single = analyzer.fault(int(net.ids[7]), "3ph", Zf, V_pre)
+    assert single['V_abc'][7, 0] == pytest.approx(Zf * single['I_abc'][0], rel=1e-9)
@@ -0,0 +1,132 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+import grid_generator
+import nr_solver
+import ybus_generator
+
+TOL = 1e-10
+
+# --- Reference: the original double-loop implementation ---
+def loop_injections(Y_bus, V, Theta):
+    n = len(V)
+    P_calc, Q_calc = np.zeros(n), np.zeros(n)
+    for i in range(n):
+        for k in range(n):
+            mag_Y = abs(Y_bus[i, k])
+            ang_Y = np.angle(Y_bus[i, k])
+            P_calc[i] += V[i] * V[k] * mag_Y * np.cos(Theta[i] - Theta[k] - ang_Y)
+            Q_calc[i] += V[i] * V[k] * mag_Y * np.sin(Theta[i] - Theta[k] - ang_Y)
+    return P_calc, Q_calc
+
+def loop_jacobian(Y_bus, V, Theta, P_calc, Q_calc):
+    n = len(V)
+    J1, J2, J3, J4 = (np.zeros((n, n)) for _ in range(4))
+    for i in range(n):
+        for k in range(n):
+            mag_Y = abs(Y_bus[i, k])
+            ang_Y = np.angle(Y_bus[i, k])
+            if i != k:
+                term_a = V[i] * V[k] * mag_Y * np.sin(Theta[i] - Theta[k] - ang_Y)
+                term_b = V[i] * V[k] * mag_Y * np.cos(Theta[i] - Theta[k] - ang_Y)
+                J1[i, k] = term_a
+                J2[i, k] = term_b / V[k]
+                J3[i, k] = -term_b
+                J4[i, k] = term_a / V[k]
+            else:
+                J1[i, i] = -Q_calc[i] - (V[i]**2 * Y_bus[i, i].imag)
+                J2[i, i] = P_calc[i] / V[i] + (V[i] * Y_bus[i, i].real)
+                J3[i, i] = P_calc[i] - (V[i]**2 * Y_bus[i, i].real)
+                J4[i, i] = Q_calc[i] / V[i] - (V[i] * Y_bus[i, i].imag)
+    return J1, J2, J3, J4
+
+def loop_load_flow(Y_bus, bus_data, max_iter=50, tol=1e-5):
+    V = np.array([b['V'] for b in bus_data], dtype=float)
+    Theta = np.array([b['theta'] for b in bus_data], dtype=float)
+    P_spec = np.array([b['P_spec'] for b in bus_data])
+    Q_spec = np.array([b['Q_spec'] for b in bus_data])
+    types = np.array([b['type'] for b in bus_data])
+    idx_pq = np.where(types == 3)[0]
+    non_slack = np.sort(np.concatenate((np.where(types == 2)[0], idx_pq)))
+
+    for _ in range(max_iter):
+        P_calc, Q_calc = loop_injections(Y_bus, V, Theta)
+        dPa, dQa = P_spec - P_calc, Q_spec - Q_calc
+        mismatch = max(np.max(np.abs(dPa[non_slack])), np.max(np.abs(dQa[idx_pq]), initial=0.0))
+        if mismatch < tol:
+            return V, Theta, P_calc, Q_calc
+        J1, J2, J3, J4 = loop_jacobian(Y_bus, V, Theta, P_calc, Q_calc)
+        J_final = np.vstack((np.hstack((J1[np.ix_(non_slack, non_slack)], J2[np.ix_(non_slack, idx_pq)])),
+                             np.hstack((J3[np.ix_(idx_pq, non_slack)], J4[np.ix_(idx_pq, idx_pq)]))))
+        correction = np.linalg.solve(J_final, np.concatenate((dPa[non_slack], dQa[idx_pq])))
+        Theta[non_slack] += correction[:len(non_slack)]
+        V[idx_pq] += correction[len(non_slack):]
+    raise AssertionError("Reference load flow did not converge")
+
+# --- Cases ---
+def default_case():
+    """The 5-bus system used for manual runs of main.py."""
+    buses = [(1, 1, 1.05, 0.0, 0.0, 0.0, 0.0, 3.0), (2, 2, 1.02, 0.6, 0.0, 0.0, 0.0, 1.0),
+             (3, 3, 1.0, 0.0, 0.5, 0.0, 0.2, 999.99), (4, 3, 1.0, 0.0, 0.4, 0.0, 0.15, 999.99),
+             (5, 3, 1.0, 0.0, 0.3, 0.0, 0.1, 999.99)]
+    bus_data = [{'id': bid, 'type': t, 'V': V, 'theta': 0.0, 'Pg': Pg, 'Pl': Pl, 'Qg': Qg, 'Ql': Ql,
+                 'P_spec': Pg - Pl, 'Q_spec': Qg - Ql, 'P_max': P_max}
+                for bid, t, V, Pg, Pl, Qg, Ql, P_max in buses]
+    lines = [(1, 2, 0.02, 0.06, 0.03), (1, 3, 0.08, 0.24, 0.025), (2, 3, 0.06, 0.18, 0.02),
+             (2, 4, 0.06, 0.18, 0.02), (3, 4, 0.01, 0.03, 0.01), (4, 5, 0.08, 0.24, 0.025)]
+    line_data = [{'from': f, 'to': t, 'r': r, 'x': x, 'b': b, 'N': 0} for f, t, r, x, b in lines]
+    return bus_data, line_data
+
+CASES = {
+    'default': default_case,
+    'meshed': lambda: grid_generator.generate_grid(40, seed=2),
+}
+
+@pytest.fixture(params=sorted(CASES))
+def case(request):
+    bus_data, line_data = CASES[request.param]()
+    return bus_data, line_data, ybus_generator.build_y_bus(bus_data, line_data, sparse=False)
+
+def perturbed_state(bus_data, seed=0):
+    rng = np.random.default_rng(seed)
+    V = np.array([b['V'] for b in bus_data]) + rng.uniform(-0.05, 0.05, len(bus_data))
+    Theta = rng.uniform(-0.2, 0.2, len(bus_data))
+    return V, Theta
+
+# --- Tests ---
+def test_injections_match_loops(case):
+    bus_data, _, Y_bus = case
+    V, Theta = perturbed_state(bus_data)
+    P_ref, Q_ref = loop_injections(Y_bus, V, Theta)
+    P_calc, Q_calc = nr_solver.calc_power_injections(Y_bus, V, Theta)
+    np.testing.assert_allclose(P_calc, P_ref, rtol=0, atol=TOL)
+    np.testing.assert_allclose(Q_calc, Q_ref, rtol=0, atol=TOL)
+
+def test_jacobian_matches_loops(case):
+    bus_data, line_data, Y_bus = case
+    V, Theta = perturbed_state(bus_data)
+    P_calc, Q_calc = loop_injections(Y_bus, V, Theta)
+    reference = loop_jacobian(Y_bus, V, Theta, P_calc, Q_calc)
+
+    for block, ref in zip(nr_solver.build_jacobian(Y_bus, V, Theta, P_calc, Q_calc), reference):
+        np.testing.assert_allclose(block, ref, rtol=0, atol=TOL)
+    if nr_solver.sp is not None:
+        Y_sparse = ybus_generator.build_y_bus(bus_data, line_data, sparse=True)
+        for block, ref in zip(nr_solver.build_jacobian_sparse(Y_sparse, V, Theta, P_calc, Q_calc), reference):
+            np.testing.assert_allclose(block.toarray(), ref, rtol=0, atol=TOL)
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_load_flow_matches_loops(case, sparse):
+    bus_data, line_data, Y_dense = case
+    if sparse and nr_solver.sp is None:
+        pytest.skip("scipy not installed")
+    V_ref, Theta_ref, P_ref, Q_ref = loop_load_flow(Y_dense, bus_data)
+    Y_bus = ybus_generator.build_y_bus(bus_data, line_data, sparse=sparse)
+    V, Theta, P_calc, Q_calc = nr_solver.run_load_flow(Y_bus, bus_data, 50)
+    for got, ref in ((V, V_ref), (Theta, Theta_ref), (P_calc, P_ref), (Q_calc, Q_ref)):
+        np.testing.assert_allclose(got, ref, rtol=0, atol=TOL)
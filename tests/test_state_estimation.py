@@ -0,0 +1,63 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+import grid_generator
+import network
+import nr_solver
+import state_estimation
+import ybus_generator
+
+TOL = 1e-8
+
+pytestmark = pytest.mark.skipif(nr_solver.sp is None, reason="sparse backend needs scipy")
+
+@pytest.fixture(scope="module")
+def system():
+    bus_data, line_data = grid_generator.generate_grid(30, seed=4)
+    net = network.Network.from_dicts(bus_data, line_data)
+    Y_bus = ybus_generator.build_y_bus(net, sparse=True)
+    V, Theta, _, _ = nr_solver.run_load_flow(Y_bus, net, 50)
+    meas = state_estimation.simulate_measurements(net, V, Theta, seed=1, Y_bus=Y_bus)
+    return net, Y_bus, V, Theta, meas
+
+def estimators(net, Y_bus):
+    return (state_estimation.StateEstimator(net, Y_bus=Y_bus),
+            state_estimation.StateEstimator(net, Y_bus=Y_bus.toarray()))
+
+# --- Tests ---
+def test_sparse_and_dense_normalized_residuals_agree(system):
+    net, Y_bus, _, _, meas = system
+    sparse, dense = estimators(net, Y_bus)
+    assert sparse.sparse and not dense.sparse
+
+    weights = 1.0 / meas.sigmas**2
+    weights[[3, len(net) + 5]] = 0.0  # Dropped measurements keep the gain pattern
+    for w in (None, weights):
+        res_s = sparse.estimate(meas, weights=w)
+        res_d = dense.estimate(meas, weights=w)
+        np.testing.assert_allclose(res_s['V'], res_d['V'], rtol=0, atol=TOL)
+        np.testing.assert_allclose(res_s['Theta'], res_d['Theta'], rtol=0, atol=TOL)
+        r_s = sparse.normalized_residuals(meas, res_s)
+        r_d = dense.normalized_residuals(meas, res_d)
+        np.testing.assert_allclose(r_s, r_d, rtol=1e-6, atol=1e-8)
+    assert np.all(r_s[weights == 0] == 0.0)
+
+def test_largest_normalized_residual_finds_gross_error(system):
+    net, Y_bus, V, Theta, meas = system
+    bad_meas = state_estimation.Measurements(meas.kinds, meas.locations, meas.values.copy(), meas.sigmas)
+    gross = len(net) + 7  # P injection of the 8th bus, 20 sigma off
+    bad_meas.values[gross] += 0.2
+
+    for estimator in estimators(net, Y_bus):
+        clean = estimator.estimate_with_bad_data(meas)
+        assert clean['bad'] == []
+        result = estimator.estimate_with_bad_data(bad_meas)
+        assert result['bad'][0] == gross
+        assert result['converged']
+        assert np.max(result['r_norm']) <= state_estimation.LNR_THRESHOLD
+        np.testing.assert_allclose(result['V'], V, rtol=0, atol=0.01)
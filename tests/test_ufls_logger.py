@@ -0,0 +1,65 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+import ufls_logger
+
+BACKENDS = ['.csv', '.npy'] + (['.parquet'] if ufls_logger.pa is not None else [])
+
+def sample_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = np.column_stack((np.arange(n) * 0.1, 50.0 + rng.normal(0, 0.2, n), rng.normal(0, 0.5, n),
+                            rng.uniform(0.8, 1.2, n), rng.choice([0.0, 5.0, 10.0], n)))
+    return np.round(rows, 4)
+
+def assert_log_equals(path, rows):
+    data = ufls_logger.read_log(path)
+    np.testing.assert_allclose(np.column_stack([data[name] for name in ufls_logger.COLUMNS]), rows,
+                               rtol=0, atol=1e-12)
+
+# --- Tests ---
+@pytest.mark.parametrize('ext', BACKENDS)
+def test_round_trip(tmp_path, ext):
+    path = str(tmp_path / f"ufls{ext}")
+    rows = sample_rows(25)
+    logger = ufls_logger.TrainingLogger(path, buffer_rows=7, flush_interval=1e9)
+    for row in rows[:20]:
+        logger.log(*row)
+    logger.close()
+    assert logger.rows_written == 20
+
+    # A second logger appends to the existing file
+    logger = ufls_logger.TrainingLogger(path, buffer_rows=7, flush_interval=1e9)
+    for row in rows[20:]:
+        logger.log(*row)
+    logger.close()
+    assert_log_equals(path, rows)
+
+@pytest.mark.parametrize('ext', BACKENDS)
+def test_shard_merge(tmp_path, ext):
+    path = str(tmp_path / f"ufls{ext}")
+    parts = [sample_rows(n, seed) for seed, n in enumerate((5, 9, 3))]
+    for pid, rows in zip((101, 102, 103), parts):
+        logger = ufls_logger.TrainingLogger(path, buffer_rows=4)
+        logger.path = ufls_logger.shard_path(path, pid)  # Stand-in for three worker processes
+        for row in rows:
+            logger.log(*row)
+        logger.close()
+
+    assert len(ufls_logger.shard_paths(path)) == 3
+    assert ufls_logger.merge_shards(path) == 3
+    assert ufls_logger.shard_paths(path) == []
+    assert_log_equals(path, np.vstack(parts))
+
+def test_exit_handler_closes_open_loggers(tmp_path):
+    path = str(tmp_path / "ufls.csv")
+    logger = ufls_logger.TrainingLogger(path)
+    logger.log(*sample_rows(1)[0])
+    assert logger in ufls_logger._open_loggers
+    ufls_logger._close_open_loggers()
+    assert logger not in ufls_logger._open_loggers
+    assert_log_equals(path, sample_rows(1))
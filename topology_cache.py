@@ -0,0 +1,187 @@
+from collections import OrderedDict
+import numpy as np
+
+import network
+import ybus_generator
+import nr_solver
+import fdlf_solver
+import dc_power_flow
+import simulator
+
+DEFAULT_MAX_BYTES = 256 * 2**20  # Memory budget of the cached entries
+
+def _array_bytes(obj):
+    """Bytes held by a numpy array, a scipy sparse matrix or a dict of them."""
+    if obj is None:
+        return 0
+    if isinstance(obj, dict):
+        return sum(_array_bytes(v) for v in obj.values())
+    if nr_solver.sp is not None and nr_solver.sp.issparse(obj):
+        obj = obj.tocsr() if obj.format not in ('csr', 'csc') else obj
+        return obj.data.nbytes + obj.indices.nbytes + obj.indptr.nbytes
+    return np.asarray(obj).nbytes
+
+class TopologyEntry:
+    def __init__(self, key, net, sparse):
+        """
+        Everything of one topology that does not depend on the injections.
+
+        Attributes:
+            key (frozenset): Outage set, see TopologyCache.outage_key
+            Y_bus (array or sparse matrix): Bus admittance matrix
+            ids, id_map: Bus IDs in network order and ID -> index map
+            non_slack, idx_pq, slack_idx: NR unknown index sets
+            line_idx, line_arrays: Output of Network.line_arrays
+            jacobian_pattern (sparse matrix): Reduced Jacobian pattern (sparse only)
+            ordering (np.ndarray): Symbolic ordering of that pattern (sparse only)
+            nbytes (int): Estimated memory of the entry
+        """
+        self.key = key
+        self.Y_bus = ybus_generator.build_y_bus(net, sparse=sparse)
+        self.ids = net.ids.copy()
+        self.id_map = dict(net.id_map)
+        self.idx_pq = np.where(net.types == 3)[0]
+        self.non_slack = np.sort(np.concatenate((np.where(net.types == 2)[0], self.idx_pq)))
+        self.slack_idx = int(np.argmax(net.types == 1))
+        self.line_idx, self.line_arrays = net.line_arrays()
+
+        self.jacobian_pattern = None
+        self.ordering = None
+        if nr_solver.sp is not None and nr_solver.sp.issparse(self.Y_bus) and len(self.non_slack):
+            self.jacobian_pattern = nr_solver.jacobian_pattern(self.Y_bus, self.non_slack, self.idx_pq)
+            self.ordering = nr_solver.symbolic_ordering(self.jacobian_pattern)
+
+        self._net = net  # Structure for the lazily built fast-decoupled solvers
+        self._fdlf = {}
+        self._dc = None
+        self._dc_bytes = 0  # PTDF / LODF memory already counted in nbytes
+        self.nbytes = sum(_array_bytes(a) for a in (
+            self.Y_bus, self.ids, self.idx_pq, self.non_slack, self.line_idx, self.line_arrays,
+            self.jacobian_pattern, self.ordering)) + 100 * len(self.id_map)
+
+    def fdlf(self, variant="XB"):
+        """
+        FastDecoupledSolver of this topology, factorized on first use.
+
+        Raises:
+            np.linalg.LinAlgError: If B' or B'' is singular
+        """
+        if variant not in self._fdlf:
+            solver = fdlf_solver.FastDecoupledSolver(self._net, None, self.Y_bus, variant)
+            self._fdlf[variant] = solver
+            # B' / B'' have the pattern of the Y-bus and are factorized once
+            self.nbytes += 2 * _array_bytes(self.Y_bus)
+        return self._fdlf[variant]
+
+    def dc(self):
+        """DCPowerFlow of this topology (PTDF / LODF built on first use and kept)."""
+        if self._dc is None:
+            self._dc = dc_power_flow.DCPowerFlow(self._net, sparse=not isinstance(self.Y_bus, np.ndarray))
+        return self._dc
+
+class TopologyCache:
+    def __init__(self, base_net, max_bytes=DEFAULT_MAX_BYTES, sparse=None):
+        """
+        LRU cache of network topologies keyed by the outage set: the
+        frozenset of out-of-service buses and switched-out branches relative
+        to the base case.
+
+        Each entry (TopologyEntry) keeps the Y-bus, the index maps, the line
+        arrays, the Jacobian sparsity pattern with its symbolic ordering and,
+        on demand, the fast-decoupled B' / B'' factors and the DC PTDF / LODF.
+        Entries are evicted least recently used first once their estimated
+        size exceeds max_bytes (the newest entry always stays, even if it
+        alone is larger).
+
+        Only the topology is cached, so all networks looked up must derive
+        from base_net by Network.remove_bus / remove_lines (same buses, bus
+        types and line rows); the injections are free to differ.
+
+        Args:
+            base_net (list or Network): Base case
+            max_bytes (int): Memory budget of the entries
+            sparse (bool): Sparse Y-bus / Jacobian (None: the Simulator's
+                size threshold)
+        """
+        base = base_net if isinstance(base_net, network.Network) else network.Network.from_dicts(*base_net)
+        self.base_ids = frozenset(base.ids.tolist())
+        self.max_bytes = max_bytes
+        if sparse is None:
+            sparse = len(base) > simulator.SPARSE_THRESHOLD
+        self.sparse = sparse
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def outage_key(self, net):
+        """frozenset of ('bus', id) and ('line', row) outages of net."""
+        buses = self.base_ids.difference(net.ids.tolist())
+        lines = np.flatnonzero(~net.line_status).tolist()
+        return frozenset([('bus', b) for b in buses] + [('line', k) for k in lines])
+
+    def get(self, net):
+        """
+        Entry of net's topology, built (and cached) on a miss.
+
+        Returns:
+            TopologyEntry
+        """
+        key = self.outage_key(net)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        entry = TopologyEntry(key, net, self.sparse)
+        self._entries[key] = entry
+        self.nbytes += entry.nbytes
+        self._evict()
+        return entry
+
+    def fdlf(self, entry, variant="XB"):
+        """entry.fdlf(variant), with the extra factor memory counted against the budget."""
+        before = entry.nbytes
+        solver = entry.fdlf(variant)
+        self.nbytes += entry.nbytes - before
+        self._evict()
+        return solver
+
+    def dc(self, entry):
+        """
+        entry.dc() with its PTDF built; the PTDF / LODF memory built so far
+        is counted against the budget on every call.
+        """
+        model = entry.dc()
+        model.ptdf
+        grown = model.nbytes - entry._dc_bytes
+        entry._dc_bytes += grown
+        entry.nbytes += grown
+        self.nbytes += grown
+        self._evict()
+        return model
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            self.nbytes -= old.nbytes
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'entries': len(self._entries), 'nbytes': self.nbytes, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
@@ -1,23 +1,38 @@
-import csv
-import os
+import numpy as np
+import network
+import ufls_logger
+
+# (setpoint Hz, load fraction shed, name) of the default system-wide stages
+DEFAULT_STAGES = [
+    (49.2, 0.05, "Stage 1 (5%)"),
+    (48.8, 0.10, "Stage 2 (10%)"),
+    (48.4, 0.15, "Stage 3 (15%)"),
+]
+
+def _open_logger(filename, logger):
+    if logger is None and filename is not None:
+        # Buffered: rows are written in bulk, not opened/closed per step
+        logger = ufls_logger.TrainingLogger(filename)
+    return logger
 
 class UFLS:
-    def __init__(self, filename="ufls_training_data.csv"):
+    def __init__(self, filename="ufls_training_data.csv", logger=None):
+        """
+        Args:
+            filename (str): Training-data log (.csv, .npy or .parquet), or
+                None to disable logging (e.g. batch scenario runs)
+            logger (TrainingLogger): Shared / sharded logger; overrides filename
+        """
         # Define the UFLS Stages
-        self.stages = [
-            {"freq": 49.2, "drop": 0.05, "tripped": False, "name": "Stage 1 (5%)"},
-            {"freq": 48.8, "drop": 0.10, "tripped": False, "name": "Stage 2 (10%)"},
-            {"freq": 48.4, "drop": 0.15, "tripped": False, "name": "Stage 3 (15%)"}
-        ]
-        
-        self.filename = filename
+        self.stages = [{"freq": freq, "drop": drop, "tripped": False, "name": name}
+                       for freq, drop, name in DEFAULT_STAGES]
         
-        # Create CSV and write header if it doesn't exist
-        file_exists = os.path.isfile(self.filename)
-        with open(self.filename, mode='a', newline='') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow(["Time_s", "Frequency_Hz", "RoCoF_Hz_s", "Total_Load_pu", "Action_Shed_Pct"])
+        self.filename = logger.path if logger is not None else filename
+        self.logger = _open_logger(filename, logger)
+
+    @property
+    def tripped_stages(self):
+        return sum(stage["tripped"] for stage in self.stages)
 
     def check_and_shed(self, t, current_freq, rocof, bus_data):
         """
@@ -37,6 +52,9 @@ class UFLS:
                 alerts.append(f"   [UFLS RELAY] {stage['name']} Tripped at {current_freq:.3f} Hz!")
                 
                 # Physically reduce the load on PQ buses
+                if isinstance(bus_data, network.Network):
+                    bus_data.scale_loads(1.0 - stage["drop"])
+                    continue
                 for b in bus_data:
                     if b['type'] == 3:  
                         b['Pl'] = b['Pl'] * (1.0 - stage["drop"])
@@ -46,12 +64,184 @@ class UFLS:
                         b['P_spec'] = b['Pg'] - b['Pl']
                         b['Q_spec'] = b['Qg'] - b['Ql']
 
+        if self.logger is None:
+            return shed_occurred, alerts
+
         # Calculate current load state for logging
-        total_load = sum([b['Pl'] for b in bus_data])
+        if isinstance(bus_data, network.Network):
+            total_load = bus_data.total_load()
+        else:
+            total_load = sum([b['Pl'] for b in bus_data])
         
-        # Log real-time data to CSV for Machine Learning
-        with open(self.filename, mode='a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([t, round(current_freq, 4), round(rocof, 4), round(total_load, 4), round(action_taken_pct, 4)])
+        # Log real-time data for Machine Learning
+        self.logger.log(t, current_freq, rocof, total_load, action_taken_pct)
+
+        return shed_occurred, alerts
+
+    def close(self):
+        """Flushes the buffered training rows to disk."""
+        if self.logger is not None:
+            self.logger.close()
+
+class UFLSRelayBank:
+    def __init__(self, setpoints, drops, bus_sets=None, delays=0.0, rocof_min=0.0, names=None,
+                 measure_bus=None, filename="ufls_training_data.csv", logger=None):
+        """
+        Array-backed bank of independent UFLS relays (drop-in for UFLS).
+
+        Relay r picks up while its frequency is below setpoints[r] (and, if
+        rocof_min[r] > 0, the RoCoF is at or below -rocof_min[r]), trips once
+        it has stayed picked up for delays[r] seconds, and then sheds drops[r]
+        of the load of every PQ bus in bus_sets[r]. Each trip is a one-shot.
+
+        The shedding actions are precomputed as per-bus keep factors in CSR
+        form (one row per relay), so a trip only touches the buses of the
+        relays that fired. While the frequency is above every armed
+        setpoint and no relay is timing, a step costs one comparison, so
+        the per-step cost does not grow with the number of relays.
+
+        Args:
+            setpoints (array): Pickup frequency per relay (Hz)
+            drops (array): Load fraction shed per relay
+            bus_sets (list): Bus IDs shed by each relay; None (or a None
+                entry) means every PQ bus of the network
+            delays (float or array): Pickup-to-trip time delay (s)
+            rocof_min (float or array): RoCoF supervision, 0 = none (Hz/s)
+            names (list): Relay names used in the alerts
+            measure_bus (list): Bus ID whose frequency each relay measures,
+                used when check_and_shed gets per-bus frequencies
+            filename (str): Training-data log, None to disable logging
+            logger (TrainingLogger): Shared / sharded logger; overrides filename
+        """
+        self.setpoints = np.asarray(setpoints, dtype=float)
+        n = len(self.setpoints)
+        self.drops = np.broadcast_to(np.asarray(drops, dtype=float), (n,)).copy()
+        self.delays = np.broadcast_to(np.asarray(delays, dtype=float), (n,)).copy()
+        self.rocof_min = np.broadcast_to(np.asarray(rocof_min, dtype=float), (n,)).copy()
+        self.names = list(names) if names is not None else [f"Relay {r + 1} ({d*100:.0f}%)" for r, d in enumerate(self.drops)]
+        self.measure_bus = None if measure_bus is None else np.asarray(measure_bus, dtype=int)
+
+        # Keep factors (1 - drop) as CSR rows over the sorted bus-ID universe
+        if bus_sets is None:
+            bus_sets = [None] * n
+        self.system_wide = np.array([bs is None for bs in bus_sets])
+        sets = [np.unique(np.asarray(bs, dtype=int)) if bs is not None else np.empty(0, dtype=int) for bs in bus_sets]
+        self.bus_universe = np.unique(np.concatenate(sets)) if sets else np.empty(0, dtype=int)
+        self._indptr = np.concatenate(([0], np.cumsum([len(bs) for bs in sets]))).astype(int)
+        self._indices = np.searchsorted(self.bus_universe, np.concatenate(sets)) if sets else np.empty(0, dtype=int)
+        self._keep = np.repeat(1.0 - self.drops, np.diff(self._indptr))
+
+        self.filename = logger.path if logger is not None else filename
+        self.logger = _open_logger(filename, logger)
+        self._measure = (None, None)
+        self.reset()
+
+    @classmethod
+    def from_stages(cls, stages=DEFAULT_STAGES, **kwargs):
+        """Bank of system-wide relays from (setpoint, drop, name) stages, e.g. DEFAULT_STAGES."""
+        setpoints, drops, names = zip(*stages)
+        return cls(setpoints, drops, names=names, **kwargs)
+
+    def reset(self):
+        """Re-arms every relay."""
+        n = len(self.setpoints)
+        self.armed = np.ones(n, dtype=bool)
+        self.tripped = np.zeros(n, dtype=bool)
+        self.pickup_time = np.full(n, np.nan)
+        self._timing = 0
+        self._pickup_max = self.setpoints.max() if n else -np.inf
+
+    @property
+    def tripped_stages(self):
+        return int(self.tripped.sum())
+
+    def _relay_frequency(self, current_freq, bus_data):
+        """Frequency seen by each relay (scalar: the same system frequency for all)."""
+        if np.ndim(current_freq) == 0:
+            return current_freq
+        if self.measure_bus is None:
+            raise ValueError("Per-bus frequencies need measure_bus")
+        # Positions of the measuring buses, cached per network object
+        if self._measure[0] is not bus_data:
+            id_map = bus_data.id_map if isinstance(bus_data, network.Network) else {b['id']: i for i, b in enumerate(bus_data)}
+            self._measure = (bus_data, np.array([id_map[b] for b in self.measure_bus.tolist()], dtype=int))
+        return np.asarray(current_freq, dtype=float)[self._measure[1]]
+
+    def _due(self, t, freq, rocof):
+        """Updates pickups and returns the indices of the relays that trip at t."""
+        if np.ndim(freq) == 0 and freq >= self._pickup_max:
+            # Nothing can pick up: only drop pickups left from a dip
+            if self._timing:
+                self.pickup_time[:] = np.nan
+                self._timing = 0
+            return None
+        below = self.armed & (freq < self.setpoints) & ((self.rocof_min <= 0) | (rocof <= -self.rocof_min))
+        self.pickup_time[~below] = np.nan
+        self.pickup_time[below & np.isnan(self.pickup_time)] = t
+        self._timing = int(below.sum())
+        due = np.flatnonzero(below & (t - self.pickup_time >= self.delays - 1e-9))
+        return due if due.size else None
+
+    def _scale(self, fired, bus_data):
+        """Per-bus keep factor of the fired relays for the current network order."""
+        ids, types, *_ = network.bus_arrays(bus_data)
+        keep_u = np.ones(len(self.bus_universe))
+        for r in fired.tolist():
+            cols = self._indices[self._indptr[r]:self._indptr[r + 1]]
+            keep_u[cols] *= self._keep[self._indptr[r]:self._indptr[r + 1]]
+        scale = np.full(len(ids), float(np.prod(1.0 - self.drops[fired[self.system_wide[fired]]])))
+        if len(self.bus_universe):
+            pos = np.minimum(np.searchsorted(self.bus_universe, ids), len(self.bus_universe) - 1)
+            known = self.bus_universe[pos] == ids
+            scale[known] *= keep_u[pos[known]]
+        return scale, types == 3
+
+    def check_and_shed(self, t, current_freq, rocof, bus_data):
+        """
+        Same contract as UFLS.check_and_shed. current_freq may also be an
+        array of per-bus frequencies (see measure_bus; the lowest one is
+        logged). The logged action is the sum of the fired relays' drop
+        fractions, the same label UFLS logs for its stages.
+
+        Returns:
+            shed_occurred (bool), alerts (list)
+        """
+        alerts = []
+        action_taken_pct = 0.0
+        freq = self._relay_frequency(current_freq, bus_data)
+        fired = self._due(t, freq, rocof)
+
+        if fired is not None:
+            self.armed[fired] = False
+            self.tripped[fired] = True
+            self.pickup_time[fired] = np.nan
+            self._timing -= len(fired)
+            self._pickup_max = self.setpoints[self.armed].max() if self.armed.any() else -np.inf
+
+            for r in fired.tolist():
+                f_r = freq if np.ndim(freq) == 0 else freq[r]
+                alerts.append(f"   [UFLS RELAY] {self.names[r]} Tripped at {f_r:.3f} Hz!")
+
+            action_taken_pct = float(self.drops[fired].sum())
+            scale, pq = self._scale(fired, bus_data)
+            mask = pq & (scale != 1.0)
+            if isinstance(bus_data, network.Network):
+                bus_data.scale_loads(scale[mask], mask)
+            else:
+                for i in np.flatnonzero(mask).tolist():
+                    b = bus_data[i]
+                    b['Pl'] = b['Pl'] * scale[i]
+                    b['Ql'] = b['Ql'] * scale[i]
+                    b['P_spec'] = b['Pg'] - b['Pl']
+                    b['Q_spec'] = b['Qg'] - b['Ql']
+
+        if self.logger is not None:
+            total_load = bus_data.total_load() if isinstance(bus_data, network.Network) else sum(b['Pl'] for b in bus_data)
+            self.logger.log(t, float(np.min(current_freq)), rocof, total_load, action_taken_pct)
+
+        return fired is not None, alerts
 
-        return shed_occurred, alerts
\ No newline at end of file
+    def close(self):
+        """Flushes the buffered training rows to disk."""
+        if self.logger is not None:
+            self.logger.close()
@@ -0,0 +1,212 @@
+import atexit
+import csv
+import glob
+import os
+import re
+import struct
+import time
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Same schema as the original per-step CSV rows
+COLUMNS = ["Time_s", "Frequency_Hz", "RoCoF_Hz_s", "Total_Load_pu", "Action_Shed_Pct"]
+RECORD_DTYPE = np.dtype([(name, '<f8') for name in COLUMNS])
+NPY_HEADER_LEN = 256  # Fixed .npy header size, so the row count can be patched in place
+
+_open_loggers = set()  # Unclosed loggers, flushed by the single exit handler
+
+@atexit.register
+def _close_open_loggers():
+    for logger in list(_open_loggers):
+        logger.close()
+
+def _csv_row(row):
+    # Whole-second times stay integers, as in the original per-step rows
+    t = round(row[0], 4)
+    return [int(t) if t.is_integer() else t] + [round(v, 4) for v in row[1:]]
+
+def _write_npy_header(f, n_rows):
+    """Writes a version 1.0 .npy header of NPY_HEADER_LEN bytes for n_rows records."""
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (RECORD_DTYPE.descr, n_rows)
+    header = header.ljust(NPY_HEADER_LEN - 11) + '\n'
+    f.seek(0)
+    f.write(b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1'))
+
+def _append_npy(path, rows):
+    """
+    Appends records to a .npy file written by this module (created if missing).
+    Only the new rows and the fixed-size header are written.
+    """
+    records = np.ascontiguousarray(rows, dtype=float).view(RECORD_DTYPE).ravel()
+    n_old = 0
+    if os.path.isfile(path):
+        with open(path, 'rb') as f:
+            version = np.lib.format.read_magic(f)
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f) if version == (1, 0) else (None, None, None)
+            if f.tell() != NPY_HEADER_LEN or dtype != RECORD_DTYPE:
+                raise ValueError(f"{path} was not written by TrainingLogger")
+        n_old = shape[0]
+    else:
+        with open(path, 'wb') as f:
+            _write_npy_header(f, 0)
+
+    with open(path, 'r+b') as f:
+        f.seek(NPY_HEADER_LEN + n_old * RECORD_DTYPE.itemsize)
+        records.tofile(f)
+        _write_npy_header(f, n_old + len(records))
+
+def _backend(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in ('.csv', '.npy', '.parquet'):
+        raise ValueError(f"Unsupported log file type: {ext}")
+    if ext == '.parquet' and pa is None:
+        raise ImportError("Parquet logging requires pyarrow")
+    return ext
+
+def shard_path(path, pid=None):
+    """Per-process shard of a log file: ufls.csv -> ufls.<pid>.csv"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{os.getpid() if pid is None else pid}{ext}"
+
+def shard_paths(path):
+    """Existing shard files of a log path, in a stable order."""
+    stem, ext = os.path.splitext(path)
+    pattern = re.compile(re.escape(os.path.basename(stem)) + r'\.\d+' + re.escape(ext) + '$')
+    return sorted(p for p in glob.glob(glob.escape(stem) + '.*' + ext) if pattern.match(os.path.basename(p)))
+
+class TrainingLogger:
+    def __init__(self, path="ufls_training_data.csv", buffer_rows=4096, flush_interval=30.0, shard=False):
+        """
+        Buffered UFLS training-data logger.
+
+        Rows go into a preallocated ring buffer (one float64 column per
+        field) and are written in bulk when the buffer is full, when
+        flush_interval seconds have passed since the last write, and on
+        close / interpreter exit. The backend follows the file extension:
+        .csv (original schema, appended), .npy (structured records with
+        the CSV column names) or .parquet (one row group per flush, needs
+        pyarrow).
+
+        Args:
+            path (str): Log file
+            buffer_rows (int): Rows held in memory between flushes
+            flush_interval (float): Wall-clock seconds between forced flushes
+            shard (bool): Write to a per-process file (see shard_path) so
+                parallel workers never share a file; combine with merge_shards
+        """
+        self.base_path = path
+        self.path = shard_path(path) if shard else path
+        self.format = _backend(path)
+        self.flush_interval = flush_interval
+
+        self._buffer = np.empty((buffer_rows, len(COLUMNS)))
+        self._count = 0
+        self._last_flush = time.monotonic()
+        self._parquet = None
+        self._closed = False
+        self.rows_written = 0
+        _open_loggers.add(self)
+
+    def log(self, t, frequency, rocof, total_load, action_pct):
+        """Buffers one row; flushes when the buffer is full or the interval has passed."""
+        self._buffer[self._count] = (t, frequency, rocof, total_load, action_pct)
+        self._count += 1
+        if self._count == len(self._buffer) or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows to the backend and rewinds the buffer."""
+        self._last_flush = time.monotonic()
+        if self._count == 0:
+            return
+        rows = self._buffer[:self._count]
+
+        if self.format == '.csv':
+            file_exists = os.path.isfile(self.path)
+            with open(self.path, mode='a', newline='') as f:
+                writer = csv.writer(f)
+                if not file_exists:
+                    writer.writerow(COLUMNS)
+                writer.writerows([_csv_row(row) for row in rows.tolist()])
+        elif self.format == '.npy':
+            _append_npy(self.path, np.round(rows, 4))
+        else:
+            table = pa.table({name: np.round(rows[:, k], 4) for k, name in enumerate(COLUMNS)})
+            if self._parquet is None:
+                # Keep the rows of an existing file, as the CSV backend does
+                old = pq.read_table(self.path) if os.path.isfile(self.path) else None
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+                if old is not None:
+                    self._parquet.write_table(old.cast(table.schema))
+            self._parquet.write_table(table)
+
+        self.rows_written += self._count
+        self._count = 0
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+        self._closed = True
+        _open_loggers.discard(self)
+
+def read_log(path):
+    """
+    Reads a log file of any backend.
+
+    Returns:
+        dict: Column name -> float array
+    """
+    fmt = _backend(path)
+    if fmt == '.csv':
+        data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+        return {name: data[:, k] for k, name in enumerate(COLUMNS)}
+    if fmt == '.npy':
+        data = np.load(path)
+        return {name: np.asarray(data[name]) for name in COLUMNS}
+    table = pq.read_table(path)
+    return {name: table.column(name).to_numpy() for name in COLUMNS}
+
+def merge_shards(path, remove=True):
+    """
+    Appends every per-process shard of path to path itself (header written
+    once for CSV) and, by default, deletes the shards.
+
+    Returns:
+        int: Number of shard files merged
+    """
+    fmt = _backend(path)
+    shards = shard_paths(path)
+
+    if fmt == '.csv':
+        file_exists = os.path.isfile(path)
+        with open(path, mode='a', newline='') as out:
+            if not file_exists:
+                csv.writer(out).writerow(COLUMNS)
+            for shard in shards:
+                with open(shard, newline='') as f:
+                    f.readline()  # Shard header
+                    for chunk in iter(lambda: f.read(1 << 20), ''):
+                        out.write(chunk)
+    elif fmt == '.npy':
+        for shard in shards:
+            data = np.load(shard, mmap_mode='r')
+            _append_npy(path, np.column_stack([data[name] for name in COLUMNS]))
+    else:
+        tables = [pq.read_table(p) for p in ([path] if os.path.isfile(path) else []) + shards]
+        if tables:
+            pq.write_table(pa.concat_tables(tables), path)
+
+    if remove:
+        for shard in shards:
+            os.remove(shard)
+    return len(shards)
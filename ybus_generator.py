@@ -1,4 +1,11 @@
 import numpy as np
+import network
+import instrumentation
+
+try:
+    import scipy.sparse as sp
+except ImportError:  # scipy is optional, dense Y-Bus is always available
+    sp = None
 
 def get_user_input():
     print("--- STEP 1: System Data Entry ---")
@@ -77,33 +84,66 @@ def get_user_input():
             print("Invalid input.")         
     return bus_data, line_data
 
-def build_y_bus(bus_data, line_data):
-    num_buses = len(bus_data)
-    id_map = {b['id']: i for i, b in enumerate(bus_data)}
-    
-    Y = np.zeros((num_buses, num_buses), dtype=complex)
-    
+def branch_stamps(bus_data, line_data):
+    """
+    Collects the (row, col, value) admittance entries of every branch.
+
+    Duplicated positions are summed when the matrix is assembled, so the
+    same stamps feed both the dense and the sparse Y-bus.
+    """
+    if isinstance(bus_data, network.Network):
+        id_map = bus_data.id_map
+    else:
+        id_map = {b['id']: i for i, b in enumerate(bus_data)}
+    rows, cols, vals = [], [], []
+
     for line in line_data:
         if line['from'] in id_map and line['to'] in id_map:
             i = id_map[line['from']]
-            j = id_map[line['to']]            
-            z = complex(line['r'], line['x'])
-            a = line['N']
-            y_s = 1/z
-           
-            y_sh = complex(0, line['b'])
-            
-            Y[i, j] -= y_s
-            Y[j, i] -= y_s
-            Y[i, i] += (y_s + y_sh)
-            Y[j, j] += (y_s + y_sh)
-            
+            j = id_map[line['to']]
+            a = line.get('N', 0)
+
+            # Transformer-only entries from get_user_input carry no r/x
+            if line.get('r', 0.0) != 0.0 or line.get('x', 0.0) != 0.0:
+                z = complex(line['r'], line['x'])
+                y_s = 1/z
+                y_sh = complex(0, line.get('b', 0.0))
+                rows += [i, j, i, j]
+                cols += [j, i, i, j]
+                vals += [-y_s, -y_s, y_s + y_sh, y_s + y_sh]
+
             if a != 0:
-             zt = complex(line['rt'], line['xt'])
-             y_t = 1/zt
-             Y[i, j] -= y_t/a
-             Y[j, i] -= y_t/a
-             Y[i, i] += y_t/a**2
-             Y[j, j] += y_t
-            
+                zt = complex(line['rt'], line['xt'])
+                y_t = 1/zt
+                rows += [i, j, i, j]
+                cols += [j, i, i, j]
+                vals += [-y_t/a, -y_t/a, y_t/a**2, y_t]
+
+    return np.array(rows, dtype=int), np.array(cols, dtype=int), np.array(vals, dtype=complex)
+
+@instrumentation.traced("build_y_bus")
+def build_y_bus(bus_data, line_data=None, sparse=False):
+    """
+    Builds the bus admittance matrix.
+
+    Args:
+        bus_data (list or Network): Buses; a Network also supplies its own
+            lines (vectorized) when line_data is None
+        line_data (list): Line dicts
+        sparse (bool): Return a scipy CSR matrix instead of a dense array.
+            Falls back to dense if scipy is not installed.
+    """
+    num_buses = len(bus_data)
+    if line_data is None:
+        rows, cols, vals = bus_data.branch_stamps()
+    else:
+        rows, cols, vals = branch_stamps(bus_data, line_data)
+
+    if sparse:
+        if sp is not None:
+            return sp.coo_matrix((vals, (rows, cols)), shape=(num_buses, num_buses)).tocsr()
+        print("   [WARNING] scipy not installed, building dense Y-Bus instead.")
+
+    Y = np.zeros((num_buses, num_buses), dtype=complex)
+    np.add.at(Y, (rows, cols), vals)
     return Y
\ No newline at end of file